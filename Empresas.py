@@ -1,8 +1,82 @@
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+import time
+
+# Antes de las demás importaciones, para que el tiempo de arranque las incluya
+INICIO_PROGRAMA = time.perf_counter()
+
 from datetime import datetime, date
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import wraps
+from itertools import groupby
+from operator import attrgetter
+import argparse
+import asyncio
+import base64
+import cProfile
+import csv
+import importlib
+import json
+import multiprocessing
 import re
 import os
+import pstats
+import signal
+import sqlite3
+import sys
+import threading
+import unicodedata
+
+try:
+    import fcntl # Bloqueo del listado en Linux y macOS
+except ImportError:
+    fcntl = None
+    import msvcrt # En Windows
+
+class _ImportacionDiferida:
+    """
+    Objeto de un módulo que se importa la primera vez que se llama. Importar openpyxl tarda
+    más que todo lo demás que hace falta para mostrar el menú, y muchas operaciones (cargar
+    desde la caché, validar una carga masiva) no lo necesitan.
+    """
+
+    _bloqueo = threading.RLock() # El listado se abre en otro hilo mientras se muestra el menú
+
+    def __init__(self, modulo, nombre):
+        self.modulo = modulo
+        self.nombre = nombre
+        self.objeto = None
+        self.al_importar = [] # Funciones que reciben el objeto cuando se importa
+
+    def resolver(self):
+        """Importa el objeto la primera vez que se necesita y lo devuelve."""
+        if self.objeto is None:
+            with self._bloqueo:
+                if self.objeto is None:
+                    objeto = getattr(importlib.import_module(self.modulo), self.nombre)
+                    for funcion in self.al_importar:
+                        funcion(objeto)
+                    self.objeto = objeto
+        return self.objeto
+
+    def cuando_se_importe(self, funcion):
+        """Llama a `funcion(objeto)` cuando se importe el objeto, o ya mismo si ya se importó."""
+        with self._bloqueo:
+            if self.objeto is None:
+                self.al_importar.append(funcion)
+                return
+        funcion(self.objeto)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolver()(*args, **kwargs)
+
+Workbook = _ImportacionDiferida("openpyxl", "Workbook")
+load_workbook = _ImportacionDiferida("openpyxl", "load_workbook")
+WriteOnlyCell = _ImportacionDiferida("openpyxl.cell", "WriteOnlyCell")
+Font = _ImportacionDiferida("openpyxl.styles", "Font")
+Alignment = _ImportacionDiferida("openpyxl.styles", "Alignment")
+PatternFill = _ImportacionDiferida("openpyxl.styles", "PatternFill")
+get_column_letter = _ImportacionDiferida("openpyxl.utils", "get_column_letter")
 
 # --- Configuración global ---
 NOMBRE_ARCHIVO_EXCEL = "Listado_Empresas_ARL_Automatizado.xlsx"
@@ -12,79 +86,1838 @@ ENCABEZADOS = [
     "DIRECCION", "CORREO", "TELEFONO", "PAGINA_WEB",
     "REPRESENTANTE_LEGAL", "TIPO_DE_RIESGO_ARL"
 ]
+TITULO_HOJA = "Empresas_ARL"
+
+# Validación en paralelo de cargas masivas: número de procesos (1 = secuencial) y líneas por lote
+TRABAJADORES_VALIDACION = 1
+TAMANO_LOTE_VALIDACION = 5000
 
 # --- Funciones de Utilidad ---
 
-def aplicar_estilos_encabezados(ws):
-    """Aplica estilos a los encabezados y ajusta el ancho de las columnas."""
+def _longitud_celda(valor):
+    """Devuelve la longitud con la que se muestra un valor en la hoja (0 si está vacío)."""
+    if not valor:
+        return 0
+    # Asegura que las fechas se conviertan a cadena para medir la longitud
+    if isinstance(valor, (datetime, date)):
+        valor = valor.strftime("%d/%m/%Y")
+    return len(str(valor))
+
+class AnchosColumnas:
+    """
+    Lleva el ancho máximo de cada columna de forma incremental.
+    Se construye una sola vez al cargar la hoja y luego se actualiza en O(1) por cada
+    valor añadido o modificado, de modo que no sea necesario recorrer toda la hoja
+    después de cada operación. Los anchos solo crecen: si un valor se reemplaza por
+    otro más corto, la columna conserva su ancho anterior hasta la próxima carga.
+    """
+
+    def __init__(self):
+        self.maximos = [len(encabezado) for encabezado in ENCABEZADOS]
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Construye el registro de anchos recorriendo una única vez las filas de datos."""
+        anchos = cls()
+        for fila in filas:
+            anchos.registrar_fila(fila)
+        return anchos
+
+    @classmethod
+    def desde_hoja(cls, ws):
+        return cls.desde_filas(ws.iter_rows(min_row=2, max_col=len(ENCABEZADOS), values_only=True))
+
+    def registrar_valor(self, col_idx, valor):
+        """Actualiza el máximo de la columna `col_idx` (base 0) con un nuevo valor."""
+        longitud = _longitud_celda(valor)
+        if longitud > self.maximos[col_idx]:
+            self.maximos[col_idx] = longitud
+
+    def registrar_fila(self, valores):
+        """Actualiza los máximos con todos los valores de una fila añadida."""
+        for col_idx, valor in enumerate(valores[:len(ENCABEZADOS)]):
+            self.registrar_valor(col_idx, valor)
+
+    def aplicar(self, ws):
+        """Vuelca los anchos acumulados en `column_dimensions` de la hoja."""
+        for col_idx, max_length in enumerate(self.maximos):
+            ws.column_dimensions[get_column_letter(col_idx + 1)].width = max_length + 2 # +2 para un pequeño margen
+
+def _estilos_encabezados():
+    """Devuelve la fuente, el relleno y la alineación usados en la fila de encabezados."""
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
     header_alignment = Alignment(horizontal="center", vertical="center")
+    return header_font, header_fill, header_alignment
+
+def aplicar_estilos_encabezados(ws, anchos=None):
+    """
+    Aplica estilos a los encabezados y ajusta el ancho de las columnas.
+    Si se recibe un `AnchosColumnas` se usan sus máximos; si no, se calculan recorriendo la hoja.
+    """
+    header_font, header_fill, header_alignment = _estilos_encabezados()
 
-    for col_idx, cell in enumerate(ws[1]):
+    for cell in ws[1]:
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_alignment
-        
-        # Calcular el ancho máximo basado en el encabezado y los datos existentes
-        max_length = len(ENCABEZADOS[col_idx])
-        for row_idx in range(2, ws.max_row + 1): # Revisa desde la fila 2 (datos)
-            cell_value = ws.cell(row=row_idx, column=col_idx + 1).value
-            if cell_value:
-                # Asegura que las fechas se conviertan a cadena para medir la longitud
-                if isinstance(cell_value, (datetime, date)):
-                    cell_value = cell_value.strftime("%d/%m/%Y")
-                max_length = max(max_length, len(str(cell_value)))
-        ws.column_dimensions[cell.column_letter].width = max_length + 2 # +2 para un pequeño margen
-
-def validar_campo(nombre_campo, valor_ingresado, requerido=True):
-    """Valida un valor de campo específico y devuelve el valor convertido o un error."""
-    if requerido and not valor_ingresado and valor_ingresado != "": # Asegurarse que '' es válido para no requerido
-        return None, f"El campo '{nombre_campo}' es obligatorio."
-
-    # Permitir vacío para campos no requeridos si el valor ingresado es una cadena vacía
-    if not valor_ingresado and not requerido and valor_ingresado == "":
-        return valor_ingresado, None
-
-    if nombre_campo == "FECHA_DE_MATRICULA":
+
+    if anchos is None:
+        anchos = AnchosColumnas.desde_hoja(ws)
+    anchos.aplicar(ws)
+
+def crear_fila_encabezados_write_only(ws, encabezados=ENCABEZADOS):
+    """Crea la fila de encabezados con estilos para una hoja en modo `write_only`."""
+    header_font, header_fill, header_alignment = _estilos_encabezados()
+    fila = []
+    for encabezado in encabezados:
+        cell = WriteOnlyCell(ws, value=encabezado)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        fila.append(cell)
+    return fila
+
+# --- Registro de Empresa ---
+# Posición de cada columna en ENCABEZADOS, calculada una sola vez.
+
+INDICE_ENCABEZADO = {encabezado: idx for idx, encabezado in enumerate(ENCABEZADOS)}
+IDX_ORG_JURIDICA = INDICE_ENCABEZADO["ORG_JURIDICA"]
+IDX_FECHA_MATRICULA = INDICE_ENCABEZADO["FECHA_DE_MATRICULA"]
+IDX_RAZON_SOCIAL = INDICE_ENCABEZADO["RAZON_SOCIAL"]
+IDX_TIPO_IDENTIFICACION = INDICE_ENCABEZADO["TIPO_DE_IDENTIFICACION"]
+IDX_NUMERO_NIT = INDICE_ENCABEZADO["NUMERO_DE_NIT"]
+IDX_CIIU = INDICE_ENCABEZADO["CIIU"]
+IDX_INGRESOS = INDICE_ENCABEZADO["INGRESOS"]
+IDX_DEPARTAMENTO = INDICE_ENCABEZADO["DEPARTAMENTO"]
+IDX_MUNICIPIO = INDICE_ENCABEZADO["MUNICIPIO"]
+IDX_DIRECCION = INDICE_ENCABEZADO["DIRECCION"]
+IDX_CORREO = INDICE_ENCABEZADO["CORREO"]
+IDX_TELEFONO = INDICE_ENCABEZADO["TELEFONO"]
+IDX_PAGINA_WEB = INDICE_ENCABEZADO["PAGINA_WEB"]
+IDX_REPRESENTANTE_LEGAL = INDICE_ENCABEZADO["REPRESENTANTE_LEGAL"]
+IDX_TIPO_RIESGO = INDICE_ENCABEZADO["TIPO_DE_RIESGO_ARL"]
+
+# Nombre del atributo de Empresa para cada columna, en el orden de ENCABEZADOS
+CAMPOS_EMPRESA = tuple(encabezado.lower() for encabezado in ENCABEZADOS)
+_VALORES_EMPRESA = attrgetter(*CAMPOS_EMPRESA)
+
+class Empresa:
+    """
+    Registro de una empresa con un atributo por columna (en minúsculas: `razon_social`,
+    `numero_de_nit`, ...). Usa `__slots__`, por lo que ocupa bastante menos memoria que un
+    dict y el acceso a sus atributos es más rápido. También se comporta como una secuencia
+    en el orden de ENCABEZADOS (`empresa[IDX_CIIU]`, `list(empresa)`), para poder usarse
+    donde se espera una fila.
+    """
+    __slots__ = CAMPOS_EMPRESA
+
+    def __init__(self, org_juridica=None, fecha_de_matricula=None, razon_social=None,
+                 tipo_de_identificacion=None, numero_de_nit=None, ciiu=None, ingresos=None,
+                 departamento=None, municipio=None, direccion=None, correo=None, telefono=None,
+                 pagina_web=None, representante_legal=None, tipo_de_riesgo_arl=None):
+        self.org_juridica = org_juridica
+        self.fecha_de_matricula = fecha_de_matricula
+        self.razon_social = razon_social
+        self.tipo_de_identificacion = tipo_de_identificacion
+        self.numero_de_nit = numero_de_nit
+        self.ciiu = ciiu
+        self.ingresos = ingresos
+        self.departamento = departamento
+        self.municipio = municipio
+        self.direccion = direccion
+        self.correo = correo
+        self.telefono = telefono
+        self.pagina_web = pagina_web
+        self.representante_legal = representante_legal
+        self.tipo_de_riesgo_arl = tipo_de_riesgo_arl
+
+    @classmethod
+    def desde_fila(cls, valores):
+        """Crea la empresa a partir de una fila en el orden de ENCABEZADOS (puede venir incompleta)."""
+        return cls(*valores[:len(ENCABEZADOS)])
+
+    @classmethod
+    def desde_diccionario(cls, datos):
+        """Crea la empresa a partir de un dict cuyas claves son los ENCABEZADOS."""
+        return cls(*[datos.get(encabezado) for encabezado in ENCABEZADOS])
+
+    def a_fila(self):
+        """Devuelve los valores como lista en el orden de ENCABEZADOS, lista para `ws.append`."""
+        return list(_VALORES_EMPRESA(self))
+
+    def __getitem__(self, idx_campo):
+        if isinstance(idx_campo, slice):
+            return list(_VALORES_EMPRESA(self)[idx_campo])
+        return getattr(self, CAMPOS_EMPRESA[idx_campo])
+
+    def __setitem__(self, idx_campo, valor):
+        setattr(self, CAMPOS_EMPRESA[idx_campo], valor)
+
+    def __len__(self):
+        return len(CAMPOS_EMPRESA)
+
+    def __iter__(self):
+        return iter(_VALORES_EMPRESA(self))
+
+    def __eq__(self, otra):
+        if isinstance(otra, Empresa):
+            return _VALORES_EMPRESA(self) == _VALORES_EMPRESA(otra)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Empresa({', '.join(f'{campo}={valor!r}' for campo, valor in zip(CAMPOS_EMPRESA, self))})"
+
+    def __getstate__(self):
+        return _VALORES_EMPRESA(self)
+
+    def __setstate__(self, valores):
+        for campo, valor in zip(CAMPOS_EMPRESA, valores):
+            setattr(self, campo, valor)
+
+# --- Motor de Validación ---
+# Cada columna de ENCABEZADOS tiene un validador asociado por su índice. Las expresiones
+# regulares se compilan una sola vez al importar el módulo.
+
+CAMPOS_OPCIONALES = ("CORREO", "TELEFONO", "PAGINA_WEB")
+CAMPO_REQUERIDO = [encabezado not in CAMPOS_OPCIONALES for encabezado in ENCABEZADOS]
+
+PATRON_CORREO = re.compile(r"[^@]+@[^@]+\.[^@]+")
+PATRON_TELEFONO = re.compile(r"\d{7}|\d{10}")
+PATRON_NIT = re.compile(r"\d{9}-\d|\d+")
+PATRON_CIIU = re.compile(r"\d{4,5}")
+
+MENSAJE_NIT_REQUERIDO = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser 'N/A' o vacío."
+
+def parsear_fecha(valor):
+    """
+    Convierte una fecha DD/MM/AAAA en `date`. Lanza ValueError si no es válida.
+    El caso habitual (10 caracteres) se resuelve a mano; cualquier otra forma que acepte
+    `strptime` (por ejemplo, '1/6/2025') se delega en él para conservar el mismo comportamiento.
+    """
+    if (len(valor) == 10 and valor[2] == "/" and valor[5] == "/"
+            and valor[:2].isdecimal() and valor[3:5].isdecimal() and valor[6:].isdecimal()):
+        return date(int(valor[6:]), int(valor[3:5]), int(valor[:2]))
+    return datetime.strptime(valor, "%d/%m/%Y").date()
+
+def _validar_fecha(valor):
+    try:
+        return parsear_fecha(valor), None
+    except ValueError:
+        return None, "Formato de fecha incorrecto. Por favor, use DD/MM/AAAA."
+
+def _validar_ingresos(valor):
+    try:
+        return float(valor), None
+    except ValueError:
+        return None, "Valor de ingresos inválido. Por favor, ingrese solo números."
+
+def _validar_correo(valor):
+    if valor and not PATRON_CORREO.match(valor):
+        return None, "Formato de correo electrónico inválido."
+    return valor, None
+
+def _validar_telefono(valor):
+    if valor and not PATRON_TELEFONO.fullmatch(valor):
+        return None, "Formato de teléfono inválido (solo números, 7 o 10 dígitos)."
+    return valor, None
+
+def _validar_tipo_identificacion(valor):
+    valor = valor.upper()
+    if valor not in ("NIT", "NO NIT"):
+        return None, "Tipo de identificación inválido. Debe ser 'NIT' o 'NO NIT'."
+    return valor, None
+
+def _validar_numero_nit(valor):
+    # La validación cruzada con TIPO_DE_IDENTIFICACION está en validar_nit_segun_tipo
+    # Permite formato "900123456-7" o solo números
+    if not valor or valor.upper() == "N/A": # "N/A" o vacío siempre son válidos aquí si no es NIT
+        return valor.upper(), None
+    if not PATRON_NIT.fullmatch(valor):
+        return None, "Formato de NIT inválido. Use 'XXXXXXXXX-X' o solo números."
+    return valor, None
+
+def _validar_ciiu(valor):
+    # CIIU: entre 4 y 5 dígitos numéricos
+    if not PATRON_CIIU.fullmatch(valor):
+        return None, "Formato de CIIU inválido. Debe ser un número de 4 o 5 dígitos."
+    return int(valor), None
+
+def _validar_texto(valor):
+    return valor, None
+
+VALIDADORES_POR_CAMPO = {
+    "FECHA_DE_MATRICULA": _validar_fecha,
+    "INGRESOS": _validar_ingresos,
+    "CORREO": _validar_correo,
+    "TELEFONO": _validar_telefono,
+    "TIPO_DE_IDENTIFICACION": _validar_tipo_identificacion,
+    "NUMERO_DE_NIT": _validar_numero_nit,
+    "CIIU": _validar_ciiu,
+}
+# Registro indexado por la posición de la columna en ENCABEZADOS
+VALIDADORES = [VALIDADORES_POR_CAMPO.get(encabezado, _validar_texto) for encabezado in ENCABEZADOS]
+
+def validar_valor(idx_campo, valor_ingresado, requerido=None):
+    """
+    Valida el valor de la columna `idx_campo` (base 0) y devuelve (valor_convertido, error).
+    Si `requerido` es None se usa lo definido para la columna en CAMPO_REQUERIDO.
+    """
+    if requerido is None:
+        requerido = CAMPO_REQUERIDO[idx_campo]
+    if not valor_ingresado:
+        if valor_ingresado != "":
+            if requerido:
+                return None, f"El campo '{ENCABEZADOS[idx_campo]}' es obligatorio."
+        elif not requerido:
+            # Permitir vacío para campos no requeridos
+            return valor_ingresado, None
+    return VALIDADORES[idx_campo](valor_ingresado)
+
+def validar_nit_segun_tipo(tipo_identificacion, valor_nit):
+    """
+    Aplica la regla cruzada entre TIPO_DE_IDENTIFICACION y NUMERO_DE_NIT sobre un NIT ya validado.
+    Devuelve (valor_nit, error).
+    """
+    if tipo_identificacion == "NIT" and (not valor_nit or str(valor_nit).upper() == "N/A"):
+        return None, MENSAJE_NIT_REQUERIDO
+    return valor_nit, None
+
+def validar_fila_empresa(partes):
+    """
+    Valida una fila de carga masiva ya separada en campos.
+    Devuelve (empresa, None) o (None, (nombre_campo, mensaje)); `nombre_campo` es None
+    cuando el error es de la fila completa (número de campos incorrecto).
+    Si TIPO_DE_IDENTIFICACION es 'NO NIT' el NIT se fija en 'N/A' sin validarlo.
+    """
+    if len(partes) != len(ENCABEZADOS):
+        return None, (None, f"Línea inválida (campos incorrectos: {len(partes)} vs {len(ENCABEZADOS)} esperados)")
+
+    # TIPO_DE_IDENTIFICACION se valida primero (una sola vez) porque condiciona la validación del NIT
+    tipo_identificacion, error = VALIDADORES[IDX_TIPO_IDENTIFICACION](partes[IDX_TIPO_IDENTIFICACION].strip())
+    if error:
+        return None, ("TIPO_DE_IDENTIFICACION", error)
+
+    fila = []
+    for idx_campo, validador in enumerate(VALIDADORES):
+        valor_str = partes[idx_campo].strip()
+        if idx_campo == IDX_TIPO_IDENTIFICACION:
+            fila.append(tipo_identificacion)
+            continue
+        if idx_campo == IDX_NUMERO_NIT:
+            if tipo_identificacion == "NO NIT":
+                fila.append("N/A")
+                continue
+            valor_validado, error = validar_valor(idx_campo, valor_str)
+            if not error:
+                valor_validado, error = validar_nit_segun_tipo(tipo_identificacion, valor_validado)
+        elif not valor_str and not CAMPO_REQUERIDO[idx_campo]:
+            valor_validado, error = valor_str, None
+        else:
+            valor_validado, error = validador(valor_str)
+        if error:
+            return None, (ENCABEZADOS[idx_campo], error)
+        fila.append(valor_validado)
+    return Empresa(*fila), None
+
+def validar_filas(filas):
+    """
+    Valida un lote de filas (cada una, una lista de cadenas en el orden de ENCABEZADOS).
+    Devuelve una lista con un (empresa, error) por fila, en el mismo orden, donde
+    `error` es None o una tupla (nombre_campo, mensaje) como en validar_fila_empresa.
+    """
+    return [validar_fila_empresa(partes) for partes in filas]
+
+def formatear_error_validacion(error):
+    """Convierte un error estructurado (nombre_campo, mensaje) en el texto que se muestra al usuario."""
+    nombre_campo, mensaje = error
+    if nombre_campo is None:
+        return mensaje
+    return f"Campo '{nombre_campo}': {mensaje}"
+
+# --- Índice de Empresas ---
+
+def normalizar_razon_social(valor):
+    """Clave de búsqueda exacta por Razón Social: sin espacios en los extremos y en minúsculas."""
+    if valor is None:
+        return ""
+    return str(valor).strip().lower()
+
+def normalizar_nit(valor):
+    """
+    Clave de búsqueda por NIT: solo la parte anterior al dígito de verificación, sin puntos
+    ni espacios, de modo que '900.123.456-7' y '900123456' coincidan.
+    Devuelve None si la empresa no tiene NIT ('N/A' o vacío).
+    """
+    if valor is None:
+        return None
+    nit = str(valor).strip().upper()
+    if not nit or nit == "N/A":
+        return None
+    return nit.split("-")[0].replace(".", "").replace(" ", "")
+
+class IndiceEmpresas:
+    """
+    Índice en memoria de Razón Social y NIT normalizados hacia el número de fila de la hoja.
+    Se construye una sola vez al cargar y se mantiene al añadir o modificar filas, de modo
+    que las búsquedas y la detección de duplicados no necesiten recorrer la hoja.
+    """
+
+    def __init__(self):
+        self.por_razon_social = {} # razón social normalizada -> lista de filas, en orden
+        self.por_nit = {} # NIT normalizado -> lista de filas, en orden
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Construye el índice recorriendo una única vez las filas de datos (la primera es la fila 2)."""
+        indice = cls()
+        for num_fila, fila in enumerate(filas, start=2):
+            indice.registrar_fila(num_fila, fila)
+        return indice
+
+    @classmethod
+    def desde_hoja(cls, ws):
+        return cls.desde_filas(ws.iter_rows(min_row=2, max_col=len(ENCABEZADOS), values_only=True))
+
+    @staticmethod
+    def _agregar(diccionario, clave, num_fila):
+        if clave:
+            filas = diccionario.setdefault(clave, [])
+            filas.append(num_fila)
+            if len(filas) > 1 and filas[-2] > num_fila:
+                filas.sort()
+
+    @staticmethod
+    def _quitar(diccionario, clave, num_fila):
+        filas = diccionario.get(clave)
+        if filas and num_fila in filas:
+            filas.remove(num_fila)
+            if not filas:
+                del diccionario[clave]
+
+    def registrar_fila(self, num_fila, valores):
+        """Añade al índice la fila `num_fila` con sus valores en el orden de ENCABEZADOS."""
+        self._agregar(self.por_razon_social, normalizar_razon_social(valores[IDX_RAZON_SOCIAL]), num_fila)
+        self._agregar(self.por_nit, normalizar_nit(valores[IDX_NUMERO_NIT]), num_fila)
+
+    def actualizar_valor(self, num_fila, idx_campo, valor_anterior, valor_nuevo):
+        """Refleja en el índice el cambio de un valor de la fila `num_fila`."""
+        if idx_campo == IDX_RAZON_SOCIAL:
+            self._quitar(self.por_razon_social, normalizar_razon_social(valor_anterior), num_fila)
+            self._agregar(self.por_razon_social, normalizar_razon_social(valor_nuevo), num_fila)
+        elif idx_campo == IDX_NUMERO_NIT:
+            self._quitar(self.por_nit, normalizar_nit(valor_anterior), num_fila)
+            self._agregar(self.por_nit, normalizar_nit(valor_nuevo), num_fila)
+
+    def reemplazar_fila(self, num_fila, valores_anteriores, valores_nuevos):
+        """Refleja en el índice que la fila `num_fila` se sobrescribió por completo."""
+        for idx_campo in (IDX_RAZON_SOCIAL, IDX_NUMERO_NIT):
+            self.actualizar_valor(num_fila, idx_campo, valores_anteriores[idx_campo], valores_nuevos[idx_campo])
+
+    def buscar_por_razon_social(self, razon_social):
+        """Devuelve la primera fila con esa Razón Social (sin distinguir mayúsculas) o None."""
+        filas = self.por_razon_social.get(normalizar_razon_social(razon_social))
+        return filas[0] if filas else None
+
+    def buscar_por_nit(self, nit):
+        """Devuelve la primera fila con ese NIT o None."""
+        filas = self.por_nit.get(normalizar_nit(nit))
+        return filas[0] if filas else None
+
+    def buscar_duplicado(self, valores):
+        """
+        Devuelve la fila de una empresa ya registrada que coincida con `valores`, o None.
+        Se compara por NIT, salvo cuando el tipo de identificación es 'NO NIT', en cuyo caso
+        se compara por Razón Social.
+        """
+        if valores[IDX_TIPO_IDENTIFICACION] == "NO NIT":
+            return self.buscar_por_razon_social(valores[IDX_RAZON_SOCIAL])
+        return self.buscar_por_nit(valores[IDX_NUMERO_NIT])
+
+# --- Búsqueda Aproximada ---
+# Índice de trigramas sobre RAZON_SOCIAL y REPRESENTANTE_LEGAL para encontrar una empresa
+# aunque el nombre se escriba sin tildes, con otra puntuación ('S.A.S.' o 'SAS') o con
+# espacios de más. Se consulta sin recorrer el listado: solo se puntúan las filas que
+# comparten trigramas poco frecuentes con el texto buscado.
+
+CAMPOS_BUSQUEDA_APROXIMADA = (IDX_RAZON_SOCIAL, IDX_REPRESENTANTE_LEGAL)
+CANDIDATOS_BUSQUEDA = 5
+# Un trigrama presente en más filas que esto (o que el 5 % del listado) se usa solo para puntuar
+MAXIMO_FILAS_POR_TRIGRAMA = 2000
+PATRON_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+def normalizar_texto_busqueda(valor):
+    """Texto en minúsculas, sin tildes ni puntuación: 'Compañía  S.A.S.' -> 'compania sas'."""
+    if not valor:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(valor)).encode("ascii", "ignore").decode("ascii")
+    texto = texto.lower().replace(".", "")
+    return PATRON_NO_ALFANUMERICO.sub(" ", texto).strip()
+
+def trigramas(texto):
+    """Conjunto de trigramas de un texto normalizado, con cada palabra rellenada con espacios."""
+    resultado = set()
+    for palabra in texto.split():
+        palabra = f"  {palabra} "
+        resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+class IndiceTrigramas:
+    """
+    Índice invertido trigrama -> conjunto de filas para cada campo de CAMPOS_BUSQUEDA_APROXIMADA.
+    Se mantiene al añadir o modificar filas: cuando un texto cambia, la fila se quita de los
+    conjuntos de los trigramas que ya no tiene y se añade a los nuevos, así que cada fila aparece
+    una sola vez por trigrama y el conteo de coincidencias no se desvía con las ediciones.
+    """
+
+    def __init__(self):
+        self.por_trigrama = {idx_campo: {} for idx_campo in CAMPOS_BUSQUEDA_APROXIMADA}
+        self.textos = {idx_campo: {} for idx_campo in CAMPOS_BUSQUEDA_APROXIMADA} # fila -> texto normalizado
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Construye el índice a partir de pares (num_fila, valores)."""
+        indice = cls()
+        for num_fila, valores in filas:
+            indice.registrar_fila(num_fila, valores)
+        return indice
+
+    def registrar_fila(self, num_fila, valores):
+        """Indexa (o vuelve a indexar) los campos de búsqueda de la fila `num_fila`."""
+        for idx_campo in CAMPOS_BUSQUEDA_APROXIMADA:
+            self._asignar_texto(num_fila, idx_campo, valores[idx_campo])
+
+    def actualizar_valor(self, num_fila, idx_campo, valor):
+        if idx_campo in self.textos:
+            self._asignar_texto(num_fila, idx_campo, valor)
+
+    def _asignar_texto(self, num_fila, idx_campo, valor):
+        textos = self.textos[idx_campo]
+        texto = normalizar_texto_busqueda(valor)
+        texto_anterior = textos.get(num_fila, "")
+        if texto == texto_anterior:
+            return
+        conjuntos = self.por_trigrama[idx_campo]
+        nuevos, anteriores = trigramas(texto), trigramas(texto_anterior)
+        for trigrama in anteriores - nuevos:
+            filas = conjuntos[trigrama]
+            filas.discard(num_fila)
+            if not filas:
+                del conjuntos[trigrama]
+        for trigrama in nuevos - anteriores:
+            filas = conjuntos.get(trigrama)
+            if filas is None:
+                conjuntos[trigrama] = {num_fila}
+            else:
+                filas.add(num_fila)
+        if texto:
+            textos[num_fila] = texto
+        else:
+            del textos[num_fila]
+
+    def buscar(self, texto, k=CANDIDATOS_BUSQUEDA):
+        """
+        Devuelve hasta `k` tuplas (num_fila, puntaje, idx_campo) ordenadas de mayor a menor
+        parecido, donde `puntaje` (0 a 1) es la similitud de trigramas con el campo que mejor
+        coincide.
+        """
+        consulta = trigramas(normalizar_texto_busqueda(texto))
+        if not consulta:
+            return []
+        mejores = {} # num_fila -> (puntaje, idx_campo)
+        for idx_campo in CAMPOS_BUSQUEDA_APROXIMADA:
+            conjuntos = self.por_trigrama[idx_campo]
+            textos = self.textos[idx_campo]
+            candidatas = sorted((conjuntos[trigrama] for trigrama in consulta if trigrama in conjuntos), key=len)
+            if not candidatas:
+                continue
+            limite = max(MAXIMO_FILAS_POR_TRIGRAMA, len(textos) // 20)
+            # Si todos los trigramas son frecuentes se usan los tres menos frecuentes
+            seleccionadas = [filas for filas in candidatas if len(filas) <= limite] or candidatas[:3]
+            coincidencias = Counter()
+            for filas in seleccionadas:
+                coincidencias.update(filas)
+            for num_fila, _ in coincidencias.most_common(max(k * 10, 50)):
+                trigramas_fila = trigramas(textos.get(num_fila, ""))
+                comunes = len(consulta & trigramas_fila)
+                if not comunes:
+                    continue
+                puntaje = comunes / len(consulta | trigramas_fila)
+                if num_fila not in mejores or puntaje > mejores[num_fila][0]:
+                    mejores[num_fila] = (puntaje, idx_campo)
+        ordenadas = sorted(mejores.items(), key=lambda item: (-item[1][0], item[0]))[:k]
+        return [(num_fila, puntaje, idx_campo) for num_fila, (puntaje, idx_campo) in ordenadas]
+
+# --- Tabla de Empresas (modelo en memoria) ---
+
+class TablaEmpresas:
+    """
+    Listado de empresas en memoria, guardado por columnas (una lista por cada encabezado).
+    Los números de fila siguen la numeración de la hoja de Excel: la primera empresa está
+    en la fila 2. El Excel solo se lee al cargar (si cambió) y se escribe al guardar.
+    """
+
+    def __init__(self, titulo=TITULO_HOJA):
+        self.titulo = titulo
+        self.columnas = [[] for _ in ENCABEZADOS]
+        self.hojas_adicionales = [] # Otras hojas del libro, que hay que conservar al guardar
+        self.particiones = None # Manifiesto del libro, si el listado está particionado
+
+    def __len__(self):
+        return len(self.columnas[0])
+
+    @property
+    def ultima_fila(self):
+        """Número de fila de la última empresa (1 si la tabla está vacía)."""
+        return len(self) + 1
+
+    @classmethod
+    def desde_hoja(cls, ws):
+        """Construye la tabla a partir de las filas de datos de una hoja (admite modo `read_only`)."""
+        tabla = cls(ws.title)
+        tabla.agregar_desde_hoja(ws)
+        return tabla
+
+    def agregar_desde_hoja(self, ws):
+        """Añade al final las filas de datos de una hoja (por ejemplo, de otra partición del listado)."""
+        for fila in ws.iter_rows(min_row=2, max_col=len(ENCABEZADOS), values_only=True):
+            if any(valor is not None for valor in fila):
+                self.agregar_fila(_normalizar_fila_leida(fila))
+
+    def agregar_fila(self, valores):
+        """Añade una empresa al final y devuelve su número de fila."""
+        for columna, valor in zip(self.columnas, valores):
+            columna.append(valor)
+        # Rellena con None si la fila viene incompleta
+        for columna in self.columnas[len(valores):]:
+            columna.append(None)
+        return self.ultima_fila
+
+    def obtener_fila(self, num_fila):
+        """Devuelve una lista con los valores de la fila `num_fila`."""
+        posicion = num_fila - 2
+        return [columna[posicion] for columna in self.columnas]
+
+    def obtener_empresa(self, num_fila):
+        """Devuelve la fila `num_fila` como `Empresa`."""
+        posicion = num_fila - 2
+        return Empresa(*[columna[posicion] for columna in self.columnas])
+
+    def obtener_valor(self, num_fila, idx_campo):
+        return self.columnas[idx_campo][num_fila - 2]
+
+    def asignar_valor(self, num_fila, idx_campo, valor):
+        self.columnas[idx_campo][num_fila - 2] = valor
+
+    def reemplazar_fila(self, num_fila, valores):
+        """Reemplaza los valores de la fila `num_fila` y devuelve los que tenía antes."""
+        valores_anteriores = self.obtener_fila(num_fila)
+        posicion = num_fila - 2
+        for columna, valor in zip(self.columnas, valores):
+            columna[posicion] = valor
+        return valores_anteriores
+
+    def iter_filas(self):
+        """Genera los valores de cada fila, en orden, como tuplas."""
+        return zip(*self.columnas)
+
+    def iter_empresas(self):
+        """Genera cada fila, en orden, como `Empresa`."""
+        for valores in zip(*self.columnas):
+            yield Empresa(*valores)
+
+# Operaciones que modifican el listado manteniendo sincronizados la tabla, los anchos de
+# columna y el índice. Se usan tanto en el menú como al reproducir el diario.
+
+def agregar_fila_listado(tabla, anchos, indice, valores):
+    """Añade una empresa al listado y devuelve su número de fila."""
+    num_fila = tabla.agregar_fila(valores)
+    if anchos is not None:
+        anchos.registrar_fila(valores)
+    if indice is not None:
+        indice.registrar_fila(num_fila, valores)
+    return num_fila
+
+def asignar_valor_listado(tabla, anchos, indice, num_fila, idx_campo, valor):
+    """Cambia un valor de una empresa del listado."""
+    if indice is not None:
+        indice.actualizar_valor(num_fila, idx_campo, tabla.obtener_valor(num_fila, idx_campo), valor)
+    tabla.asignar_valor(num_fila, idx_campo, valor)
+    if anchos is not None:
+        anchos.registrar_valor(idx_campo, valor)
+
+def reemplazar_fila_listado(tabla, anchos, indice, num_fila, valores):
+    """Sobrescribe todos los valores de una empresa del listado."""
+    valores_anteriores = tabla.reemplazar_fila(num_fila, valores)
+    if indice is not None:
+        indice.reemplazar_fila(num_fila, valores_anteriores, valores)
+    if anchos is not None:
+        anchos.registrar_fila(valores)
+
+def _normalizar_fila_leida(fila):
+    """
+    Ajusta los tipos de una fila leída del Excel a los que produce la validación:
+    fechas sin hora como `date` e ingresos enteros como `float`.
+    """
+    fila = list(fila)
+    fecha = fila[IDX_FECHA_MATRICULA]
+    if isinstance(fecha, datetime) and fecha.time() == datetime.min.time():
+        fila[IDX_FECHA_MATRICULA] = fecha.date()
+    ingresos = fila[IDX_INGRESOS]
+    if type(ingresos) is int:
+        fila[IDX_INGRESOS] = float(ingresos)
+    return fila
+
+# --- Caché del Listado ---
+# Copia del listado junto al .xlsx que se carga en milisegundos. Guarda la fecha de
+# modificación y el tamaño del Excel del que proviene; si el Excel cambió fuera del
+# programa, la caché se descarta y se vuelve a leer el Excel. Es JSON (con las columnas
+# numéricas como bytes en base64), nunca pickle: suele estar en una carpeta compartida y
+# cargarla no debe poder ejecutar código de nadie.
+
+VERSION_CACHE = 3
+
+def ruta_cache(ruta_excel):
+    return ruta_excel + ".cache"
+
+def firma_archivo(ruta):
+    """Devuelve (mtime_ns, tamaño) del archivo, que identifican la versión del Excel."""
+    estado = os.stat(ruta)
+    return estado.st_mtime_ns, estado.st_size
+
+def _arreglo_a_texto(tipo, valores):
+    return base64.b64encode(array(tipo, valores).tobytes()).decode("ascii")
+
+def _arreglo_desde_texto(tipo, texto):
+    arreglo = array(tipo)
+    arreglo.frombytes(base64.b64decode(texto))
+    return arreglo
+
+def _comprimir_columna(valores):
+    """
+    Convierte una columna a un formato compacto: bytes de un `array` para columnas homogéneas
+    de float, int o fechas (como ordinales), códigos sobre una lista de categorías para las
+    columnas con muchos valores repetidos (departamento, riesgo...) y lista para el resto.
+    """
+    if valores and all(type(valor) is float for valor in valores):
+        return "d", _arreglo_a_texto("d", valores)
+    if valores and all(type(valor) is int for valor in valores):
         try:
-            return datetime.strptime(valor_ingresado, "%d/%m/%Y").date(), None
-        except ValueError:
-            return None, "Formato de fecha incorrecto. Por favor, use DD/MM/AAAA."
-    elif nombre_campo == "INGRESOS":
+            return "q", _arreglo_a_texto("q", valores)
+        except OverflowError:
+            return "lista", valores
+    if valores and all(type(valor) is date for valor in valores):
+        return "fecha", _arreglo_a_texto("q", [valor.toordinal() for valor in valores])
+    categorias = {}
+    codigos = []
+    for valor in valores:
+        codigo = categorias.setdefault(valor, len(categorias))
+        if codigo * 2 > len(valores):
+            return "lista", [_codificar_valor(valor) for valor in valores]
+        codigos.append(codigo)
+    return "categorias", ([_codificar_valor(valor) for valor in categorias], _arreglo_a_texto("q", codigos))
+
+def _descomprimir_columna(tipo, datos):
+    if tipo in ("d", "q"):
+        return _arreglo_desde_texto(tipo, datos).tolist()
+    if tipo == "fecha":
+        return [date.fromordinal(ordinal) for ordinal in _arreglo_desde_texto("q", datos)]
+    if tipo == "categorias":
+        categorias, codigos = datos
+        categorias = [_decodificar_valor(valor) for valor in categorias]
+        return [categorias[codigo] for codigo in _arreglo_desde_texto("q", codigos)]
+    if tipo == "lista":
+        return [_decodificar_valor(valor) for valor in datos]
+    raise ValueError(f"Tipo de columna desconocido en la caché: {tipo!r}")
+
+def guardar_cache(ruta_excel, tabla, anchos, indice):
+    """Escribe la caché del listado asociada a la versión actual de `ruta_excel`."""
+    contenido = {
+        "version": VERSION_CACHE,
+        "orden_bytes": sys.byteorder,
+        "firma": firma_archivo(ruta_excel),
+        "encabezados": ENCABEZADOS,
+        "titulo": tabla.titulo,
+        "hojas_adicionales": tabla.hojas_adicionales,
+        "particiones": tabla.particiones,
+        "columnas": [_comprimir_columna(columna) for columna in tabla.columnas],
+        "anchos": anchos.maximos,
+        "indice": (indice.por_razon_social, indice.por_nit),
+    }
+    ruta_temporal = ruta_cache(ruta_excel) + ".tmp"
+    with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+        json.dump(contenido, archivo, ensure_ascii=False, separators=(",", ":"))
+    os.replace(ruta_temporal, ruta_cache(ruta_excel))
+
+def cargar_cache(ruta_excel):
+    """
+    Devuelve (tabla, anchos, indice) desde la caché si corresponde a la versión actual de
+    `ruta_excel`, o None si no existe, es de otra versión, está dañada o el Excel cambió.
+    """
+    try:
+        with open(ruta_cache(ruta_excel), "r", encoding="utf-8") as archivo:
+            contenido = json.load(archivo)
+        if (contenido.get("version") != VERSION_CACHE
+                or contenido.get("orden_bytes") != sys.byteorder
+                or contenido.get("encabezados") != ENCABEZADOS
+                or tuple(contenido.get("firma")) != firma_archivo(ruta_excel)):
+            return None
+        tabla = TablaEmpresas(contenido["titulo"])
+        tabla.hojas_adicionales = list(contenido["hojas_adicionales"])
+        tabla.particiones = contenido["particiones"]
+        tabla.columnas = [_descomprimir_columna(tipo, datos) for tipo, datos in contenido["columnas"]]
+        if len(tabla.columnas) != len(ENCABEZADOS) or len({len(columna) for columna in tabla.columnas}) != 1:
+            return None
+        anchos = AnchosColumnas()
+        anchos.maximos = list(contenido["anchos"])
+        indice = IndiceEmpresas()
+        indice.por_razon_social, indice.por_nit = contenido["indice"]
+        return tabla, anchos, indice
+    except Exception:
+        return None
+
+def cargar_listado(ruta_excel):
+    """
+    Carga el listado y devuelve (tabla, anchos, indice).
+    Usa la caché si el Excel no cambió; si cambió, lo lee en modo `read_only` y regenera la caché.
+    Si el archivo no existe o no se puede leer, devuelve un listado vacío.
+    """
+    if not os.path.exists(ruta_excel):
+        print(f"\nEl archivo '{ruta_excel}' no existe. Creando uno nuevo.")
+        return TablaEmpresas(), AnchosColumnas(), IndiceEmpresas()
+
+    desde_cache = cargar_cache(ruta_excel)
+    if desde_cache is not None:
+        print(f"\nCargando archivo existente: {ruta_excel} (desde caché)")
+        return desde_cache
+
+    print(f"\nCargando archivo existente: {ruta_excel}")
+    try:
+        wb = load_workbook(ruta_excel, read_only=True)
         try:
-            return float(valor_ingresado), None
+            particiones = leer_manifiesto(wb)
+        finally:
+            wb.close()
+        tabla = None
+        for ws in iter_hojas_listado(ruta_excel):
+            if tabla is None:
+                encabezados_archivo = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+                if list(encabezados_archivo) != ENCABEZADOS:
+                    print("--- ATENCIÓN ---".center(60))
+                    print("Advertencia: Los encabezados del archivo existente no coinciden con los esperados.")
+                    print("Esto podría causar problemas. Por favor, revise el archivo o considere iniciar uno nuevo.")
+                    print("----------------".center(60))
+                tabla = TablaEmpresas.desde_hoja(ws)
+                if particiones is not None:
+                    tabla.titulo = TITULO_HOJA # Las hojas de un listado particionado se llaman como la partición
+                    tabla.particiones = particiones
+                else:
+                    tabla.hojas_adicionales = [nombre for nombre in ws.parent.sheetnames if nombre != ws.title]
+                    if tabla.hojas_adicionales:
+                        print(f"El archivo tiene otras hojas ({', '.join(tabla.hojas_adicionales)}); se conservarán "
+                              f"al guardar, aunque guardar tardará más.")
+            else:
+                tabla.agregar_desde_hoja(ws)
+        if tabla is None:
+            tabla = TablaEmpresas()
+    except Exception as e:
+        print(f"Error al cargar el archivo existente: {e}")
+        print("Creando un nuevo archivo en su lugar.")
+        return TablaEmpresas(), AnchosColumnas(), IndiceEmpresas()
+
+    anchos = AnchosColumnas.desde_filas(tabla.iter_filas())
+    indice = IndiceEmpresas.desde_filas(tabla.iter_filas())
+    try:
+        guardar_cache(ruta_excel, tabla, anchos, indice)
+    except OSError as e:
+        print(f"Advertencia: no se pudo escribir la caché del listado: {e}")
+    return tabla, anchos, indice
+
+def guardar_libro_atomico(wb, ruta_excel):
+    """
+    Guarda el libro en un archivo temporal junto a `ruta_excel`, lo fuerza a disco y luego lo
+    renombra sobre el original, de modo que un fallo a mitad de la escritura nunca deje un
+    Excel incompleto.
+    """
+    ruta_temporal = ruta_excel + ".tmp"
+    try:
+        wb.save(ruta_temporal)
+        with open(ruta_temporal, "rb+") as archivo:
+            os.fsync(archivo.fileno())
+        os.replace(ruta_temporal, ruta_excel)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+
+def escribir_excel(ruta_excel, titulo, anchos, filas):
+    """
+    Escribe `filas` en una hoja nueva de `ruta_excel` en modo `write_only` (encabezados con
+    estilo y anchos de columna), reemplazando el archivo de forma atómica. Las filas se
+    consumen una a una, así que pueden venir de un generador sin cargarse en memoria.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    anchos.aplicar(ws)
+    ws.append(crear_fila_encabezados_write_only(ws))
+    for fila in filas:
+        ws.append(fila)
+    guardar_libro_atomico(wb, ruta_excel)
+
+def actualizar_libro_existente(ruta_excel, tabla, anchos):
+    """
+    Escribe el listado sobre su hoja en el libro existente, cargado completo, y lo guarda de
+    forma atómica. Es mucho más lento que escribir_excel, pero conserva las demás hojas y el
+    formato dado a mano a las celdas, así que se usa cuando el libro tiene otras hojas.
+    """
+    wb = load_workbook(ruta_excel)
+    ws = wb[tabla.titulo] if tabla.titulo in wb.sheetnames else wb.active
+    for num_fila, fila in enumerate(tabla.iter_filas(), start=2):
+        for col_idx, valor in enumerate(fila, start=1):
+            ws.cell(row=num_fila, column=col_idx, value=valor)
+    if ws.max_row > tabla.ultima_fila:
+        ws.delete_rows(tabla.ultima_fila + 1, ws.max_row - tabla.ultima_fila)
+    aplicar_estilos_encabezados(ws, anchos)
+    guardar_libro_atomico(wb, ruta_excel)
+
+def guardar_listado(ruta_excel, tabla, anchos, indice):
+    """
+    Escribe el listado completo en `ruta_excel` y actualiza la caché para que la
+    próxima carga no tenga que leer el Excel. Un libro con solo la hoja del listado se reescribe
+    en modo `write_only`, así que el formato dado a mano a sus celdas no se conserva (es lo que
+    permite guardar listados grandes en segundos). Si el libro tiene otras hojas, se actualiza
+    en su lugar para conservarlas con su formato (ver actualizar_libro_existente); si el listado no cabe en
+    una hoja, se reparte en varias hojas con un manifiesto (ver EscritorParticionado). Un
+    listado que ya estaba particionado se vuelve a particionar igual (ver guardar_listado_particionado).
+    """
+    if tabla.particiones is not None:
+        guardar_listado_particionado(ruta_excel, tabla, anchos)
+    elif tabla.hojas_adicionales and os.path.exists(ruta_excel):
+        actualizar_libro_existente(ruta_excel, tabla, anchos)
+    elif len(tabla) > LIMITE_FILAS_HOJA:
+        # Desde aquí el listado queda particionado: la caché y los próximos guardados lo saben
+        tabla.titulo = TITULO_HOJA
+        tabla.particiones = escribir_excel_particionado(ruta_excel, tabla.iter_filas(), anchos, por="filas",
+                                                        filas_por_particion=LIMITE_FILAS_HOJA)
+    else:
+        escribir_excel(ruta_excel, tabla.titulo, anchos, tabla.iter_filas())
+    try:
+        guardar_cache(ruta_excel, tabla, anchos, indice)
+    except OSError as e:
+        print(f"Advertencia: no se pudo actualizar la caché del listado: {e}")
+
+# --- Listado Particionado ---
+# Una hoja de Excel admite 1.048.576 filas y una hoja muy grande es lenta de abrir. En modo
+# particionado las filas se reparten por DEPARTAMENTO o en bloques de un número fijo de filas,
+# en hojas del mismo libro o en archivos aparte, cada una con sus encabezados y estilos. La hoja
+# 'Manifiesto' (la primera del libro principal) indica dónde está cada partición y cuántas
+# filas tiene, para que una consulta por departamento lea solo las particiones que necesita.
+
+LIMITE_FILAS_HOJA = 1048576 - 1 # Filas de datos por hoja, sin contar los encabezados
+HOJA_MANIFIESTO = "Manifiesto"
+ENCABEZADOS_MANIFIESTO = ["PARTICION", "ARCHIVO", "HOJA", "DEPARTAMENTO", "FILAS"]
+CRITERIOS_PARTICION = ("departamento", "filas")
+PATRON_CARACTERES_HOJA = re.compile(r"[\[\]:*?/\\]") # No se admiten en nombres de hoja
+PATRON_CARACTERES_ARCHIVO = re.compile(r'[<>:"/\\|?*\x00-\x1f]') # Ni en nombres de archivo (Windows)
+
+def _nombre_particion(texto, usados):
+    """
+    Nombre válido y único (sin distinguir mayúsculas) para una hoja o archivo de partición.
+    El departamento es texto libre: se quitan los caracteres que no admiten las hojas ni los
+    nombres de archivo, y los puntos y espacios de los extremos (Windows no los admite al final).
+    """
+    base = PATRON_CARACTERES_ARCHIVO.sub("", PATRON_CARACTERES_HOJA.sub("", str(texto)))
+    base = base.strip(" .")[:27].strip(" .") or "SIN_NOMBRE"
+    nombre, copia = base, 2
+    while nombre.lower() in usados or nombre.lower() == HOJA_MANIFIESTO.lower():
+        nombre = f"{base}_{copia}"
+        copia += 1
+    usados.add(nombre.lower())
+    return nombre
+
+class EscritorParticionado:
+    """
+    Reparte filas entre particiones en modo `write_only`, sin cargar el listado en memoria.
+    `por="departamento"` crea una partición por departamento y `por="filas"` una cada
+    `filas_por_particion` filas; en ambos casos ninguna partición supera `filas_por_particion`
+    (ni el límite de una hoja). Con `archivos_separados` cada partición es un .xlsx junto a
+    `ruta_excel`, que entonces solo contiene el manifiesto.
+    """
+
+    def __init__(self, ruta_excel, anchos, por="departamento", filas_por_particion=LIMITE_FILAS_HOJA,
+                 archivos_separados=False):
+        self.ruta = ruta_excel
+        self.anchos = anchos
+        self.por = por
+        self.filas_por_particion = min(filas_por_particion, LIMITE_FILAS_HOJA)
+        self.archivos_separados = archivos_separados
+        self.wb = Workbook(write_only=True)
+        self.ws_manifiesto = self.wb.create_sheet(HOJA_MANIFIESTO)
+        self.particiones = []
+        self.abiertas = {} # clave de partición -> partición que recibe filas
+        self.nombres = set()
+
+    def _abrir_particion(self, departamento):
+        if self.por == "departamento":
+            nombre = _nombre_particion(departamento or "SIN_DEPARTAMENTO", self.nombres)
+        else:
+            nombre = _nombre_particion(f"{TITULO_HOJA}_{len(self.particiones) + 1:03d}", self.nombres)
+        if self.archivos_separados:
+            wb = Workbook(write_only=True)
+            archivo = f"{os.path.splitext(os.path.basename(self.ruta))[0]}_{nombre}.xlsx"
+            ws = wb.create_sheet(TITULO_HOJA)
+        else:
+            wb, archivo = self.wb, None
+            ws = wb.create_sheet(nombre)
+        self.anchos.aplicar(ws)
+        ws.append(crear_fila_encabezados_write_only(ws))
+        particion = {"PARTICION": nombre, "ARCHIVO": archivo, "HOJA": ws.title, "DEPARTAMENTO": departamento,
+                     "FILAS": 0, "wb": wb, "ws": ws}
+        self.particiones.append(particion)
+        return particion
+
+    def agregar(self, fila):
+        departamento = None
+        if self.por == "departamento":
+            departamento = str(fila[IDX_DEPARTAMENTO] or "").strip() or None
+        clave = (departamento or "").lower()
+        particion = self.abiertas.get(clave)
+        if particion is None or particion["FILAS"] >= self.filas_por_particion:
+            particion = self.abiertas[clave] = self._abrir_particion(departamento)
+        particion["ws"].append(fila)
+        particion["FILAS"] += 1
+
+    def guardar(self):
+        """Escribe el manifiesto, guarda todos los archivos y devuelve la lista de particiones."""
+        ws = self.ws_manifiesto
+        for col_idx, ancho in enumerate((30, 45, 30, 30, 10)):
+            ws.column_dimensions[get_column_letter(col_idx + 1)].width = ancho
+        ws.append(crear_fila_encabezados_write_only(ws, ENCABEZADOS_MANIFIESTO))
+        manifiesto = []
+        for particion in self.particiones:
+            ws.append([particion[campo] for campo in ENCABEZADOS_MANIFIESTO])
+            manifiesto.append({campo: particion[campo] for campo in ENCABEZADOS_MANIFIESTO})
+        if self.archivos_separados:
+            directorio = os.path.dirname(self.ruta)
+            for particion in self.particiones:
+                guardar_libro_atomico(particion["wb"], os.path.join(directorio, particion["ARCHIVO"]))
+        guardar_libro_atomico(self.wb, self.ruta)
+        return manifiesto
+
+def escribir_excel_particionado(ruta_excel, filas, anchos, por="departamento", filas_por_particion=LIMITE_FILAS_HOJA,
+                                archivos_separados=False):
+    """Escribe `filas` repartidas con un `EscritorParticionado` y devuelve el manifiesto."""
+    escritor = EscritorParticionado(ruta_excel, anchos, por, filas_por_particion, archivos_separados)
+    for fila in filas:
+        escritor.agregar(fila)
+    return escritor.guardar()
+
+def opciones_de_manifiesto(particiones):
+    """
+    Deduce del manifiesto las opciones de escribir_excel_particionado con que se creó: por
+    departamento si alguna partición tiene uno, con el tamaño de la mayor partición como
+    límite si alguna clave se repartió en varias, y en archivos separados si las hay.
+    """
+    por = "departamento" if any(particion["DEPARTAMENTO"] for particion in particiones) else "filas"
+    claves = [str(particion["DEPARTAMENTO"] or "").strip().lower() for particion in particiones]
+    filas_por_particion = LIMITE_FILAS_HOJA
+    if len(set(claves)) < len(claves):
+        filas_por_particion = max(particion["FILAS"] for particion in particiones)
+    return {"por": por, "filas_por_particion": filas_por_particion,
+            "archivos_separados": any(particion["ARCHIVO"] for particion in particiones)}
+
+def guardar_listado_particionado(ruta_excel, tabla, anchos):
+    """
+    Vuelve a escribir un listado particionado con las opciones de su manifiesto: primero las
+    particiones y al final el libro principal con el manifiesto nuevo. Después borra los
+    archivos de particiones que el manifiesto anterior tenía y el nuevo ya no.
+    """
+    manifiesto = escribir_excel_particionado(ruta_excel, tabla.iter_filas(), anchos,
+                                             **opciones_de_manifiesto(tabla.particiones))
+    vigentes = {particion["ARCHIVO"] for particion in manifiesto}
+    directorio = os.path.dirname(ruta_excel)
+    for particion in tabla.particiones:
+        if particion["ARCHIVO"] and particion["ARCHIVO"] not in vigentes:
+            ruta_particion = os.path.join(directorio, particion["ARCHIVO"])
+            if os.path.exists(ruta_particion):
+                os.remove(ruta_particion)
+    tabla.particiones = manifiesto
+
+def leer_manifiesto(wb):
+    """Devuelve las particiones descritas en la hoja 'Manifiesto' de un libro, o None si no la tiene."""
+    if HOJA_MANIFIESTO not in wb.sheetnames:
+        return None
+    filas = wb[HOJA_MANIFIESTO].iter_rows(min_row=2, max_col=len(ENCABEZADOS_MANIFIESTO), values_only=True)
+    return [dict(zip(ENCABEZADOS_MANIFIESTO, fila)) for fila in filas if fila[0] is not None]
+
+def iter_hojas_listado(ruta_excel, departamento=None):
+    """
+    Genera, en modo `read_only`, las hojas con filas del listado: la hoja activa en un listado
+    normal o cada partición de uno particionado. Con `departamento` se omiten las particiones
+    por departamento que no le corresponden (sin leerlas); cada archivo se cierra al terminar con él.
+    """
+    wb = load_workbook(ruta_excel, read_only=True)
+    try:
+        particiones = leer_manifiesto(wb)
+        if particiones is None:
+            yield wb.active
+            return
+        buscado = departamento.strip().lower() if departamento else None
+        directorio = os.path.dirname(ruta_excel)
+        for particion in particiones:
+            if buscado and particion["DEPARTAMENTO"] and str(particion["DEPARTAMENTO"]).strip().lower() != buscado:
+                continue
+            if particion["ARCHIVO"]:
+                wb_particion = load_workbook(os.path.join(directorio, particion["ARCHIVO"]), read_only=True)
+                try:
+                    yield wb_particion[particion["HOJA"]]
+                finally:
+                    wb_particion.close()
+            else:
+                yield wb[particion["HOJA"]]
+    finally:
+        wb.close()
+
+# --- Diario de Operaciones ---
+# Cada cambio (alta, modificación o lote de carga masiva) se añade al diario y se fuerza a
+# disco antes de continuar. Al iniciar, las operaciones pendientes se reproducen sobre el
+# listado cargado. En cada punto de control el Excel se escribe completo en un archivo
+# temporal que luego reemplaza al original, y el diario se vacía.
+
+# Filas pendientes en el diario a partir de las cuales se hace un punto de control automático
+FILAS_POR_PUNTO_DE_CONTROL = 50000
+# Filas de una carga masiva que se guardan juntas (una entrada del diario o una transacción de SQLite)
+FILAS_POR_LOTE_DIARIO = 1000
+
+def ruta_diario(ruta_excel):
+    return ruta_excel + ".diario"
+
+def ruta_bloqueo(ruta_excel):
+    return ruta_excel + ".bloqueo"
+
+class ListadoEnUso(Exception):
+    """Otro proceso tiene abierto el listado para modificarlo."""
+
+def bloquear_listado(ruta_excel):
+    """
+    Toma el bloqueo exclusivo del listado (un archivo '.bloqueo' junto al diario) y devuelve el
+    archivo abierto, que lo mantiene hasta cerrarse. Dos procesos que escribieran a la vez
+    mezclarían sus operaciones en el mismo diario, y tras el punto de control de uno el otro
+    seguiría escribiendo en un diario ya reemplazado. El sistema libera el bloqueo si el
+    proceso termina de forma inesperada, así que no quedan bloqueos huérfanos.
+    """
+    archivo = open(ruta_bloqueo(ruta_excel), "a+", encoding="utf-8")
+    try:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        archivo.close()
+        raise ListadoEnUso(f"'{ruta_excel}' está abierto en otra sesión del programa (menú, 'servir' o "
+                           f"'actualizar'). Ciérrela antes de modificar el listado.") from None
+    archivo.seek(0)
+    archivo.truncate()
+    archivo.write(f"{os.getpid()}\n")
+    archivo.flush()
+    return archivo
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return {"$fechahora": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"$fecha": valor.isoformat()}
+    return valor
+
+def _decodificar_valor(valor):
+    if isinstance(valor, dict):
+        if "$fecha" in valor:
+            return date.fromisoformat(valor["$fecha"])
+        if "$fechahora" in valor:
+            return datetime.fromisoformat(valor["$fechahora"])
+    return valor
+
+def operacion_agregar(valores):
+    return {"op": "agregar", "valores": [_codificar_valor(valor) for valor in valores]}
+
+def operacion_actualizar(num_fila, idx_campo, valor):
+    return {"op": "actualizar", "fila": num_fila, "campo": idx_campo, "valor": _codificar_valor(valor)}
+
+def operacion_reemplazar(num_fila, valores):
+    return {"op": "reemplazar", "fila": num_fila, "valores": [_codificar_valor(valor) for valor in valores]}
+
+def _filas_de_operacion(operacion):
+    if operacion["op"] == "lote":
+        return len(operacion["operaciones"])
+    return 1
+
+class DiarioOperaciones:
+    """
+    Diario de solo escritura al final, en JSON por líneas, asociado a un Excel.
+    La primera línea guarda la firma (fecha de modificación y tamaño) del Excel sobre el que
+    se registraron las operaciones; si el Excel ya no coincide, el diario no se reproduce.
+    """
+
+    def __init__(self, ruta_excel):
+        self.ruta = ruta_diario(ruta_excel)
+        self.archivo = None
+        self.filas_pendientes = 0
+
+    @staticmethod
+    def leer(ruta):
+        """
+        Devuelve (firma, operaciones) de un diario existente o (None, []) si no existe.
+        Una última línea incompleta (por ejemplo, tras un corte de energía) se ignora.
+        """
+        if not os.path.exists(ruta):
+            return None, []
+        firma = None
+        operaciones = []
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    operacion = json.loads(linea)
+                except ValueError:
+                    break
+                if operacion.get("op") == "inicio":
+                    firma = tuple(operacion["firma"]) if operacion["firma"] else None
+                else:
+                    operaciones.append(operacion)
+        return firma, operaciones
+
+    def abrir(self, firma_excel, filas_pendientes=0):
+        """Abre el diario para añadir operaciones; si no existe, lo crea con la firma del Excel."""
+        nuevo = not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0
+        self.archivo = open(self.ruta, "a", encoding="utf-8")
+        self.filas_pendientes = filas_pendientes
+        if nuevo:
+            self._escribir({"op": "inicio", "firma": firma_excel})
+
+    def _escribir(self, operacion):
+        if self.archivo is None:
+            raise RuntimeError(f"El diario '{self.ruta}' no está abierto: el listado se abrió solo para lectura.")
+        self.archivo.write(json.dumps(operacion, ensure_ascii=False) + "\n")
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+
+    def registrar(self, operacion):
+        """Añade una operación al diario y la fuerza a disco."""
+        self._escribir(operacion)
+        self.filas_pendientes += _filas_de_operacion(operacion)
+
+    def registrar_lote(self, operaciones):
+        """Añade un lote de operaciones de carga masiva como una sola entrada."""
+        if operaciones:
+            self.registrar({"op": "lote", "operaciones": operaciones})
+
+    def reiniciar(self, firma_excel):
+        """Vacía el diario tras un punto de control, asociándolo a la nueva versión del Excel."""
+        self.cerrar()
+        ruta_temporal = self.ruta + ".tmp"
+        with open(ruta_temporal, "w", encoding="utf-8") as archivo:
+            archivo.write(json.dumps({"op": "inicio", "firma": firma_excel}) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(ruta_temporal, self.ruta)
+        self.abrir(firma_excel)
+
+    def cerrar(self):
+        if self.archivo is not None:
+            self.archivo.close()
+            self.archivo = None
+
+def aplicar_operacion(operacion, tabla, anchos, indice):
+    """Reproduce una operación del diario sobre el listado en memoria."""
+    tipo = operacion["op"]
+    if tipo == "agregar":
+        agregar_fila_listado(tabla, anchos, indice, [_decodificar_valor(valor) for valor in operacion["valores"]])
+    elif tipo == "actualizar":
+        asignar_valor_listado(tabla, anchos, indice, operacion["fila"], operacion["campo"],
+                              _decodificar_valor(operacion["valor"]))
+    elif tipo == "reemplazar":
+        reemplazar_fila_listado(tabla, anchos, indice, operacion["fila"],
+                                [_decodificar_valor(valor) for valor in operacion["valores"]])
+    elif tipo == "lote":
+        for suboperacion in operacion["operaciones"]:
+            aplicar_operacion(suboperacion, tabla, anchos, indice)
+
+def recuperar_diario(ruta_excel, tabla, anchos, indice, solo_lectura=False):
+    """
+    Reproduce sobre el listado las operaciones del diario que aún no se guardaron en el Excel
+    y devuelve un `DiarioOperaciones` abierto para seguir registrando.
+    Si el diario corresponde a otra versión del Excel (modificado fuera del programa o ya
+    guardado), se conserva aparte con la extensión '.descartado' y se empieza uno nuevo.
+    Con `solo_lectura` el diario se reproduce pero no se toca: ni se descarta ni se abre.
+    """
+    firma_actual = firma_archivo(ruta_excel) if os.path.exists(ruta_excel) else None
+    diario = DiarioOperaciones(ruta_excel)
+    firma_diario, operaciones = DiarioOperaciones.leer(diario.ruta)
+
+    filas_pendientes = 0
+    if solo_lectura:
+        if operaciones and firma_diario == firma_actual:
+            for operacion in operaciones:
+                aplicar_operacion(operacion, tabla, anchos, indice)
+                filas_pendientes += _filas_de_operacion(operacion)
+        diario.filas_pendientes = filas_pendientes
+        return diario
+    if operaciones and firma_diario != firma_actual:
+        ruta_descartado = diario.ruta + ".descartado"
+        os.replace(diario.ruta, ruta_descartado)
+        print("--- ATENCIÓN ---".center(60))
+        print(f"El diario de cambios no corresponde a la versión actual de '{ruta_excel}'.")
+        print(f"No se aplicó; se conservó en '{ruta_descartado}' para revisión.")
+        print("----------------".center(60))
+    elif operaciones:
+        for operacion in operaciones:
+            aplicar_operacion(operacion, tabla, anchos, indice)
+            filas_pendientes += _filas_de_operacion(operacion)
+        print(f"Se recuperaron {filas_pendientes} cambios no guardados de la sesión anterior.")
+    elif firma_diario != firma_actual and os.path.exists(diario.ruta):
+        os.remove(diario.ruta)
+
+    diario.abrir(firma_actual, filas_pendientes)
+    return diario
+
+def punto_de_control(ruta_excel, tabla, anchos, indice, diario):
+    """Guarda el listado completo en el Excel y vacía el diario."""
+    guardar_listado(ruta_excel, tabla, anchos, indice)
+    diario.reiniciar(firma_archivo(ruta_excel))
+
+# --- Almacenamiento del Listado ---
+# Las funciones de gestión (alta, actualización y carga masiva) trabajan contra un almacén
+# con una interfaz común. El listado puede vivir en el Excel (en memoria, con caché y diario)
+# o en una base de datos SQLite, desde la que el Excel se genera solo cuando se pide.
+
+ALMACENES = ("excel", "sqlite")
+ALMACEN_POR_DEFECTO = "excel"
+NOMBRE_BASE_DATOS = "Listado_Empresas_ARL.sqlite3"
+
+class AlmacenEmpresas:
+    """
+    Interfaz común de los almacenes del listado. Cada empresa se identifica por su número de
+    fila, que sigue la numeración de la hoja de Excel (la primera empresa está en la fila 2).
+    Cada operación que modifica el listado queda a salvo antes de volver.
+    """
+
+    descripcion = ""
+    aviso_interrupcion = ""
+    indice_aproximado = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def buscar_por_razon_social(self, razon_social):
+        """Devuelve la primera fila con esa Razón Social (sin distinguir mayúsculas) o None."""
+        raise NotImplementedError
+
+    def buscar_por_nit(self, nit):
+        """Devuelve la primera fila con ese NIT (sin dígito de verificación ni puntos) o None."""
+        raise NotImplementedError
+
+    def buscar_aproximado(self, texto, k=CANDIDATOS_BUSQUEDA):
+        """
+        Devuelve hasta `k` (num_fila, puntaje, idx_campo) con las empresas cuya Razón Social o
+        Representante Legal más se parecen a `texto` (ver IndiceTrigramas.buscar). El índice se
+        construye en la primera búsqueda y desde entonces se mantiene con cada cambio.
+        """
+        if self.indice_aproximado is None:
+            self.indice_aproximado = IndiceTrigramas.desde_filas(self.iter_filas_numeradas())
+        return self.indice_aproximado.buscar(texto, k)
+
+    def _indexar_fila(self, num_fila, valores):
+        if self.indice_aproximado is not None:
+            self.indice_aproximado.registrar_fila(num_fila, valores)
+
+    def _indexar_valor(self, num_fila, idx_campo, valor):
+        if self.indice_aproximado is not None:
+            self.indice_aproximado.actualizar_valor(num_fila, idx_campo, valor)
+
+    def obtener_empresa(self, num_fila):
+        raise NotImplementedError
+
+    def agregar(self, empresa):
+        """Añade una empresa al final del listado y devuelve su número de fila."""
+        raise NotImplementedError
+
+    def asignar_valor(self, num_fila, idx_campo, valor):
+        raise NotImplementedError
+
+    def cargar_lote(self, empresas, modo_duplicados="rechazar"):
+        """
+        Añade un lote de empresas ya validadas. Las que ya estén registradas (por NIT, o por
+        Razón Social si son 'NO NIT') se omiten (`modo_duplicados="rechazar"`) o se sobrescriben
+        (`modo_duplicados="actualizar"`). Devuelve un (resultado, num_fila) por empresa, con
+        resultado "agregada", "actualizada" o "duplicada".
+        """
+        raise NotImplementedError
+
+    def escribir_lote(self, nuevas, reemplazos):
+        """
+        Añade las empresas de `nuevas` y sobrescribe las filas de `reemplazos` ({num_fila: empresa})
+        en una sola escritura, sin buscar duplicados. Devuelve los números de fila de las nuevas.
+        """
+        raise NotImplementedError
+
+    def iter_filas(self):
+        """Genera los valores de cada fila, en orden."""
+        raise NotImplementedError
+
+    def iter_filas_numeradas(self):
+        """Genera (num_fila, valores) de cada fila, en orden."""
+        raise NotImplementedError
+
+    def columnas(self):
+        """Devuelve el listado por columnas: una secuencia de valores por cada encabezado."""
+        filas = list(self.iter_filas())
+        if not filas:
+            return [[] for _ in ENCABEZADOS]
+        return [list(columna) for columna in zip(*filas)]
+
+    def guardar(self):
+        """Guarda lo que esté pendiente. Devuelve False si no había nada que guardar."""
+        return False
+
+    def punto_de_control_si_corresponde(self):
+        pass
+
+    def exportar_excel(self, ruta_excel, particion=None):
+        """
+        Escribe el listado completo en `ruta_excel` y devuelve el número de empresas exportadas.
+        `particion` son las opciones de escribir_excel_particionado (None = una sola hoja).
+        """
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+class AlmacenExcel(AlmacenEmpresas):
+    """
+    Listado en memoria (`TablaEmpresas`, anchos e índice) cargado desde el Excel o su caché.
+    Cada cambio se registra en el diario y el Excel se escribe en los puntos de control.
+    Solo un proceso a la vez puede abrirlo para modificarlo (ver bloquear_listado); con
+    `solo_lectura` (informes y exportaciones) no se bloquea y el diario solo se reproduce.
+    """
+
+    aviso_interrupcion = "Los cambios quedan en el diario y se recuperarán la próxima vez que inicie el programa."
+
+    def __init__(self, ruta_excel=NOMBRE_ARCHIVO_EXCEL, solo_lectura=False):
+        self.ruta = ruta_excel
+        self.descripcion = f"'{ruta_excel}'"
+        self.solo_lectura = solo_lectura
+        self.bloqueo = None if solo_lectura else bloquear_listado(ruta_excel)
+        try:
+            self.tabla, self.anchos, self.indice = cargar_listado(ruta_excel)
+            self.diario = recuperar_diario(ruta_excel, self.tabla, self.anchos, self.indice, solo_lectura)
+        except BaseException:
+            if self.bloqueo is not None:
+                self.bloqueo.close()
+            raise
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def buscar_por_razon_social(self, razon_social):
+        return self.indice.buscar_por_razon_social(razon_social)
+
+    def buscar_por_nit(self, nit):
+        return self.indice.buscar_por_nit(nit)
+
+    def obtener_empresa(self, num_fila):
+        return self.tabla.obtener_empresa(num_fila)
+
+    def agregar(self, empresa):
+        num_fila = agregar_fila_listado(self.tabla, self.anchos, self.indice, empresa)
+        self.diario.registrar(operacion_agregar(empresa))
+        self._indexar_fila(num_fila, empresa)
+        return num_fila
+
+    def asignar_valor(self, num_fila, idx_campo, valor):
+        asignar_valor_listado(self.tabla, self.anchos, self.indice, num_fila, idx_campo, valor)
+        self.diario.registrar(operacion_actualizar(num_fila, idx_campo, valor))
+        self._indexar_valor(num_fila, idx_campo, valor)
+
+    def cargar_lote(self, empresas, modo_duplicados="rechazar"):
+        resultados = []
+        operaciones = []
+        try:
+            for empresa in empresas:
+                num_fila = self.indice.buscar_duplicado(empresa)
+                if num_fila is None:
+                    num_fila = agregar_fila_listado(self.tabla, self.anchos, self.indice, empresa)
+                    operaciones.append(operacion_agregar(empresa))
+                    resultados.append(("agregada", num_fila))
+                elif modo_duplicados == "actualizar":
+                    reemplazar_fila_listado(self.tabla, self.anchos, self.indice, num_fila, empresa)
+                    operaciones.append(operacion_reemplazar(num_fila, empresa))
+                    resultados.append(("actualizada", num_fila))
+                else:
+                    resultados.append(("duplicada", num_fila))
+                    continue
+                self._indexar_fila(num_fila, empresa)
+        finally:
+            # Lo que ya se aplicó en memoria debe quedar en el diario aunque el lote falle a medias
+            self.diario.registrar_lote(operaciones)
+        return resultados
+
+    def escribir_lote(self, nuevas, reemplazos):
+        filas = []
+        operaciones = []
+        try:
+            for num_fila, empresa in reemplazos.items():
+                reemplazar_fila_listado(self.tabla, self.anchos, self.indice, num_fila, empresa)
+                operaciones.append(operacion_reemplazar(num_fila, empresa))
+                self._indexar_fila(num_fila, empresa)
+            for empresa in nuevas:
+                num_fila = agregar_fila_listado(self.tabla, self.anchos, self.indice, empresa)
+                operaciones.append(operacion_agregar(empresa))
+                self._indexar_fila(num_fila, empresa)
+                filas.append(num_fila)
+        finally:
+            self.diario.registrar_lote(operaciones)
+        return filas
+
+    def iter_filas(self):
+        return self.tabla.iter_filas()
+
+    def iter_filas_numeradas(self):
+        return enumerate(self.tabla.iter_filas(), start=2)
+
+    def columnas(self):
+        return self.tabla.columnas
+
+    def guardar(self):
+        if self.solo_lectura or (self.diario.filas_pendientes == 0 and os.path.exists(self.ruta)):
+            return False
+        punto_de_control(self.ruta, self.tabla, self.anchos, self.indice, self.diario)
+        return True
+
+    def punto_de_control_si_corresponde(self):
+        if not self.solo_lectura and self.diario.filas_pendientes >= FILAS_POR_PUNTO_DE_CONTROL:
+            try:
+                punto_de_control(self.ruta, self.tabla, self.anchos, self.indice, self.diario)
+                print(f"Punto de control: cambios guardados en '{self.ruta}'.")
+            except Exception as e:
+                print(f"No se pudo guardar el punto de control ({e}); los cambios siguen en el diario.")
+
+    def exportar_excel(self, ruta_excel, particion=None):
+        if particion:
+            escribir_excel_particionado(ruta_excel, self.tabla.iter_filas(), self.anchos, **particion)
+        elif os.path.abspath(ruta_excel) == os.path.abspath(self.ruta):
+            # Exportar sobre el propio Excel es guardar: así la caché y el diario siguen siendo válidos
+            punto_de_control(self.ruta, self.tabla, self.anchos, self.indice, self.diario)
+        else:
+            escribir_excel(ruta_excel, self.tabla.titulo, self.anchos, self.tabla.iter_filas())
+        return len(self.tabla)
+
+    def cerrar(self):
+        self.diario.cerrar()
+        if self.bloqueo is not None:
+            self.bloqueo.close()
+            self.bloqueo = None
+
+# Columnas de la tabla SQLite: las de ENCABEZADOS (en minúsculas) y las claves normalizadas
+# de búsqueda, indexadas igual que en `IndiceEmpresas`.
+TIPOS_SQLITE = {"CIIU": "INTEGER", "INGRESOS": "REAL"}
+COLUMNAS_SQLITE = CAMPOS_EMPRESA + ("nit_normalizado", "razon_social_normalizada")
+ESQUEMA_SQLITE = (
+    "CREATE TABLE IF NOT EXISTS empresas (fila INTEGER PRIMARY KEY, "
+    + ", ".join(f"{campo} {TIPOS_SQLITE.get(encabezado, 'TEXT')}" for campo, encabezado in zip(CAMPOS_EMPRESA, ENCABEZADOS))
+    + ", nit_normalizado TEXT, razon_social_normalizada TEXT);\n"
+    "CREATE INDEX IF NOT EXISTS empresas_nit ON empresas (nit_normalizado);\n"
+    "CREATE INDEX IF NOT EXISTS empresas_razon_social ON empresas (razon_social_normalizada);\n"
+    "CREATE INDEX IF NOT EXISTS empresas_ciiu ON empresas (ciiu);\n"
+    "CREATE INDEX IF NOT EXISTS empresas_departamento ON empresas (departamento);\n"
+)
+SQL_INSERTAR = (f"INSERT INTO empresas (fila, {', '.join(COLUMNAS_SQLITE)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNAS_SQLITE) + 1))})")
+SQL_REEMPLAZAR = f"UPDATE empresas SET {', '.join(f'{columna} = ?' for columna in COLUMNAS_SQLITE)} WHERE fila = ?"
+SQL_SELECCIONAR = f"SELECT {', '.join(CAMPOS_EMPRESA)} FROM empresas"
+# Límite prudente de parámetros por consulta (SQLite antiguo admite 999)
+PARAMETROS_POR_CONSULTA = 500
+
+def _valor_sqlite(valor):
+    """Las fechas se guardan como texto ISO (AAAA-MM-DD); el resto de valores, tal cual."""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+def _valores_sqlite(valores):
+    """Valores de una empresa en el orden de COLUMNAS_SQLITE."""
+    return [_valor_sqlite(valor) for valor in valores] + [
+        normalizar_nit(valores[IDX_NUMERO_NIT]), normalizar_razon_social(valores[IDX_RAZON_SOCIAL])]
+
+def _fila_desde_sqlite(fila):
+    """Convierte una fila leída de SQLite a los tipos del listado (fecha de matrícula como `date`)."""
+    fila = list(fila)
+    fecha = fila[IDX_FECHA_MATRICULA]
+    if isinstance(fecha, str):
+        try:
+            fila[IDX_FECHA_MATRICULA] = date.fromisoformat(fecha) if len(fecha) == 10 else datetime.fromisoformat(fecha)
         except ValueError:
-            return None, "Valor de ingresos inválido. Por favor, ingrese solo números."
-    elif nombre_campo == "CORREO":
-        if valor_ingresado and not re.match(r"[^@]+@[^@]+\.[^@]+", valor_ingresado):
-            return None, "Formato de correo electrónico inválido."
-        return valor_ingresado, None
-    elif nombre_campo == "TELEFONO":
-        if valor_ingresado and not re.fullmatch(r'\d{7}|\d{10}', valor_ingresado):
-            return None, "Formato de teléfono inválido (solo números, 7 o 10 dígitos)."
-        return valor_ingresado, None
-    elif nombre_campo == "TIPO_DE_IDENTIFICACION":
-        if valor_ingresado.upper() not in ["NIT", "NO NIT"]:
-            return None, "Tipo de identificación inválido. Debe ser 'NIT' o 'NO NIT'."
-        return valor_ingresado.upper(), None
-    elif nombre_campo == "NUMERO_DE_NIT":
-        # Esta validación se usa si el campo se ingresa, la lógica de salto está en obtener_datos_empresa_manual
-        # Permite formato "900123456-7" o solo números
-        if valor_ingresado.upper() == "N/A" or not valor_ingresado: # "N/A" o vacío siempre son válidos aquí si no es NIT
-             return valor_ingresado.upper() if valor_ingresado else "", None
-        
-        # Si no es N/A ni vacío, validar formato NIT
-        if not re.fullmatch(r'^\d{9}-\d$', valor_ingresado) and not re.fullmatch(r'^\d+$', valor_ingresado):
-            return None, "Formato de NIT inválido. Use 'XXXXXXXXX-X' o solo números."
-        return valor_ingresado, None
-    elif nombre_campo == "CIIU":
-        # CIIU: entre 4 y 5 dígitos numéricos
-        if not re.fullmatch(r'^\d{4,5}$', valor_ingresado): # MODIFICADO: Acepta 4 o 5 dígitos
-            return None, "Formato de CIIU inválido. Debe ser un número de 4 o 5 dígitos."
-        return int(valor_ingresado), None
-    
-    return valor_ingresado, None
+            pass
+    return fila
+
+class AlmacenSQLite(AlmacenEmpresas):
+    """
+    Listado guardado en una base de datos SQLite en modo WAL, con índices por NIT, Razón Social,
+    CIIU y departamento. Cada cambio se confirma en la base de datos al momento, así que no
+    necesita diario ni puntos de control; las cargas masivas se insertan por lotes en una sola
+    transacción. El Excel se genera bajo demanda con `exportar_excel`.
+    Si la base de datos está vacía y existe `ruta_excel_inicial`, se importa al abrirla.
+    """
+
+    aviso_interrupcion = "Los cambios ya confirmados quedan guardados en la base de datos."
+
+    def __init__(self, ruta_base_datos=NOMBRE_BASE_DATOS, ruta_excel_inicial=NOMBRE_ARCHIVO_EXCEL):
+        self.ruta = ruta_base_datos
+        self.descripcion = f"la base de datos '{ruta_base_datos}'"
+        # El menú abre el almacén en un hilo y lo usa desde el principal (nunca desde los dos a la vez)
+        self.conexion = sqlite3.connect(ruta_base_datos, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript(ESQUEMA_SQLITE)
+        self.siguiente_fila = self._consultar_valor("SELECT COALESCE(MAX(fila), 1) + 1 FROM empresas")
+        if self.siguiente_fila == 2 and ruta_excel_inicial and os.path.exists(ruta_excel_inicial):
+            self._importar_excel(ruta_excel_inicial)
+
+    def _consultar_valor(self, sql, parametros=()):
+        fila = self.conexion.execute(sql, parametros).fetchone()
+        return fila[0] if fila else None
+
+    def _importar_excel(self, ruta_excel):
+        """Copia a la base de datos el listado del Excel (incluidos los cambios pendientes de su diario)."""
+        almacen_excel = AlmacenExcel(ruta_excel, solo_lectura=True)
+        try:
+            print(f"Importando {len(almacen_excel)} empresas de '{ruta_excel}' a '{self.ruta}'...")
+            self.cargar_lote(list(almacen_excel.tabla.iter_empresas()), modo_duplicados="importar")
+        finally:
+            almacen_excel.cerrar()
+
+    def __len__(self):
+        return self._consultar_valor("SELECT COUNT(*) FROM empresas")
+
+    def buscar_por_razon_social(self, razon_social):
+        return self._consultar_valor("SELECT MIN(fila) FROM empresas WHERE razon_social_normalizada = ?",
+                                     (normalizar_razon_social(razon_social),))
+
+    def buscar_por_nit(self, nit):
+        return self._consultar_valor("SELECT MIN(fila) FROM empresas WHERE nit_normalizado = ?", (normalizar_nit(nit),))
+
+    def obtener_empresa(self, num_fila):
+        fila = self.conexion.execute(SQL_SELECCIONAR + " WHERE fila = ?", (num_fila,)).fetchone()
+        return Empresa(*_fila_desde_sqlite(fila)) if fila else None
+
+    def agregar(self, empresa):
+        num_fila = self.siguiente_fila
+        with self.conexion:
+            self.conexion.execute(SQL_INSERTAR, [num_fila] + _valores_sqlite(empresa))
+        self.siguiente_fila += 1
+        self._indexar_fila(num_fila, empresa)
+        return num_fila
+
+    def asignar_valor(self, num_fila, idx_campo, valor):
+        asignaciones = {CAMPOS_EMPRESA[idx_campo]: _valor_sqlite(valor)}
+        if idx_campo == IDX_NUMERO_NIT:
+            asignaciones["nit_normalizado"] = normalizar_nit(valor)
+        elif idx_campo == IDX_RAZON_SOCIAL:
+            asignaciones["razon_social_normalizada"] = normalizar_razon_social(valor)
+        sql = f"UPDATE empresas SET {', '.join(f'{columna} = ?' for columna in asignaciones)} WHERE fila = ?"
+        with self.conexion:
+            self.conexion.execute(sql, list(asignaciones.values()) + [num_fila])
+        self._indexar_valor(num_fila, idx_campo, valor)
+
+    def _buscar_filas_existentes(self, columna, claves):
+        """Devuelve {clave: primera fila} para las claves de `columna` que ya están registradas."""
+        claves = list(claves)
+        filas = {}
+        for inicio in range(0, len(claves), PARAMETROS_POR_CONSULTA):
+            bloque = claves[inicio:inicio + PARAMETROS_POR_CONSULTA]
+            sql = (f"SELECT {columna}, MIN(fila) FROM empresas "
+                   f"WHERE {columna} IN ({', '.join('?' * len(bloque))}) GROUP BY {columna}")
+            filas.update(self.conexion.execute(sql, bloque))
+        return filas
+
+    def cargar_lote(self, empresas, modo_duplicados="rechazar"):
+        # Con modo_duplicados="importar" no se buscan duplicados (copia tal cual de otro listado)
+        buscar_duplicados = modo_duplicados != "importar"
+        por_nit = {}
+        por_razon_social = {}
+        if buscar_duplicados:
+            claves_nit = {normalizar_nit(empresa[IDX_NUMERO_NIT]) for empresa in empresas
+                          if empresa[IDX_TIPO_IDENTIFICACION] != "NO NIT"}
+            claves_razon_social = {normalizar_razon_social(empresa[IDX_RAZON_SOCIAL]) for empresa in empresas
+                                   if empresa[IDX_TIPO_IDENTIFICACION] == "NO NIT"}
+            claves_nit.discard(None)
+            por_nit = self._buscar_filas_existentes("nit_normalizado", claves_nit)
+            por_razon_social = self._buscar_filas_existentes("razon_social_normalizada", claves_razon_social)
+
+        resultados = []
+        nuevas = {} # num_fila -> valores a insertar (las del propio lote se pueden sobrescribir)
+        reemplazos = {} # num_fila ya existente -> valores nuevos
+        siguiente_fila = self.siguiente_fila
+        for empresa in empresas:
+            nit = normalizar_nit(empresa[IDX_NUMERO_NIT])
+            razon_social = normalizar_razon_social(empresa[IDX_RAZON_SOCIAL])
+            num_fila = None
+            if buscar_duplicados:
+                if empresa[IDX_TIPO_IDENTIFICACION] == "NO NIT":
+                    num_fila = por_razon_social.get(razon_social)
+                else:
+                    num_fila = por_nit.get(nit)
+
+            if num_fila is None:
+                num_fila = siguiente_fila
+                siguiente_fila += 1
+                nuevas[num_fila] = empresa
+                resultados.append(("agregada", num_fila))
+            elif modo_duplicados == "actualizar":
+                if num_fila in nuevas:
+                    nuevas[num_fila] = empresa
+                else:
+                    reemplazos[num_fila] = empresa
+                resultados.append(("actualizada", num_fila))
+            else:
+                resultados.append(("duplicada", num_fila))
+                continue
+            # Las líneas siguientes del lote también deben ver esta empresa como registrada
+            if buscar_duplicados:
+                if nit:
+                    por_nit.setdefault(nit, num_fila)
+                if razon_social:
+                    por_razon_social.setdefault(razon_social, num_fila)
+
+        self._escribir(nuevas, reemplazos, siguiente_fila)
+        return resultados
+
+    def escribir_lote(self, nuevas, reemplazos):
+        filas = list(range(self.siguiente_fila, self.siguiente_fila + len(nuevas)))
+        self._escribir(dict(zip(filas, nuevas)), reemplazos, self.siguiente_fila + len(nuevas))
+        return filas
+
+    def _escribir(self, nuevas, reemplazos, siguiente_fila):
+        """Inserta `nuevas` y sobrescribe `reemplazos` (ambos {num_fila: empresa}) en una sola transacción."""
+        with self.conexion:
+            self.conexion.executemany(SQL_INSERTAR, ([num_fila] + _valores_sqlite(empresa)
+                                                     for num_fila, empresa in nuevas.items()))
+            self.conexion.executemany(SQL_REEMPLAZAR, (_valores_sqlite(empresa) + [num_fila]
+                                                       for num_fila, empresa in reemplazos.items()))
+        self.siguiente_fila = siguiente_fila
+        for cambios in (nuevas, reemplazos):
+            for num_fila, empresa in cambios.items():
+                self._indexar_fila(num_fila, empresa)
+
+    def iter_filas(self):
+        for fila in self.conexion.execute(SQL_SELECCIONAR + " ORDER BY fila"):
+            yield _fila_desde_sqlite(fila)
+
+    def iter_filas_numeradas(self):
+        for fila in self.conexion.execute(f"SELECT fila, {', '.join(CAMPOS_EMPRESA)} FROM empresas ORDER BY fila"):
+            yield fila[0], fila[1:]
+
+    def _anchos(self):
+        """Calcula los anchos de columna con una sola consulta, sin leer las filas en Python."""
+        anchos = AnchosColumnas()
+        longitudes = self.conexion.execute(
+            "SELECT " + ", ".join(f"MAX(LENGTH({campo}))" for campo in CAMPOS_EMPRESA) + " FROM empresas").fetchone()
+        for idx_campo, longitud in enumerate(longitudes):
+            if idx_campo == IDX_FECHA_MATRICULA and longitud:
+                longitud = len("DD/MM/AAAA") # Las fechas se muestran como DD/MM/AAAA
+            if longitud and longitud > anchos.maximos[idx_campo]:
+                anchos.maximos[idx_campo] = longitud
+        return anchos
+
+    def exportar_excel(self, ruta_excel, particion=None):
+        if particion:
+            escribir_excel_particionado(ruta_excel, self.iter_filas(), self._anchos(), **particion)
+        else:
+            escribir_excel(ruta_excel, TITULO_HOJA, self._anchos(), self.iter_filas())
+        return len(self)
+
+    def cerrar(self):
+        self.conexion.close()
+
+def abrir_almacen(tipo=ALMACEN_POR_DEFECTO, ruta_excel=NOMBRE_ARCHIVO_EXCEL, ruta_base_datos=NOMBRE_BASE_DATOS,
+                  solo_lectura=False):
+    """
+    Abre el almacén del listado indicado por `tipo` ('excel' o 'sqlite'). `solo_lectura` evita
+    bloquear el Excel (SQLite ya admite lectores junto a un escritor).
+    """
+    if tipo == "sqlite":
+        return AlmacenSQLite(ruta_base_datos, ruta_excel)
+    return AlmacenExcel(ruta_excel, solo_lectura)
+
+class _SalidaRetenida:
+    """
+    Sustituye a sys.stdout mientras `hilo` abre el almacén: lo que escribe ese hilo se retiene
+    para mostrarlo después y lo que escriben los demás (el menú) sale directamente.
+    """
+
+    def __init__(self, salida, hilo):
+        self.salida = salida
+        self.hilo = hilo
+        self.retenido = []
+
+    def write(self, texto):
+        if threading.current_thread() is self.hilo:
+            self.retenido.append(texto)
+            return len(texto)
+        return self.salida.write(texto)
+
+    def __getattr__(self, nombre):
+        return getattr(self.salida, nombre)
+
+class AlmacenEnSegundoPlano:
+    """
+    Abre el almacén en un hilo para que el menú aparezca de inmediato. Se usa igual que el
+    almacén: el primer acceso espera a que termine de abrirse y muestra entonces los mensajes
+    de la carga, que no se mezclan con el menú. Si no se pudo abrir, informa el error y termina
+    el programa. Mientras tanto, la carga masiva puede ir leyendo y validando líneas, porque
+    solo necesita el listado al guardar el primer lote (para buscar duplicados).
+    """
+
+    def __init__(self, tipo=ALMACEN_POR_DEFECTO, ruta_excel=NOMBRE_ARCHIVO_EXCEL, ruta_base_datos=NOMBRE_BASE_DATOS):
+        self._almacen = None
+        self._error = None
+        self._hilo = threading.Thread(target=self._abrir, args=(tipo, ruta_excel, ruta_base_datos),
+                                      name="abrir_almacen", daemon=True)
+        self._salida = sys.stdout = _SalidaRetenida(sys.stdout, self._hilo)
+        self._hilo.start()
+
+    def _abrir(self, tipo, ruta_excel, ruta_base_datos):
+        try:
+            self._almacen = abrir_almacen(tipo, ruta_excel, ruta_base_datos)
+        except BaseException as e:
+            self._error = e
+
+    def _terminar_carga(self):
+        """Espera a que termine de abrirse el almacén y muestra los mensajes retenidos (una vez)."""
+        if self._hilo.is_alive():
+            print("Esperando a que termine de cargar el listado...")
+            self._hilo.join()
+        if self._salida is not None:
+            salida, self._salida = self._salida, None
+            if sys.stdout is salida:
+                sys.stdout = salida.salida
+            salida.salida.write("".join(salida.retenido))
+
+    def esperar(self):
+        """Devuelve el almacén, esperando a que termine de abrirse si hace falta."""
+        self._terminar_carga()
+        if self._almacen is None:
+            print(f"Error: no se pudo abrir el listado: {self._error}")
+            raise SystemExit(1)
+        return self._almacen
+
+    def cerrar(self):
+        self._terminar_carga()
+        if self._almacen is not None:
+            self._almacen.cerrar()
+
+    def __getattr__(self, nombre):
+        return getattr(self.esperar(), nombre)
+
+    def __len__(self):
+        return len(self.esperar())
 
 # --- Funciones de Gestión de Empresas ---
 
@@ -133,8 +1966,7 @@ def obtener_datos_empresa_manual(modo="agregar", datos_actuales=None):
                 continue # Saltar a la siguiente iteración del bucle
             elif modo == "actualizar":
                 # Si es NIT y estamos actualizando, necesitamos el tipo de identificación actual
-                idx_tipo_id_actual = ENCABEZADOS.index("TIPO_DE_IDENTIFICACION")
-                if datos_actuales and datos_actuales[idx_tipo_id_actual] == "NO NIT":
+                if datos_actuales and datos_actuales[IDX_TIPO_IDENTIFICACION] == "NO NIT":
                     print(f"  {i+1}. {nombre_campo}: Asignando 'N/A' (Tipo de Identificación actual es 'NO NIT')")
                     datos[nombre_campo] = "N/A"
                     continue # Saltar a la siguiente iteración
@@ -160,7 +1992,7 @@ def obtener_datos_empresa_manual(modo="agregar", datos_actuales=None):
                     tipo_identificacion_ingresado = datos_actuales[i]
                 break
             
-            valor_validado, error = validar_campo(nombre_campo, valor_ingresado, requerido)
+            valor_validado, error = validar_valor(i, valor_ingresado, requerido)
             
             if nombre_campo == "TIPO_DE_IDENTIFICACION":
                 tipo_identificacion_ingresado = valor_validado
@@ -168,9 +2000,8 @@ def obtener_datos_empresa_manual(modo="agregar", datos_actuales=None):
             # Validacion cruzada de NUMERO_DE_NIT DESPUÉS de su propia validación de formato
             if nombre_campo == "NUMERO_DE_NIT":
                 # Si TIPO_DE_IDENTIFICACION es NIT, NUMERO_DE_NIT no puede ser N/A o vacío
-                if tipo_identificacion_ingresado == "NIT" and (not valor_validado or str(valor_validado).upper() == "N/A"):
-                    error = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser 'N/A' o vacío."
-                    valor_validado = None
+                if not error and tipo_identificacion_ingresado == "NIT":
+                    valor_validado, error = validar_nit_segun_tipo(tipo_identificacion_ingresado, valor_validado)
                 elif tipo_identificacion_ingresado == "NO NIT" and valor_validado not in ["N/A", ""]:
                     # Esto solo ocurriría si el usuario explícitamente puso algo diferente a N/A/vacío
                     # Aunque la lógica de salto ya debería evitar que pregunte
@@ -184,54 +2015,71 @@ def obtener_datos_empresa_manual(modo="agregar", datos_actuales=None):
                 datos[nombre_campo] = valor_validado
                 break
     
-    return datos
+    return Empresa.desde_diccionario(datos)
 
-def agregar_empresa(ws):
-    """Función para agregar una nueva empresa manualmente."""
-    nueva_empresa_data = obtener_datos_empresa_manual(modo="agregar")
-    if nueva_empresa_data is None:
+def agregar_empresa(almacen):
+    """Función para agregar una nueva empresa manualmente al `almacen` del listado."""
+    nueva_empresa = obtener_datos_empresa_manual(modo="agregar")
+    if nueva_empresa is None:
         print("Operación de adición cancelada.")
         return False
 
-    fila_a_agregar = [nueva_empresa_data[h] for h in ENCABEZADOS]
-    ws.append(fila_a_agregar)
-    print(f"\n¡Empresa '{nueva_empresa_data['RAZON_SOCIAL']}' agregada con éxito!")
+    almacen.agregar(nueva_empresa)
+    print(f"\n¡Empresa '{nueva_empresa.razon_social}' agregada con éxito!")
     return True
 
-def actualizar_empresa_interactivo(ws):
+def elegir_empresa_aproximada(almacen, texto):
+    """
+    Muestra las empresas más parecidas a `texto` (búsqueda aproximada por Razón Social y
+    Representante Legal) y devuelve la fila que elija el usuario, o None si no elige ninguna.
+    """
+    candidatas = almacen.buscar_aproximado(texto)
+    if not candidatas:
+        print(f"\nNo se encontró ninguna empresa con la Razón Social: '{texto}'.")
+        return None
+
+    print(f"\nNo hay una empresa con la Razón Social exacta '{texto}'. Empresas parecidas:")
+    for numero, (num_fila, puntaje, idx_campo) in enumerate(candidatas, start=1):
+        empresa = almacen.obtener_empresa(num_fila)
+        coincidencia = "" if idx_campo == IDX_RAZON_SOCIAL else f" - Representante Legal: {empresa[idx_campo]}"
+        print(f"  {numero}. {empresa.razon_social} (NIT: {empresa.numero_de_nit}, fila {num_fila}){coincidencia} [{puntaje:.0%}]")
+
+    while True:
+        opcion = input("Seleccione el número de la empresa (o '0' para cancelar): ").strip()
+        if opcion == '0':
+            print("Operación de actualización cancelada.")
+            return None
+        if opcion.isdigit() and 1 <= int(opcion) <= len(candidatas):
+            return candidatas[int(opcion) - 1][0]
+        print("Opción inválida. Por favor, ingrese un número del 1 al", len(candidatas), "o '0'.")
+
+def actualizar_empresa_interactivo(almacen):
     """
-    Permite actualizar una empresa existente mostrando un menú de campos.
+    Permite actualizar una empresa existente del `almacen` mostrando un menú de campos.
+    La empresa se localiza por Razón Social exacta con el índice del almacén; si no la hay, se
+    ofrecen las más parecidas (sin tildes ni puntuación, también por Representante Legal).
     """
     print("\n" + "="*60)
     print("--- ACTUALIZAR EMPRESA EXISTENTE ---".center(60))
     print("="*60 + "\n")
 
-    nombre_empresa_busqueda = input("Ingrese la RAZON SOCIAL de la empresa a actualizar (o 'fin' para cancelar): ").strip()
+    nombre_empresa_busqueda = input("Ingrese la RAZON SOCIAL (o el Representante Legal) de la empresa a actualizar (o 'fin' para cancelar): ").strip()
     if not nombre_empresa_busqueda or nombre_empresa_busqueda.lower() == 'fin':
         print("Operación de actualización cancelada.")
         return False
 
-    fila_encontrada = -1
-    datos_empresa_actuales = []
-    idx_razon_social = ENCABEZADOS.index("RAZON_SOCIAL")
-    idx_tipo_identificacion = ENCABEZADOS.index("TIPO_DE_IDENTIFICACION")
-    idx_numero_nit = ENCABEZADOS.index("NUMERO_DE_NIT")
+    fila_encontrada = almacen.buscar_por_razon_social(nombre_empresa_busqueda)
+    if fila_encontrada is None:
+        fila_encontrada = elegir_empresa_aproximada(almacen, nombre_empresa_busqueda)
 
-
-    for i, row in enumerate(ws.iter_rows(min_row=2)):
-        row_values = [cell.value for cell in row]
-        if str(row_values[idx_razon_social]).lower() == nombre_empresa_busqueda.lower():
-            fila_encontrada = i + 2
-            datos_empresa_actuales = row_values
-            break
-
-    if fila_encontrada == -1:
-        print(f"\nNo se encontró ninguna empresa con la Razón Social: '{nombre_empresa_busqueda}'.")
+    if fila_encontrada is None:
         return False
 
+    empresa_actual = almacen.obtener_empresa(fila_encontrada)
+
     print(f"\nEmpresa encontrada en la fila {fila_encontrada}:")
     for j, header in enumerate(ENCABEZADOS):
-        valor = datos_empresa_actuales[j]
+        valor = empresa_actual[j]
         if isinstance(valor, (datetime, date)):
             valor = valor.strftime("%d/%m/%Y")
         print(f"  {header}: {valor}")
@@ -246,7 +2094,7 @@ def actualizar_empresa_interactivo(ws):
         opcion_campo = input("Ingrese el número del campo: ").strip()
 
         if opcion_campo == '0':
-            print(f"\nTerminando actualización para '{nombre_empresa_busqueda}'.")
+            print(f"\nTerminando actualización para '{empresa_actual.razon_social}'.")
             break
 
         try:
@@ -262,17 +2110,15 @@ def actualizar_empresa_interactivo(ws):
         # Obtener el valor actual del tipo de identificación para validación cruzada
         # Si se va a actualizar TIPO_DE_IDENTIFICACION, usamos el nuevo valor ingresado
         # Si no, usamos el valor actual de la empresa
-        tipo_identificacion_para_validacion = datos_empresa_actuales[idx_tipo_identificacion]
+        tipo_identificacion_para_validacion = empresa_actual.tipo_de_identificacion
         
         # Si el campo a actualizar es TIPO_DE_IDENTIFICACION, el nuevo valor ingresado será el 'tipo_identificacion_para_validacion'
         # Esto se manejará en la lógica de entrada, pero lo necesitamos aquí para la validación del NIT
 
-        print(f"\n-> Actualizando: '{campo_a_actualizar}' [Actual: {datos_empresa_actuales[indice_campo]}]")
+        print(f"\n-> Actualizando: '{campo_a_actualizar}' [Actual: {empresa_actual[indice_campo]}]")
         nuevo_valor_str = input(f"  Ingrese el nuevo valor para '{campo_a_actualizar}': ").strip()
         
-        es_requerido = campo_a_actualizar not in ["CORREO", "TELEFONO", "PAGINA_WEB"]
-        
-        valor_validado, error = validar_campo(campo_a_actualizar, nuevo_valor_str, es_requerido)
+        valor_validado, error = validar_valor(indice_campo, nuevo_valor_str)
 
         # Lógica de validación cruzada para actualizar
         if campo_a_actualizar == "TIPO_DE_IDENTIFICACION":
@@ -280,11 +2126,11 @@ def actualizar_empresa_interactivo(ws):
             if tipo_identificacion_para_validacion == "NO NIT":
                 # Si cambia a NO NIT, forzar NIT a N/A y actualizar en excel
                 print("ADVERTENCIA: Si el tipo de identificación es 'NO NIT', el Número de NIT se establecerá a 'N/A'.")
-                ws.cell(row=fila_encontrada, column=idx_numero_nit + 1, value="N/A")
-                datos_empresa_actuales[idx_numero_nit] = "N/A" # Actualizar en la lista temporal
+                almacen.asignar_valor(fila_encontrada, IDX_NUMERO_NIT, "N/A")
+                empresa_actual.numero_de_nit = "N/A" # Actualizar en el registro temporal
             elif tipo_identificacion_para_validacion == "NIT":
                 # Si cambia a NIT, el NIT no puede ser N/A o vacío
-                if not datos_empresa_actuales[idx_numero_nit] or str(datos_empresa_actuales[idx_numero_nit]).upper() == "N/A":
+                if not empresa_actual.numero_de_nit or str(empresa_actual.numero_de_nit).upper() == "N/A":
                     error = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser vacío o 'N/A'. Por favor, actualice el NIT."
                     valor_validado = None # Invalidar el cambio de tipo si el NIT no es válido
 
@@ -296,23 +2142,123 @@ def actualizar_empresa_interactivo(ws):
                 else:
                     valor_validado = "N/A" # Forzar a "N/A"
                     error = None
-            elif tipo_identificacion_para_validacion == "NIT" and (not nuevo_valor_str or nuevo_valor_str.upper() == "N/A"):
-                error = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser 'N/A' o vacío."
-                valor_validado = None
+            elif tipo_identificacion_para_validacion == "NIT" and not error:
+                valor_validado, error = validar_nit_segun_tipo(tipo_identificacion_para_validacion, valor_validado)
 
         if error:
             print(f"    * Error al actualizar '{campo_a_actualizar}': {error}")
         else:
-            datos_empresa_actuales[indice_campo] = valor_validado
-            ws.cell(row=fila_encontrada, column=indice_campo + 1, value=valor_validado)
+            almacen.asignar_valor(fila_encontrada, indice_campo, valor_validado)
+            empresa_actual[indice_campo] = valor_validado
             print(f"    '{campo_a_actualizar}' actualizado exitosamente.")
     
-    print(f"\n¡Empresa '{datos_empresa_actuales[idx_razon_social]}' en la fila {fila_encontrada} actualizada exitosamente!")
+    print(f"\n¡Empresa '{empresa_actual.razon_social}' en la fila {fila_encontrada} actualizada exitosamente!")
     return True
 
-def cargar_multiples_empresas(ws):
+def validar_lineas_texto(lineas):
+    """
+    Valida líneas en formato de carga masiva (campos separados por '|') con validar_filas.
+    Devuelve un (empresa, None) o (None, mensaje_de_error) por línea, en el mismo orden.
+    """
+    return [(empresa, formatear_error_validacion(error) if error else None)
+            for empresa, error in validar_filas([linea.split('|') for linea in lineas])]
+
+def validar_lineas_carga(lineas):
+    """
+    Genera (numero_de_linea, linea, fila_ordenada, error) para cada línea recibida. Cada línea
+    se valida en cuanto llega, para que los errores de la consola se vean al momento.
+    """
+    for numero_linea, linea in lineas:
+        (fila_ordenada, error), = validar_lineas_texto([linea])
+        yield numero_linea, linea, fila_ordenada, error
+
+def _agrupar_en_lotes(iterable, tamano_lote):
+    """Genera listas de hasta `tamano_lote` elementos consecutivos de `iterable`."""
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _resultados_de_lote(lote, futuro):
+    for (numero_linea, linea), (fila_ordenada, error) in zip(lote, futuro.result()):
+        yield numero_linea, linea, fila_ordenada, error
+
+def contexto_procesos():
+    """
+    Contexto con el que se crean los procesos de validación: 'forkserver' (o 'spawn' donde no
+    existe), nunca 'fork'. Un proceso creado con fork mientras otro hilo tiene tomado un bloqueo
+    (por ejemplo, el hilo que abre el listado en segundo plano mientras importa openpyxl) hereda
+    el bloqueo tomado y puede quedarse colgado para siempre.
+    """
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+def validar_lineas_en_paralelo(lineas, trabajadores, tamano_lote=TAMANO_LOTE_VALIDACION):
+    """
+    Igual que validar_lineas_carga, pero reparte la validación en lotes de `tamano_lote`
+    líneas entre `trabajadores` procesos. Los resultados se devuelven en el orden original,
+    así que los errores se reportan igual que en la validación secuencial. Solo se mantienen
+    en vuelo unos pocos lotes por trabajador para que la memoria no crezca con la entrada.
+    """
+    max_en_vuelo = trabajadores * 2
+    pendientes = deque()
+    with ProcessPoolExecutor(max_workers=trabajadores, mp_context=contexto_procesos()) as executor:
+        for lote in _agrupar_en_lotes(lineas, tamano_lote):
+            pendientes.append((lote, executor.submit(validar_lineas_texto, [linea for _, linea in lote])))
+            while len(pendientes) >= max_en_vuelo:
+                yield from _resultados_de_lote(*pendientes.popleft())
+        while pendientes:
+            yield from _resultados_de_lote(*pendientes.popleft())
+
+def validar_lineas(lineas, trabajadores=1, tamano_lote=TAMANO_LOTE_VALIDACION):
+    """Valida las líneas de forma secuencial o en paralelo según el número de trabajadores."""
+    if trabajadores and trabajadores > 1:
+        return validar_lineas_en_paralelo(lineas, trabajadores, tamano_lote)
+    return validar_lineas_carga(lineas)
+
+def _leer_lineas_consola():
+    """Genera (numero_de_linea, linea) con las líneas pegadas en la consola hasta 'FIN_CARGA'."""
+    numero_linea = 0
+    while True:
+        linea = input("Pegue línea de empresa o 'FIN_CARGA': ").strip()
+        
+        if linea.lower() == 'fin_carga':
+            return
+        numero_linea += 1
+        if not linea: # Ignorar líneas vacías accidentales
+            continue
+        yield numero_linea, linea
+
+def _guardar_lote_carga(almacen, lote, modo_duplicados, resumen):
+    """Guarda en el almacén un lote de empresas validadas y suma los resultados a `resumen`."""
+    if not lote:
+        return
+    try:
+        resultados = almacen.cargar_lote(lote, modo_duplicados)
+    except Exception as e:
+        print(f"ERROR: No se pudo guardar un lote de {len(lote)} empresas en el listado: {e}")
+        resumen["error"] += len(lote)
+        return
+    for empresa, (resultado, num_fila) in zip(lote, resultados):
+        if resultado == "duplicada":
+            print(f"DUPLICADO: La empresa '{empresa.razon_social}' ya existe en la fila {num_fila}. Línea omitida.")
+        resumen[resultado] += 1
+
+def cargar_multiples_empresas(almacen, modo_duplicados=None,
+                              trabajadores=TRABAJADORES_VALIDACION, tamano_lote=TAMANO_LOTE_VALIDACION):
     """
-    Permite al usuario pegar múltiples líneas de empresas desde la consola.
+    Permite al usuario pegar múltiples líneas de empresas desde la consola y las guarda en el `almacen`.
+    Las empresas ya registradas (por NIT, o por Razón Social si son 'NO NIT') se rechazan
+    (`modo_duplicados="rechazar"`) o se sobrescriben (`modo_duplicados="actualizar"`);
+    si no se indica el modo, se le pregunta al usuario.
+    Con `trabajadores` > 1 las líneas se validan por lotes en varios procesos; en ese caso
+    los resultados de cada lote se muestran cuando el lote se completa o al escribir 'FIN_CARGA'.
+    Las filas aceptadas se guardan en lotes de FILAS_POR_LOTE_DIARIO (y siempre al terminar,
+    incluso si la carga se interrumpe); los duplicados de cada lote se informan al guardarlo.
     """
     print("\n" + "="*60)
     print("--- CARGA MASIVA DE EMPRESAS ---".center(60))
@@ -321,149 +2267,1331 @@ def cargar_multiples_empresas(ws):
     print(" | ".join(ENCABEZADOS))
     print("Cada empresa en una nueva línea. Cuando termine, escriba 'FIN_CARGA' en una línea separada.\n")
 
-    empresas_procesadas = 0
-    errores_en_carga = 0
-    
-    while True:
-        linea = input("Pegue línea de empresa o 'FIN_CARGA': ").strip()
-        
-        if linea.lower() == 'fin_carga':
-            break
-        if not linea: # Ignorar líneas vacías accidentales
+    if modo_duplicados is None:
+        respuesta = input("Si una empresa ya existe: (R)echazarla o (A)ctualizarla con los nuevos datos [R]: ").strip().lower()
+        modo_duplicados = "actualizar" if respuesta in ("a", "actualizar") else "rechazar"
+
+    resumen = {"agregada": 0, "actualizada": 0, "duplicada": 0, "error": 0}
+    lote = []
+    try:
+        for _, linea, fila_ordenada, error in validar_lineas(_leer_lineas_consola(), trabajadores, tamano_lote):
+            if error:
+                print(f"ERROR: En línea '{linea}' -> {error}")
+                resumen["error"] += 1
+                continue
+
+            lote.append(fila_ordenada)
+            if len(lote) >= FILAS_POR_LOTE_DIARIO:
+                _guardar_lote_carga(almacen, lote, modo_duplicados, resumen)
+                lote = []
+    except SystemExit:
+        # El listado no se pudo abrir (ver AlmacenEnSegundoPlano) y ya se informó: no hay dónde guardar
+        lote = []
+        raise
+    finally:
+        _guardar_lote_carga(almacen, lote, modo_duplicados, resumen)
+            
+    print("\n" + "="*60)
+    print("--- RESUMEN DE LA CARGA MASIVA ---".center(60))
+    print(f"Empresas añadidas exitosamente: {resumen['agregada']}".center(60))
+    if modo_duplicados == "actualizar":
+        print(f"Empresas existentes actualizadas: {resumen['actualizada']}".center(60))
+    else:
+        print(f"Duplicados omitidos: {resumen['duplicada']}".center(60))
+    print(f"Errores encontrados: {resumen['error']}".center(60))
+    print("="*60 + "\n")
+    return True
+
+# --- Importación desde Archivo (no interactiva) ---
+
+def leer_lineas_carga(origen):
+    """
+    Genera (numero_de_linea, linea) a partir de un archivo abierto en formato de carga masiva.
+    Omite líneas vacías, comentarios ('#') y la línea de encabezados si viene incluida.
+    """
+    linea_encabezados = "|".join(ENCABEZADOS)
+    for numero_linea, linea in enumerate(origen, start=1):
+        linea = linea.strip()
+        if not linea or linea.startswith("#") or linea.replace(" ", "") == linea_encabezados:
             continue
+        yield numero_linea, linea
+
+def _rutas_por_defecto_importacion(ruta_entrada):
+    """Deriva los nombres del Excel de salida y del archivo de errores a partir de la entrada."""
+    if ruta_entrada == "-":
+        base = "Carga_Masiva_Empresas"
+    else:
+        base = os.path.splitext(ruta_entrada)[0]
+    return f"{base}.xlsx", f"{base}_errores.txt"
+
+def importar_empresas_desde_archivo(ruta_entrada, ruta_salida=None, ruta_errores=None,
+                                    trabajadores=TRABAJADORES_VALIDACION, tamano_lote=TAMANO_LOTE_VALIDACION,
+                                    particion=None):
+    """
+    Importa empresas desde un archivo en formato de carga masiva ('-' para leer de stdin).
+    Las líneas se procesan como un flujo: las válidas se escriben en un Excel nuevo usando el
+    modo `write_only` de openpyxl y las rechazadas se copian, precedidas por un comentario con
+    el error, a un archivo aparte que puede corregirse e importarse de nuevo.
+    El consumo de memoria no depende del tamaño de la entrada. Con `trabajadores` > 1 la
+    validación se reparte en lotes entre varios procesos (ver validar_lineas_en_paralelo).
+    Con `particion` (opciones de escribir_excel_particionado) el Excel se reparte en particiones.
+    Devuelve una tupla (empresas_importadas, lineas_rechazadas).
+    """
+    salida_defecto, errores_defecto = _rutas_por_defecto_importacion(ruta_entrada)
+    ruta_salida = ruta_salida or salida_defecto
+    ruta_errores = ruta_errores or errores_defecto
+
+    if ruta_entrada == "-":
+        origen = sys.stdin
+    else:
+        origen = open(ruta_entrada, "r", encoding="utf-8")
+
+    # En modo write_only los anchos deben fijarse antes de escribir la primera fila,
+    # por eso se usan los anchos de los encabezados.
+    if particion:
+        escritor = EscritorParticionado(ruta_salida, AnchosColumnas(), **particion)
+        escribir_fila, guardar = escritor.agregar, escritor.guardar
+    else:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(TITULO_HOJA)
+        AnchosColumnas().aplicar(ws)
+        ws.append(crear_fila_encabezados_write_only(ws))
+        escribir_fila, guardar = ws.append, lambda: guardar_libro_atomico(wb, ruta_salida)
+
+    empresas_importadas = 0
+    lineas_rechazadas = 0
+    inicio = time.perf_counter()
+
+    try:
+        with open(ruta_errores, "w", encoding="utf-8") as archivo_errores:
+            for numero_linea, linea, fila_ordenada, error in validar_lineas(leer_lineas_carga(origen), trabajadores, tamano_lote):
+                if error:
+                    archivo_errores.write(f"# Línea {numero_linea}: {error}\n{linea}\n")
+                    lineas_rechazadas += 1
+                    continue
+                escribir_fila(fila_ordenada.a_fila())
+                empresas_importadas += 1
+        guardar()
+    finally:
+        if origen is not sys.stdin:
+            origen.close()
 
-        partes = linea.split('|')
+    duracion = time.perf_counter() - inicio
+    procesadas = empresas_importadas + lineas_rechazadas
+    velocidad = procesadas / duracion if duracion > 0 else 0.0
+
+    print("\n" + "="*60)
+    print("--- RESUMEN DE LA IMPORTACIÓN ---".center(60))
+    print(f"Empresas importadas: {empresas_importadas}".center(60))
+    print(f"Líneas rechazadas: {lineas_rechazadas}".center(60))
+    print(f"Tiempo: {duracion:.2f} s ({velocidad:,.0f} filas/s)".center(60))
+    print(f"Archivo generado: {ruta_salida}".center(60))
+    if lineas_rechazadas:
+        print(f"Detalle de errores: {ruta_errores}".center(60))
+    print("="*60 + "\n")
+
+    if not lineas_rechazadas:
+        os.remove(ruta_errores)
+    return empresas_importadas, lineas_rechazadas
+
+# --- Actualización Masiva desde Archivo (no interactiva) ---
+# Un archivo de novedades trae registros parciales separados por '|'. Si su primera línea es de
+# encabezados (solo nombres de ENCABEZADOS, en cualquier orden) define las columnas presentes;
+# si no, cada línea trae las 15 columnas en el orden de ENCABEZADOS. Un campo vacío conserva
+# el valor actual. Cada registro se identifica por NUMERO_DE_NIT, o por RAZON_SOCIAL si la
+# empresa es 'NO NIT'; si no existe y trae todos los campos obligatorios, se añade.
+
+def columnas_de_encabezado(partes):
+    """Devuelve los índices de columna si `partes` es una línea de encabezados, o None si no lo es."""
+    nombres = [parte.strip().upper() for parte in partes]
+    if nombres and all(nombre in INDICE_ENCABEZADO for nombre in nombres):
+        return [INDICE_ENCABEZADO[nombre] for nombre in nombres]
+    return None
+
+def validar_registro_parcial(columnas, partes):
+    """
+    Valida los campos no vacíos de un registro parcial.
+    Devuelve (cambios, clave, None) o (None, None, mensaje_de_error), donde `cambios` es
+    {idx_campo: valor_validado} y `clave` es ("nit", nit) o ("razon_social", razon_social),
+    ya normalizados.
+    """
+    if len(partes) != len(columnas):
+        return None, None, f"Línea inválida (campos incorrectos: {len(partes)} vs {len(columnas)} esperados)"
 
-        if len(partes) != len(ENCABEZADOS):
-            print(f"ERROR: Línea inválida (campos incorrectos: {len(partes)} vs {len(ENCABEZADOS)} esperados): {linea}")
-            errores_en_carga += 1
+    cambios = {}
+    for idx_campo, valor_str in zip(columnas, partes):
+        valor_str = valor_str.strip()
+        if not valor_str:
             continue
-        
-        datos_para_fila = {}
-        fila_valida = True
-        
-        # Pre-procesar TIPO_DE_IDENTIFICACION para la validación cruzada del NIT
-        tipo_identificacion_temp = None
-        try:
-            idx_tipo_id = ENCABEZADOS.index("TIPO_DE_IDENTIFICACION")
-            valor_tipo_id_str = partes[idx_tipo_id].strip()
-            tipo_identificacion_temp, error_tipo_id = validar_campo("TIPO_DE_IDENTIFICACION", valor_tipo_id_str, True)
-            if error_tipo_id:
-                print(f"ERROR: En línea '{linea}' -> Campo 'TIPO_DE_IDENTIFICACION': {error_tipo_id}")
-                fila_valida = False
+        valor_validado, error = validar_valor(idx_campo, valor_str)
+        if error:
+            return None, None, formatear_error_validacion((ENCABEZADOS[idx_campo], error))
+        cambios[idx_campo] = valor_validado
+
+    nit = normalizar_nit(cambios.get(IDX_NUMERO_NIT))
+    if cambios.get(IDX_TIPO_IDENTIFICACION) == "NO NIT":
+        if nit:
+            return None, None, "Si el Tipo de Identificación es 'NO NIT', el Número de NIT debe ser 'N/A' o vacío."
+        nit = None
+    if nit:
+        return cambios, ("nit", nit), None
+    if cambios.get(IDX_RAZON_SOCIAL):
+        return cambios, ("razon_social", normalizar_razon_social(cambios[IDX_RAZON_SOCIAL])), None
+    return None, None, "El registro debe traer NUMERO_DE_NIT o, si la empresa es 'NO NIT', RAZON_SOCIAL."
+
+def claves_empresa(empresa):
+    """
+    Claves con las que un registro parcial puede referirse a `empresa`, en el formato de
+    validar_registro_parcial: su Razón Social y, si tiene, su NIT (igual que el índice del almacén).
+    """
+    claves = [("razon_social", normalizar_razon_social(empresa.razon_social))]
+    nit = normalizar_nit(empresa.numero_de_nit)
+    if nit:
+        claves.append(("nit", nit))
+    return claves
+
+def combinar_registro_parcial(empresa_actual, cambios):
+    """
+    Aplica `cambios` sobre una copia de `empresa_actual` con las mismas reglas cruzadas entre
+    TIPO_DE_IDENTIFICACION y NUMERO_DE_NIT que la actualización interactiva.
+    Devuelve (empresa, None) o (None, mensaje_de_error).
+    """
+    empresa = Empresa(*empresa_actual)
+    for idx_campo, valor in cambios.items():
+        empresa[idx_campo] = valor
+    # Los campos que identifican a la empresa no se reescriben si solo cambia su formato
+    # (por ejemplo '900123456' frente a '900123456-7', o mayúsculas en la Razón Social)
+    if normalizar_nit(empresa.numero_de_nit) == normalizar_nit(empresa_actual.numero_de_nit):
+        empresa.numero_de_nit = empresa_actual.numero_de_nit
+    if normalizar_razon_social(empresa.razon_social) == normalizar_razon_social(empresa_actual.razon_social):
+        empresa.razon_social = empresa_actual.razon_social
+    if empresa.tipo_de_identificacion == "NO NIT":
+        empresa.numero_de_nit = "N/A"
+    else:
+        _, error = validar_nit_segun_tipo(empresa.tipo_de_identificacion, empresa.numero_de_nit)
+        if error:
+            return None, error
+    return empresa, None
+
+def actualizar_empresas_desde_archivo(almacen, ruta_entrada, ruta_errores=None):
+    """
+    Aplica un archivo de novedades ('-' para leer de stdin) sobre el `almacen` sin interacción.
+    Cada registro se localiza con el índice del almacén; los cambios se acumulan y se escriben
+    en lotes de FILAS_POR_LOTE_DIARIO con `escribir_lote`. Las líneas rechazadas se copian,
+    precedidas por un comentario con el error (y tras la línea de encabezados, si la había),
+    a un archivo aparte que puede corregirse y aplicarse de nuevo.
+    Devuelve un diccionario con las líneas insertadas, actualizadas, sin cambios y rechazadas.
+    """
+    ruta_errores = ruta_errores or _rutas_por_defecto_importacion(ruta_entrada)[1]
+    origen = sys.stdin if ruta_entrada == "-" else open(ruta_entrada, "r", encoding="utf-8")
+
+    resumen = {"insertadas": 0, "actualizadas": 0, "sin_cambios": 0, "rechazadas": 0}
+    columnas = list(range(len(ENCABEZADOS)))
+    nuevas = [] # empresas pendientes de añadir
+    reemplazos = {} # num_fila -> empresa pendiente de sobrescribir
+    # clave -> ("nueva", posición en `nuevas`) o ("fila", num_fila), para que las líneas siguientes
+    # encuentren los cambios aún no escritos por cualquiera de las claves de la empresa
+    pendientes = {}
+    inicio = time.perf_counter()
+
+    def buscar(clave):
+        pendiente = pendientes.get(clave)
+        if pendiente is None:
+            tipo_clave, valor_clave = clave
+            if tipo_clave == "nit":
+                num_fila = almacen.buscar_por_nit(valor_clave)
             else:
-                datos_para_fila["TIPO_DE_IDENTIFICACION"] = tipo_identificacion_temp
+                num_fila = almacen.buscar_por_razon_social(valor_clave)
+            if num_fila is not None:
+                pendiente = ("fila", num_fila)
+        return pendiente
+
+    def empresa_pendiente(pendiente):
+        tipo_pendiente, posicion = pendiente
+        if tipo_pendiente == "nueva":
+            return nuevas[posicion]
+        return reemplazos.get(posicion) or almacen.obtener_empresa(posicion)
+
+    try:
+        with open(ruta_errores, "w", encoding="utf-8") as archivo_errores:
+            primera_linea = True
+            for numero_linea, linea in leer_lineas_carga(origen):
+                partes = linea.split("|")
+                if primera_linea:
+                    primera_linea = False
+                    columnas_encabezado = columnas_de_encabezado(partes)
+                    if columnas_encabezado is not None:
+                        columnas = columnas_encabezado
+                        archivo_errores.write(linea + "\n")
+                        continue
+
+                cambios, clave, error = validar_registro_parcial(columnas, partes)
+                if not error:
+                    pendiente = buscar(clave)
+                    if (pendiente is None and clave[0] == "nit" and cambios.get(IDX_RAZON_SOCIAL)
+                            and cambios.get(IDX_TIPO_IDENTIFICACION) == "NIT"):
+                        # Una empresa 'NO NIT' que pasa a tener NIT aún no se encuentra por ese NIT:
+                        # se localiza por su Razón Social, como en la actualización interactiva
+                        candidata = buscar(("razon_social", normalizar_razon_social(cambios[IDX_RAZON_SOCIAL])))
+                        if candidata is not None and empresa_pendiente(candidata).tipo_de_identificacion == "NO NIT":
+                            pendiente = candidata
+
+                    if pendiente is None:
+                        # Empresa nueva: debe traer todos los campos obligatorios
+                        partes_completas = [""] * len(ENCABEZADOS)
+                        for idx_campo, valor_str in zip(columnas, partes):
+                            partes_completas[idx_campo] = valor_str
+                        empresa, error_fila = validar_fila_empresa(partes_completas)
+                        if error_fila:
+                            error = f"La empresa no existe y no se puede añadir: {formatear_error_validacion(error_fila)}"
+                        else:
+                            pendiente = ("nueva", len(nuevas))
+                            nuevas.append(empresa)
+                            resumen["insertadas"] += 1
+                    else:
+                        tipo_pendiente, posicion = pendiente
+                        empresa_actual = empresa_pendiente(pendiente)
+                        empresa, error = combinar_registro_parcial(empresa_actual, cambios)
+                        if error is None and empresa == empresa_actual:
+                            resumen["sin_cambios"] += 1
+                        elif error is None:
+                            if tipo_pendiente == "nueva":
+                                nuevas[posicion] = empresa
+                            else:
+                                reemplazos[posicion] = empresa
+                            resumen["actualizadas"] += 1
+                    if not error:
+                        for clave_empresa in claves_empresa(empresa):
+                            pendientes[clave_empresa] = pendiente
+
+                if error:
+                    archivo_errores.write(f"# Línea {numero_linea}: {error}\n{linea}\n")
+                    resumen["rechazadas"] += 1
+                elif len(nuevas) + len(reemplazos) >= FILAS_POR_LOTE_DIARIO:
+                    almacen.escribir_lote(nuevas, reemplazos)
+                    nuevas, reemplazos, pendientes = [], {}, {}
+            almacen.escribir_lote(nuevas, reemplazos)
+    finally:
+        if origen is not sys.stdin:
+            origen.close()
+
+    duracion = time.perf_counter() - inicio
+    procesadas = sum(resumen.values())
+    velocidad = procesadas / duracion if duracion > 0 else 0.0
+
+    print("\n" + "="*60)
+    print("--- RESUMEN DE LA ACTUALIZACIÓN MASIVA ---".center(60))
+    print(f"Empresas añadidas: {resumen['insertadas']}".center(60))
+    print(f"Empresas actualizadas: {resumen['actualizadas']}".center(60))
+    print(f"Sin cambios: {resumen['sin_cambios']}".center(60))
+    print(f"Líneas rechazadas: {resumen['rechazadas']}".center(60))
+    print(f"Tiempo: {duracion:.2f} s ({velocidad:,.0f} filas/s)".center(60))
+    if resumen["rechazadas"]:
+        print(f"Detalle de errores: {ruta_errores}".center(60))
+    print("="*60 + "\n")
+
+    if not resumen["rechazadas"]:
+        os.remove(ruta_errores)
+    return resumen
+
+def actualizar_almacen_desde_archivo(tipo_almacen, ruta_base_datos, ruta_entrada, ruta_errores=None):
+    """Ejecuta el subcomando 'actualizar' y guarda el almacén una sola vez al final."""
+    almacen = abrir_almacen(tipo_almacen, NOMBRE_ARCHIVO_EXCEL, ruta_base_datos)
+    try:
+        resumen = actualizar_empresas_desde_archivo(almacen, ruta_entrada, ruta_errores)
+        if almacen.guardar():
+            print(f"Cambios guardados en {almacen.descripcion}.")
+    finally:
+        almacen.cerrar()
+    return resumen
+
+# --- Consulta y Exportación (solo lectura) ---
+
+def _numero_o_none(valor, conversion):
+    try:
+        return conversion(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _fecha_o_none(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, str):
+        try:
+            return parsear_fecha(valor.strip())
         except ValueError:
-            fila_valida = False
-            print(f"ERROR: No se encontró el campo TIPO_DE_IDENTIFICACION en los encabezados.")
+            return None
+    return None
 
-        if not fila_valida:
-            errores_en_carga += 1
-            continue
+def construir_filtros(departamento=None, municipio=None, ciiu_min=None, ciiu_max=None, riesgo=None,
+                      ingresos_min=None, ingresos_max=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Devuelve una lista de funciones que reciben una `Empresa` y devuelven True si cumple
+    el criterio. Los textos se comparan sin distinguir
+    mayúsculas ni espacios en los extremos; los rangos incluyen sus límites.
+    """
+    filtros = []
 
-        for i, header in enumerate(ENCABEZADOS):
-            valor_str = partes[i].strip()
-            es_requerido = header not in ["CORREO", "TELEFONO", "PAGINA_WEB"]
-
-            # Lógica para NO preguntar por NIT en carga masiva si TIPO_DE_IDENTIFICACION es NO NIT
-            if header == "NUMERO_DE_NIT":
-                if tipo_identificacion_temp == "NO NIT":
-                    valor_validado = "N/A" # Asignar N/A directamente
-                    error = None # No hay error de formato si forzamos N/A
-                else: # Si es NIT, validar el número de NIT normalmente
-                    valor_validado, error = validar_campo(header, valor_str, es_requerido)
-                    if tipo_identificacion_temp == "NIT" and (not valor_validado or str(valor_validado).upper() == "N/A"):
-                        error = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser 'N/A' o vacío."
-                        valor_validado = None
-            else:
-                valor_validado, error = validar_campo(header, valor_str, es_requerido)
+    def filtro_texto(idx_campo, esperado):
+        esperado = esperado.strip().lower()
+        obtener = attrgetter(CAMPOS_EMPRESA[idx_campo])
+        return lambda empresa: str(obtener(empresa) or "").strip().lower() == esperado
 
-            if error:
-                print(f"ERROR: En línea '{linea}' -> Campo '{header}': {error}")
-                fila_valida = False
-                break
-            datos_para_fila[header] = valor_validado
+    def filtro_rango(idx_campo, minimo, maximo, conversion):
+        obtener = attrgetter(CAMPOS_EMPRESA[idx_campo])
+        def filtro(empresa):
+            valor = conversion(obtener(empresa))
+            if valor is None:
+                return False
+            return (minimo is None or valor >= minimo) and (maximo is None or valor <= maximo)
+        return filtro
+
+    if departamento:
+        filtros.append(filtro_texto(IDX_DEPARTAMENTO, departamento))
+    if municipio:
+        filtros.append(filtro_texto(IDX_MUNICIPIO, municipio))
+    if riesgo:
+        filtros.append(filtro_texto(IDX_TIPO_RIESGO, riesgo))
+    if ciiu_min is not None or ciiu_max is not None:
+        filtros.append(filtro_rango(IDX_CIIU, ciiu_min, ciiu_max, lambda valor: _numero_o_none(valor, int)))
+    if ingresos_min is not None or ingresos_max is not None:
+        filtros.append(filtro_rango(IDX_INGRESOS, ingresos_min, ingresos_max, lambda valor: _numero_o_none(valor, float)))
+    if fecha_desde is not None or fecha_hasta is not None:
+        filtros.append(filtro_rango(IDX_FECHA_MATRICULA, fecha_desde, fecha_hasta, _fecha_o_none))
+    return filtros
+
+def consultar_empresas(ruta_excel, filtros=(), limite=None, departamento=None):
+    """
+    Genera, como `Empresa`, las filas de `ruta_excel` que cumplen todos los `filtros`.
+    El Excel se abre en modo `read_only`, por lo que las filas se leen a medida que se
+    necesitan y la memoria no depende del tamaño del listado. La lectura se detiene en
+    cuanto se alcanza `limite` resultados. En un listado particionado, `departamento`
+    permite saltarse las particiones de otros departamentos.
+    """
+    if limite is not None and limite <= 0:
+        return
+    hojas = iter_hojas_listado(ruta_excel, departamento)
+    try:
+        encontradas = 0
+        for ws in hojas:
+            for fila in ws.iter_rows(min_row=2, max_col=len(ENCABEZADOS), values_only=True):
+                if all(valor is None for valor in fila):
+                    continue
+                empresa = Empresa.desde_fila(_normalizar_fila_leida(fila))
+                if all(filtro(empresa) for filtro in filtros):
+                    yield empresa
+                    encontradas += 1
+                    if limite is not None and encontradas >= limite:
+                        return
+    finally:
+        hojas.close()
+
+def _valor_exportable(valor):
+    """Convierte un valor de celda a un tipo que CSV y JSON representan sin ambigüedad."""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    return valor
+
+def exportar_filas(filas, destino, formato="csv"):
+    """
+    Escribe las empresas (o filas en el orden de ENCABEZADOS) en `destino` (un archivo de
+    texto abierto) como CSV con encabezados
+    o como JSON por líneas. Devuelve el número de filas escritas.
+    """
+    escritas = 0
+    if formato == "jsonl":
+        for fila in filas:
+            registro = {encabezado: _valor_exportable(valor) for encabezado, valor in zip(ENCABEZADOS, fila)}
+            destino.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            escritas += 1
+    else:
+        escritor = csv.writer(destino)
+        escritor.writerow(ENCABEZADOS)
+        for fila in filas:
+            escritor.writerow([_valor_exportable(valor) for valor in fila])
+            escritas += 1
+    return escritas
+
+def _fecha_argumento(texto):
+    """Convierte un argumento DD/MM/AAAA de la línea de comandos en `date`."""
+    try:
+        return parsear_fecha(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}', use DD/MM/AAAA")
+
+def consultar_y_exportar(args):
+    """Ejecuta el subcomando 'consultar' con los argumentos ya interpretados."""
+    filtros = construir_filtros(args.departamento, args.municipio, args.ciiu_min, args.ciiu_max, args.riesgo,
+                                args.ingresos_min, args.ingresos_max, args.fecha_desde, args.fecha_hasta)
+    filas = consultar_empresas(args.archivo, filtros, args.limite, args.departamento)
+    if args.salida and args.salida != "-":
+        with open(args.salida, "w", encoding="utf-8", newline="") as destino:
+            escritas = exportar_filas(filas, destino, args.formato)
+        print(f"{escritas} empresas exportadas a '{args.salida}'.", file=sys.stderr)
+    else:
+        escritas = exportar_filas(filas, sys.stdout, args.formato)
+        print(f"{escritas} empresas encontradas.", file=sys.stderr)
+    return escritas
+
+# --- Informe de Riesgos ARL (requiere NumPy) ---
+# `informe` carga las columnas del listado en arreglos de NumPy con tipo (códigos de categoría
+# para el texto, datetime64 para FECHA_DE_MATRICULA, float64 para INGRESOS) y agrupa con
+# operaciones vectorizadas (bincount, unique), sin recorrer las empresas una a una en Python.
+# NumPy es opcional: solo se importa al generar el informe.
+
+NOMBRE_INFORME = "Informe_Empresas_ARL.xlsx"
+TITULO_HOJA_INFORME = "Resumen_ARL"
+SIN_DATO = "(Sin dato)"
+ENCABEZADOS_INFORME = ["EMPRESAS", "% EMPRESAS", "INGRESOS_TOTALES", "INGRESOS_PROMEDIO"]
+FORMATOS_INFORME = ["#,##0", "0.0%", "#,##0", "#,##0"]
+
+def _importar_numpy():
+    """Devuelve el módulo numpy, o None (avisando al usuario) si no está instalado."""
+    try:
+        import numpy
+    except ImportError:
+        print("Error: el informe requiere NumPy. Instálelo con 'pip install numpy'.")
+        return None
+    return numpy
 
-        if fila_valida:
+class ArreglosEmpresas:
+    """
+    Columnas del listado como arreglos de NumPy, convertidas la primera vez que se piden.
+    Las de texto se guardan como (códigos int32, categorías), donde `categorias[codigo]` es el
+    valor (tal como aparece la primera vez, sin espacios de más) y el código 0 es siempre SIN_DATO;
+    los valores que solo difieren en mayúsculas comparten categoría. INGRESOS como float64
+    (NaN si falta), CIIU como int64 (-1 si falta) y FECHA_DE_MATRICULA como datetime64[D] (NaT si falta).
+    """
+
+    def __init__(self, np, columnas):
+        self.np = np
+        self.columnas = columnas
+        self.total = len(columnas[0]) if columnas else 0
+        self.arreglos = {}
+
+    def __len__(self):
+        return self.total
+
+    def columna(self, idx_campo):
+        if idx_campo not in self.arreglos:
+            self.arreglos[idx_campo] = self._convertir(idx_campo, self.columnas[idx_campo])
+        return self.arreglos[idx_campo]
+
+    def _convertir(self, idx_campo, valores):
+        np = self.np
+        if idx_campo == IDX_INGRESOS:
             try:
-                fila_ordenada = [datos_para_fila[h] for h in ENCABEZADOS]
-                ws.append(fila_ordenada)
-                empresas_procesadas += 1
-            except Exception as e:
-                print(f"ERROR: No se pudo añadir la línea al Excel: {linea} - {e}")
-                errores_en_carga += 1
-        else:
-            errores_en_carga += 1
-            
+                return np.array(valores, dtype=np.float64)
+            except (TypeError, ValueError):
+                return np.array([_numero_o_none(valor, float) for valor in valores], dtype=np.float64)
+        if idx_campo == IDX_CIIU:
+            ciiu = np.array([_numero_o_none(valor, int) for valor in valores], dtype=np.float64)
+            return np.where(np.isnan(ciiu), -1, ciiu).astype(np.int64)
+        if idx_campo == IDX_FECHA_MATRICULA:
+            # Días desde 1970-01-01 vistos como datetime64[D]: mucho más rápido que convertir cada `date`
+            epoca = date(1970, 1, 1).toordinal()
+            nat = np.iinfo(np.int64).min
+
+            def dias(valor):
+                fecha = valor if isinstance(valor, date) else _fecha_o_none(valor)
+                return fecha.toordinal() - epoca if fecha else nat
+
+            return np.fromiter((dias(valor) for valor in valores), dtype=np.int64,
+                               count=self.total).view("datetime64[D]")
+        return self._codificar(valores)
+
+    def _codificar(self, valores):
+        """Convierte una columna de texto en (códigos, categorías) con una sola pasada por los valores."""
+        # Guarda tanto los valores ya vistos como su clave en mayúsculas: la mayoría de los valores
+        # se repiten y se resuelven con una sola consulta al diccionario
+        codigos_por_valor = {None: 0}
+        categorias = [SIN_DATO]
+
+        def codigo(valor):
+            resultado = codigos_por_valor.get(valor)
+            if resultado is None:
+                texto = str(valor).strip()
+                clave = texto.upper()
+                resultado = codigos_por_valor.get(clave) if clave else 0
+                if resultado is None:
+                    resultado = codigos_por_valor[clave] = len(categorias)
+                    categorias.append(texto)
+                codigos_por_valor[valor] = resultado
+            return resultado
+
+        codigos = self.np.fromiter((codigo(valor) for valor in valores), dtype=self.np.int32, count=self.total)
+        return codigos, categorias
+
+def _tabla_por_codigos(np, codigos, etiquetas, ingresos):
+    """
+    Agrupa por `codigos` (enteros de 0 a len(etiquetas) - 1): número de empresas, porcentaje,
+    ingresos totales y promedio (sobre las empresas con ingresos). Omite los grupos vacíos y
+    ordena de mayor a menor número de empresas.
+    """
+    con_ingresos = ~np.isnan(ingresos)
+    cantidades = np.bincount(codigos, minlength=len(etiquetas))
+    totales = np.bincount(codigos, weights=np.where(con_ingresos, ingresos, 0.0), minlength=len(etiquetas))
+    informadas = np.bincount(codigos, weights=con_ingresos, minlength=len(etiquetas))
+    promedios = np.divide(totales, informadas, out=np.zeros(len(etiquetas)), where=informadas > 0)
+    total_empresas = max(len(codigos), 1)
+    orden = np.argsort(-cantidades, kind="stable")
+    return [[etiquetas[i], int(cantidades[i]), float(cantidades[i] / total_empresas), float(totales[i]),
+             float(promedios[i])] for i in orden if cantidades[i]]
+
+def _tabla_por_valores(np, valores, faltante, ingresos, etiqueta):
+    """Como _tabla_por_codigos, para una columna numérica: un grupo por valor distinto, en orden ascendente."""
+    unicos, codigos = np.unique(valores, return_inverse=True)
+    etiquetas = [SIN_DATO if valor == faltante else etiqueta(valor) for valor in unicos.tolist()]
+    filas = _tabla_por_codigos(np, codigos.ravel(), etiquetas, ingresos)
+    # Los grupos numéricos se leen mejor en orden (años, divisiones): el de sus valores, no el
+    # de sus etiquetas como texto; SIN_DATO va al final
+    posiciones = {etiqueta: posicion for posicion, etiqueta in enumerate(etiquetas)}
+    return sorted(filas, key=lambda fila: (fila[0] == SIN_DATO, posiciones[fila[0]]))
+
+def calcular_resumen_arl(arreglos):
+    """
+    Calcula las tablas del informe a partir de un `ArreglosEmpresas`.
+    Devuelve una lista de (título, nombre del grupo, filas).
+    """
+    np = arreglos.np
+    ingresos = arreglos.columna(IDX_INGRESOS)
+
+    tablas = []
+    for titulo, grupo, idx_campo in (("Empresas por tipo de riesgo ARL", "TIPO_DE_RIESGO_ARL", IDX_TIPO_RIESGO),
+                                     ("Empresas por departamento", "DEPARTAMENTO", IDX_DEPARTAMENTO)):
+        codigos, categorias = arreglos.columna(idx_campo)
+        tablas.append((titulo, grupo, _tabla_por_codigos(np, codigos, categorias, ingresos)))
+
+    # División CIIU: los dos primeros dígitos del código, completado con ceros a la izquierda
+    # hasta cuatro dígitos (el Excel guarda 0111 como 111); así 6201 y 62090 son la división 62
+    ciiu = arreglos.columna(IDX_CIIU)
+    digitos = np.maximum(np.floor(np.log10(np.maximum(ciiu, 1))).astype(np.int64) + 1, 4)
+    divisiones = np.where(ciiu >= 0, ciiu // 10 ** (digitos - 2), -1)
+    tablas.append(("Empresas por división CIIU", "DIVISION_CIIU",
+                   _tabla_por_valores(np, divisiones, -1, ingresos, lambda division: f"{division:02d}")))
+
+    fechas = arreglos.columna(IDX_FECHA_MATRICULA)
+    anios = np.where(np.isnat(fechas), -1, fechas.astype("datetime64[Y]").astype(np.int64) + 1970)
+    tablas.append(("Matrículas por año", "AÑO_DE_MATRICULA", _tabla_por_valores(np, anios, -1, ingresos, str)))
+    return tablas
+
+def escribir_informe_excel(ruta_excel, tablas, total_empresas):
+    """
+    Escribe las tablas del informe, una debajo de otra, en una hoja con encabezados con los
+    mismos estilos que el listado (ver aplicar_estilos_encabezados) y formatos de número.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(TITULO_HOJA_INFORME)
+    # En modo write_only los anchos se fijan antes de escribir: se calculan con todas las tablas
+    anchos = [max([len(grupo) for _, grupo, _ in tablas] + [len(str(fila[0])) for _, _, filas in tablas for fila in filas])]
+    anchos += [len(encabezado) for encabezado in ENCABEZADOS_INFORME]
+    for _, _, filas in tablas:
+        for fila in filas:
+            anchos[2] = max(anchos[2], len(f"{fila[3]:,.0f}"))
+            anchos[3] = max(anchos[3], len(f"{fila[4]:,.0f}"))
+    for col_idx, ancho in enumerate(anchos):
+        ws.column_dimensions[get_column_letter(col_idx + 1)].width = ancho + 2
+
+    titulo = WriteOnlyCell(ws, value=f"Resumen del listado: {total_empresas:,} empresas")
+    titulo.font = Font(bold=True, size=14)
+    ws.append([titulo])
+    for titulo_tabla, grupo, filas in tablas:
+        ws.append([])
+        celda_titulo = WriteOnlyCell(ws, value=titulo_tabla)
+        celda_titulo.font = Font(bold=True)
+        ws.append([celda_titulo])
+        ws.append(crear_fila_encabezados_write_only(ws, [grupo] + ENCABEZADOS_INFORME))
+        for fila in filas:
+            celdas = [fila[0]]
+            for valor, formato in zip(fila[1:], FORMATOS_INFORME):
+                celda = WriteOnlyCell(ws, value=valor)
+                celda.number_format = formato
+                celdas.append(celda)
+            ws.append(celdas)
+    guardar_libro_atomico(wb, ruta_excel)
+
+def generar_informe_arl(tipo_almacen, ruta_base_datos, ruta_salida=NOMBRE_INFORME):
+    """Ejecuta el subcomando 'informe': resume el listado del almacén y escribe el Excel del informe."""
+    np = _importar_numpy()
+    if np is None:
+        return None
+    almacen = abrir_almacen(tipo_almacen, NOMBRE_ARCHIVO_EXCEL, ruta_base_datos, solo_lectura=True)
+    try:
+        inicio = time.perf_counter()
+        arreglos = ArreglosEmpresas(np, almacen.columnas())
+    finally:
+        almacen.cerrar()
+    tablas = calcular_resumen_arl(arreglos)
+    duracion_calculo = time.perf_counter() - inicio
+    escribir_informe_excel(ruta_salida, tablas, len(arreglos))
+
+    titulo, grupo, filas = tablas[0]
     print("\n" + "="*60)
-    print("--- RESUMEN DE LA CARGA MASIVA ---".center(60))
-    print(f"Empresas añadidas exitosamente: {empresas_procesadas}".center(60))
-    print(f"Errores encontrados: {errores_en_carga}".center(60))
-    print("="*60 + "\n")
-    return True
+    print(f"--- {titulo.upper()} ---".center(60))
+    for fila in filas:
+        print(f"{str(fila[0]):<20} {fila[1]:>10,} {fila[2]:>7.1%} {fila[3]:>20,.0f}")
+    print("="*60)
+    print(f"{len(arreglos):,} empresas resumidas en {duracion_calculo:.2f} s. Informe guardado en '{ruta_salida}'.")
+    return tablas
 
 # --- Menú Principal ---
 
-def iniciar_gestion_empresas():
-    """Función principal que inicia el programa y muestra el menú inicial."""
-    
-    if os.path.exists(NOMBRE_ARCHIVO_EXCEL):
-        print(f"\nCargando archivo existente: {NOMBRE_ARCHIVO_EXCEL}")
+def iniciar_gestion_empresas(trabajadores=TRABAJADORES_VALIDACION, tamano_lote=TAMANO_LOTE_VALIDACION,
+                             tipo_almacen=ALMACEN_POR_DEFECTO, ruta_base_datos=NOMBRE_BASE_DATOS):
+    """
+    Función principal que inicia el programa y muestra el menú inicial.
+    `trabajadores` y `tamano_lote` configuran la validación de la carga masiva (opción 3).
+    `tipo_almacen` elige dónde vive el listado: 'excel' (en memoria, con diario) o 'sqlite'.
+    Cada cambio queda a salvo al momento (en el diario o en la base de datos), así que una
+    interrupción (Ctrl-C, cierre de la consola o un error al guardar) no pierde el trabajo.
+    El listado se abre en segundo plano (ver AlmacenEnSegundoPlano) mientras se muestra el menú.
+    """
+    almacen = AlmacenEnSegundoPlano(tipo_almacen, NOMBRE_ARCHIVO_EXCEL, ruta_base_datos)
+    primer_menu = True
+
+    try:
+        while True:
+            print("\n" + "="*60)
+            print("--- GESTIÓN DE EMPRESAS ---".center(60))
+            print("="*60)
+            print("1. Agregar nueva empresa (manual)")
+            print("2. Actualizar empresa existente (por Razón Social)")
+            print("3. Cargar múltiples empresas (desde consola)")
+            print("4. Salir y Guardar")
+            print("="*60)
+
+            if primer_menu:
+                # Tiempo desde que se importó el módulo hasta el primer aviso (objetivo: menos de 200 ms)
+                primer_menu = False
+                if INSTRUMENTACION is not None:
+                    INSTRUMENTACION.registrar("menú: tiempo hasta el primer aviso", time.perf_counter() - INICIO_PROGRAMA)
+            opcion = input("Seleccione una opción: ").strip()
+
+            if opcion == '1':
+                agregar_empresa(almacen)
+            elif opcion == '2':
+                actualizar_empresa_interactivo(almacen)
+            elif opcion == '3':
+                cargar_multiples_empresas(almacen, trabajadores=trabajadores, tamano_lote=tamano_lote)
+            elif opcion == '4':
+                try:
+                    if almacen.guardar():
+                        print(f"\n¡Cambios guardados en {almacen.descripcion} y saliendo del programa!")
+                    else:
+                        print(f"\nNo hay cambios pendientes en {almacen.descripcion}. ¡Saliendo del programa!")
+                except Exception as e:
+                    print(f"Error al guardar el archivo: {e}. Asegúrese de que no esté abierto en Excel.")
+                    print(almacen.aviso_interrupcion)
+                break
+            else:
+                print("Opción inválida. Por favor, intente de nuevo.")
+
+            almacen.punto_de_control_si_corresponde()
+    except (KeyboardInterrupt, EOFError):
+        print(f"\n\nPrograma interrumpido. {almacen.aviso_interrupcion}")
+    finally:
+        almacen.cerrar()
+
+def exportar_almacen(tipo_almacen, ruta_base_datos, ruta_salida, particion=None):
+    """Ejecuta el subcomando 'exportar': escribe el listado del almacén en un Excel con encabezados y estilos."""
+    if particion and tipo_almacen == "excel" and os.path.abspath(ruta_salida) == os.path.abspath(NOMBRE_ARCHIVO_EXCEL):
+        # El almacén Excel guarda su listado en una sola hoja; el particionado es solo para exportar
+        print(f"Error: no se puede particionar '{ruta_salida}' en su lugar. Indique otro archivo con --salida.")
+        return 0
+    # Exportar sobre el propio Excel es guardarlo; a otro archivo, solo leerlo
+    en_su_lugar = os.path.abspath(ruta_salida) == os.path.abspath(NOMBRE_ARCHIVO_EXCEL)
+    almacen = abrir_almacen(tipo_almacen, NOMBRE_ARCHIVO_EXCEL, ruta_base_datos, solo_lectura=not en_su_lugar)
+    try:
+        inicio = time.perf_counter()
+        exportadas = almacen.exportar_excel(ruta_salida, particion)
+        duracion = time.perf_counter() - inicio
+    finally:
+        almacen.cerrar()
+    print(f"{exportadas} empresas exportadas a '{ruta_salida}' en {duracion:.2f} s.")
+    return exportadas
+
+# --- Servicio de Ingesta (no interactivo) ---
+# Varias personas pueden enviar lotes a la vez a un servicio local en lugar de turnarse en la
+# consola. Cada lote (líneas en el formato de la opción 3) se valida en paralelo con los demás
+# y pasa a una cola acotada; un único escritor toma de la cola todos los lotes que haya (hasta
+# LOTES_POR_GRUPO) y los confirma juntos con una sola llamada a `cargar_lote`, es decir, una
+# sola escritura en el diario o una sola transacción en SQLite. Si la cola está llena, quien
+# envía espera: así la memoria no crece cuando el escritor va más lento que la validación.
+# El protocolo es HTTP mínimo, en localhost o en un socket Unix:
+#   POST /lotes[?modo=actualizar]  cuerpo: las líneas del lote  -> resultado del lote (JSON)
+#   GET /metricas                                              -> rendimiento y cola (JSON)
+
+ANFITRION_SERVICIO = "127.0.0.1"
+PUERTO_SERVICIO = 8765
+CAPACIDAD_COLA_SERVICIO = 64 # Lotes validados a la espera del escritor
+LOTES_POR_GRUPO = 32 # Máximo de lotes que se confirman juntos
+MAXIMO_BYTES_LOTE = 64 * 1024 * 1024
+MODOS_DUPLICADOS = ("rechazar", "actualizar")
+ESTADOS_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+def _ignorar_ctrl_c():
+    """Los procesos de validación ignoran Ctrl-C: el servicio decide cuándo detenerlos."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class ServicioIngesta:
+    """
+    Recibe lotes de empresas, los valida en paralelo (con `trabajadores` > 1) y los confirma en
+    grupos con un único escritor. El almacén se abre, se usa y se cierra siempre en el hilo del
+    escritor, así que nunca se usa desde dos hilos a la vez.
+    """
+
+    def __init__(self, tipo_almacen=ALMACEN_POR_DEFECTO, ruta_base_datos=NOMBRE_BASE_DATOS,
+                 trabajadores=TRABAJADORES_VALIDACION, capacidad_cola=CAPACIDAD_COLA_SERVICIO,
+                 lotes_por_grupo=LOTES_POR_GRUPO):
+        self.tipo_almacen = tipo_almacen
+        self.ruta_base_datos = ruta_base_datos
+        self.trabajadores = trabajadores
+        self.capacidad_cola = capacidad_cola
+        self.lotes_por_grupo = lotes_por_grupo
+        self.almacen = None
+        self.validacion = None
+        self.escritura = None
+        self.tarea_escritor = None
+        self.cola = asyncio.Queue(capacidad_cola)
+        self.metricas = Counter()
+        self.profundidad_maxima = 0
+        self.lotes_en_curso = 0
+        self.sin_lotes_en_curso = asyncio.Event()
+        self.sin_lotes_en_curso.set()
+        self.inicio = None # Hasta que se llame a iniciar, las métricas no tienen duración
+
+    async def iniciar(self):
+        """Abre el almacén y arranca el escritor. Debe llamarse dentro del bucle de eventos."""
+        if self.trabajadores > 1:
+            self.validacion = ProcessPoolExecutor(max_workers=self.trabajadores, mp_context=contexto_procesos(),
+                                                  initializer=_ignorar_ctrl_c)
+        else:
+            # Con un solo trabajador los lotes se siguen recibiendo y encolando a la vez, pero se
+            # validan de uno en uno en este hilo: más hilos no ayudan con una validación que usa
+            # CPU en Python. Para validar varios lotes a la vez hay que usar procesos.
+            self.validacion = ThreadPoolExecutor(max_workers=1)
+        # Los procesos trabajadores se crean ya, para que el primer lote no pague su arranque
+        await asyncio.get_running_loop().run_in_executor(self.validacion, validar_lineas_texto, [])
+        self.escritura = ThreadPoolExecutor(max_workers=1)
+        self.almacen = await self._en_escritor(abrir_almacen, self.tipo_almacen, NOMBRE_ARCHIVO_EXCEL,
+                                               self.ruta_base_datos)
+        self.inicio = time.perf_counter()
+        self.tarea_escritor = asyncio.create_task(self._escribir_grupos())
+
+    async def detener(self):
+        """Espera a que se confirmen los lotes en curso, guarda el almacén y libera los recursos."""
+        # Primero los lotes que aún se validan (no están en la cola) y luego los que esperan al escritor
+        await self.sin_lotes_en_curso.wait()
+        await self.cola.join()
+        self.tarea_escritor.cancel()
+        try:
+            await self.tarea_escritor
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self._en_escritor(self.almacen.guardar)
+        finally:
+            await self._en_escritor(self.almacen.cerrar)
+            self.escritura.shutdown()
+            self.validacion.shutdown()
+
+    def _en_escritor(self, funcion, *args):
+        return asyncio.get_running_loop().run_in_executor(self.escritura, funcion, *args)
+
+    async def procesar_lote(self, texto, modo_duplicados="rechazar"):
+        """
+        Valida las líneas de `texto`, espera a que el escritor confirme las válidas y devuelve
+        el resultado del lote: cuántas se añadieron o actualizaron, y qué líneas quedaron
+        duplicadas o rechazadas (con su número de línea dentro del lote).
+        """
+        self.lotes_en_curso += 1
+        self.sin_lotes_en_curso.clear()
+        try:
+            return await self._procesar_lote(texto, modo_duplicados)
+        finally:
+            self.lotes_en_curso -= 1
+            if not self.lotes_en_curso:
+                self.sin_lotes_en_curso.set()
+
+    async def _procesar_lote(self, texto, modo_duplicados):
+        lineas = list(leer_lineas_carga(texto.splitlines()))
+        self.metricas["lotes_recibidos"] += 1
+        self.metricas["lineas_recibidas"] += len(lineas)
+        validaciones = await asyncio.get_running_loop().run_in_executor(
+            self.validacion, validar_lineas_texto, [linea for _, linea in lineas])
+
+        validas, numeros_validas, rechazadas = [], [], []
+        for (numero_linea, _), (fila_ordenada, error) in zip(lineas, validaciones):
+            if error:
+                rechazadas.append({"linea": numero_linea, "error": error})
+            else:
+                validas.append(fila_ordenada)
+                numeros_validas.append(numero_linea)
+        self.metricas["rechazadas"] += len(rechazadas)
+
+        resultados = []
+        if validas:
+            confirmacion = asyncio.get_running_loop().create_future()
+            await self.cola.put((validas, modo_duplicados, confirmacion))
+            self.profundidad_maxima = max(self.profundidad_maxima, self.cola.qsize())
+            resultados = await confirmacion
+
+        resumen = {"lineas": len(lineas), "agregadas": 0, "actualizadas": 0, "duplicadas": [],
+                   "rechazadas": rechazadas}
+        for numero_linea, (resultado, num_fila) in zip(numeros_validas, resultados):
+            if resultado == "duplicada":
+                resumen["duplicadas"].append({"linea": numero_linea, "fila": num_fila})
+            else:
+                resumen[f"{resultado}s"] += 1
+        self.metricas["lotes_procesados"] += 1
+        return resumen
+
+    async def _escribir_grupos(self):
+        """
+        Escritor único: confirma juntos todos los lotes que esperan en la cola. Los lotes
+        consecutivos con el mismo modo de duplicados se guardan en un solo `cargar_lote` y reciben
+        su resultado en cuanto ese `cargar_lote` termina; si uno falla, fallan sus lotes y los
+        que venían detrás en el grupo, pero no los que ya se guardaron.
+        """
+        while True:
+            grupo = [await self.cola.get()]
+            while len(grupo) < self.lotes_por_grupo and not self.cola.empty():
+                grupo.append(self.cola.get_nowait())
+            inicio = time.perf_counter()
+            error = None
+            confirmados = 0
+            for _, subgrupo in groupby(grupo, key=lambda lote: lote[1]):
+                subgrupo = list(subgrupo)
+                if error is None:
+                    try:
+                        resultados = await self._en_escritor(self._confirmar_subgrupo, subgrupo)
+                        confirmados += len(subgrupo)
+                    except Exception as e:
+                        print(f"ERROR: No se pudieron guardar {len(subgrupo)} lotes en el listado: {e}")
+                        error = e
+                for posicion, (_, _, confirmacion) in enumerate(subgrupo):
+                    if confirmacion.done():
+                        pass # Quien envió el lote ya no espera la respuesta
+                    elif error is None:
+                        confirmacion.set_result(resultados[posicion])
+                    else:
+                        confirmacion.set_exception(error)
+                    self.cola.task_done()
+            self.metricas["segundos_escritura"] += time.perf_counter() - inicio
+            if confirmados:
+                self.metricas["lotes_confirmados"] += confirmados
+                self.metricas["grupos_confirmados"] += 1
+            if error is None:
+                await self._en_escritor(self.almacen.punto_de_control_si_corresponde)
+
+    def _confirmar_subgrupo(self, subgrupo):
+        """
+        Guarda (en el hilo del escritor) lotes con el mismo modo de duplicados en un solo
+        `cargar_lote`, en el orden de llegada, así que un lote ve como registradas las empresas de
+        los anteriores. Devuelve los resultados de cada lote.
+        """
+        empresas = [empresa for lote, _, _ in subgrupo for empresa in lote]
+        resultados_empresas = self.almacen.cargar_lote(empresas, subgrupo[0][1])
+        for resultado, _ in resultados_empresas:
+            self.metricas[f"{resultado}s"] += 1
+        resultados = []
+        posicion = 0
+        for lote, _, _ in subgrupo:
+            resultados.append(resultados_empresas[posicion:posicion + len(lote)])
+            posicion += len(lote)
+        return resultados
+
+    def obtener_metricas(self):
+        """Rendimiento acumulado desde el inicio del servicio y estado actual de la cola."""
+        duracion = time.perf_counter() - self.inicio if self.inicio is not None else 0.0
+        metricas = {clave: self.metricas[clave] for clave in (
+            "lotes_recibidos", "lotes_procesados", "lotes_confirmados", "lineas_recibidas", "agregadas", "actualizadas", "duplicadas",
+            "rechazadas", "grupos_confirmados")}
+        grupos = metricas["grupos_confirmados"]
+        # Solo cuentan las empresas que se escribieron: las duplicadas rechazadas no llegan al almacén
+        escritas = metricas["agregadas"] + metricas["actualizadas"]
+        metricas.update({
+            "empresas_escritas": escritas,
+            "segundos_activo": round(duracion, 3),
+            "empresas_por_segundo": round(escritas / duracion, 1) if duracion > 0 else 0.0,
+            # Solo los lotes que llegaron al escritor: los que no traían ninguna línea válida no pasan por la cola
+            "lotes_por_grupo_promedio": round(metricas["lotes_confirmados"] / grupos, 2) if grupos else 0.0,
+            "profundidad_cola": self.cola.qsize(),
+            "profundidad_cola_maxima": self.profundidad_maxima,
+            "capacidad_cola": self.capacidad_cola,
+        })
+        return metricas
+
+async def _responder_http(writer, estado, contenido):
+    cuerpo = json.dumps(contenido, ensure_ascii=False, indent=2).encode("utf-8")
+    writer.write(f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n".encode("ascii") + cuerpo)
+    await writer.drain()
+
+async def atender_conexion_http(servicio, reader, writer):
+    """Atiende una petición HTTP (una por conexión) dirigida al `servicio`."""
+    try:
+        linea_peticion = (await reader.readline()).decode("latin-1").split()
+        encabezados = {}
+        while True:
+            linea = (await reader.readline()).decode("latin-1").strip()
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(":")
+            encabezados[nombre.strip().lower()] = valor.strip()
+        if len(linea_peticion) < 2:
+            return await _responder_http(writer, 400, {"error": "Petición HTTP inválida."})
+        metodo, destino = linea_peticion[0].upper(), linea_peticion[1]
+        ruta, _, consulta = destino.partition("?")
+        parametros = dict(parametro.partition("=")[::2] for parametro in consulta.split("&") if parametro)
+
+        if ruta == "/metricas":
+            return await _responder_http(writer, 200, servicio.obtener_metricas())
+        if ruta != "/lotes":
+            return await _responder_http(writer, 404, {"error": f"Ruta desconocida: {ruta}"})
+        if metodo != "POST":
+            return await _responder_http(writer, 405, {"error": "Use POST para enviar un lote."})
+        modo_duplicados = parametros.get("modo", "rechazar")
+        if modo_duplicados not in MODOS_DUPLICADOS:
+            return await _responder_http(writer, 400, {"error": f"Modo inválido '{modo_duplicados}'. "
+                                                                f"Opciones: {', '.join(MODOS_DUPLICADOS)}."})
+        try:
+            longitud = int(encabezados.get("content-length", "0"))
+        except ValueError:
+            return await _responder_http(writer, 400, {"error": "Content-Length inválido."})
+        if longitud > MAXIMO_BYTES_LOTE:
+            return await _responder_http(writer, 413, {"error": f"El lote supera {MAXIMO_BYTES_LOTE} bytes."})
+        texto = (await reader.readexactly(longitud)).decode("utf-8-sig")
         try:
-            wb = load_workbook(NOMBRE_ARCHIVO_EXCEL)
-            ws = wb.active
-            if [cell.value for cell in ws[1]] != ENCABEZADOS:
-                print("--- ATENCIÓN ---".center(60))
-                print("Advertencia: Los encabezados del archivo existente no coinciden con los esperados.")
-                print("Esto podría causar problemas. Por favor, revise el archivo o considere iniciar uno nuevo.")
-                print("----------------".center(60))
-            aplicar_estilos_encabezados(ws)
+            resultado = await servicio.procesar_lote(texto, modo_duplicados)
         except Exception as e:
-            print(f"Error al cargar el archivo existente: {e}")
-            print("Creando un nuevo archivo en su lugar.")
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Empresas_ARL"
-            ws.append(ENCABEZADOS)
-            aplicar_estilos_encabezados(ws)
+            return await _responder_http(writer, 500, {"error": f"No se pudo guardar el lote: {e}"})
+        await _responder_http(writer, 200, resultado)
+    except (asyncio.IncompleteReadError, ConnectionError, UnicodeDecodeError):
+        pass # El cliente cerró la conexión o envió un cuerpo ilegible; no hay a quién responder
+    finally:
+        writer.close()
+
+async def servir_ingesta(servicio, anfitrion=ANFITRION_SERVICIO, puerto=PUERTO_SERVICIO, ruta_socket=None,
+                         detener=None):
+    """
+    Atiende peticiones en `anfitrion`:`puerto` (o en el socket Unix `ruta_socket`) hasta que se
+    active el evento `detener` o se interrumpa el programa; al terminar confirma lo pendiente.
+    """
+    await servicio.iniciar()
+    atender = lambda reader, writer: atender_conexion_http(servicio, reader, writer)
+    if ruta_socket:
+        servidor = await asyncio.start_unix_server(atender, path=ruta_socket)
+        direccion = f"el socket '{ruta_socket}'"
     else:
-        print(f"\nEl archivo '{NOMBRE_ARCHIVO_EXCEL}' no existe. Creando uno nuevo.")
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Empresas_ARL"
-        ws.append(ENCABEZADOS)
-        aplicar_estilos_encabezados(ws)
+        servidor = await asyncio.start_server(atender, anfitrion, puerto)
+        direccion = f"http://{anfitrion}:{puerto}"
+    detener = detener or asyncio.Event()
+    for senal in ("SIGINT", "SIGTERM"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(getattr(signal, senal), detener.set)
+        except (NotImplementedError, AttributeError):
+            pass # En Windows Ctrl-C llega como KeyboardInterrupt
+    print(f"Servicio de ingesta escuchando en {direccion} (almacén: {servicio.almacen.descripcion}). "
+          f"Ctrl-C para detenerlo.")
+    try:
+        async with servidor:
+            await detener.wait()
+    finally:
+        await servicio.detener()
+        if ruta_socket and os.path.exists(ruta_socket):
+            os.remove(ruta_socket)
+        metricas = servicio.obtener_metricas()
+        print(f"\nServicio detenido: {metricas['lotes_procesados']} lotes en {metricas['grupos_confirmados']} "
+              f"grupos; {metricas['agregadas']} empresas añadidas, {metricas['actualizadas']} actualizadas y "
+              f"{metricas['duplicadas']} duplicadas sin guardar.")
 
-    while True:
-        print("\n" + "="*60)
-        print("--- GESTIÓN DE EMPRESAS ---".center(60))
-        print("="*60)
-        print("1. Agregar nueva empresa (manual)")
-        print("2. Actualizar empresa existente (por Razón Social)")
-        print("3. Cargar múltiples empresas (desde consola)")
-        print("4. Salir y Guardar")
-        print("="*60)
-
-        opcion = input("Seleccione una opción: ").strip()
-
-        if opcion == '1':
-            if agregar_empresa(ws):
-                aplicar_estilos_encabezados(ws)
-        elif opcion == '2':
-            if actualizar_empresa_interactivo(ws):
-                aplicar_estilos_encabezados(ws)
-        elif opcion == '3':
-            if cargar_multiples_empresas(ws):
-                aplicar_estilos_encabezados(ws)
-        elif opcion == '4':
+# --- Instrumentación (opcional) ---
+# Se activa con --instrumentar o con la variable de entorno EMPRESAS_INSTRUMENTAR=1. Al activarla,
+# las funciones del camino crítico se sustituyen por versiones que miden llamadas, tiempo y filas;
+# desactivada no se envuelve nada, así que no tiene ningún costo. La validación que se hace en
+# procesos trabajadores (--trabajadores > 1) no se mide, porque ocurre en otros procesos.
+
+VARIABLE_INSTRUMENTAR = "EMPRESAS_INSTRUMENTAR"
+VARIABLE_PERFIL = "EMPRESAS_PERFIL"
+INSTRUMENTACION = None
+
+def _contar_lote(args):
+    """Filas de una llamada a `cargar_lote(self, empresas, ...)`."""
+    return len(args[1])
+
+class Instrumentacion:
+    """Acumula, por operación, el número de llamadas, el tiempo total y las filas procesadas."""
+
+    def __init__(self):
+        self.medidas = {} # nombre -> [llamadas, segundos, filas]
+        self.originales = [] # (contenedor, clave, valor original) para poder desactivarla
+        self.inicio = time.perf_counter()
+        self.activa = True
+        self.hojas_instrumentadas = False
+
+    def registrar(self, nombre, segundos, filas=0):
+        medida = self.medidas.get(nombre)
+        if medida is None:
+            medida = self.medidas[nombre] = [0, 0.0, 0]
+        medida[0] += 1
+        medida[1] += segundos
+        medida[2] += filas
+
+    def envolver(self, funcion, nombre, contar_filas=None):
+        """Devuelve `funcion` envuelta para que cada llamada se sume a la medida `nombre`."""
+        registrar = self.registrar
+        reloj = time.perf_counter
+
+        @wraps(funcion)
+        def funcion_medida(*args, **kwargs):
+            inicio = reloj()
             try:
-                wb.save(NOMBRE_ARCHIVO_EXCEL)
-                print(f"\n¡Cambios guardados en '{NOMBRE_ARCHIVO_EXCEL}' y saliendo del programa!")
-            except Exception as e:
-                print(f"Error al guardar el archivo: {e}. Asegúrese de que no esté abierto en Excel.")
-            break
+                return funcion(*args, **kwargs)
+            finally:
+                registrar(nombre, reloj() - inicio, contar_filas(args) if contar_filas else 0)
+        return funcion_medida
+
+    def sustituir(self, contenedor, clave, nombre, contar_filas=None):
+        """Envuelve `contenedor[clave]` (globales del módulo o una lista) o el método `clave` de una clase."""
+        if isinstance(contenedor, type):
+            original = contenedor.__dict__[clave]
+            setattr(contenedor, clave, self.envolver(original, nombre, contar_filas))
         else:
-            print("Opción inválida. Por favor, intente de nuevo.")
+            original = contenedor[clave]
+            contenedor[clave] = self.envolver(original, nombre, contar_filas)
+        self.originales.append((contenedor, clave, original))
+
+    def restaurar(self):
+        """Deshace todas las sustituciones, en orden inverso."""
+        for contenedor, clave, original in reversed(self.originales):
+            if isinstance(contenedor, type):
+                setattr(contenedor, clave, original)
+            else:
+                contenedor[clave] = original
+        self.originales = []
+        self.activa = False
+
+    def resumen(self, destino=None):
+        """Escribe la tabla de la sesión ordenada por tiempo total (por defecto en stderr)."""
+        destino = destino or sys.stderr
+        duracion = time.perf_counter() - self.inicio
+        ancho_nombre = max([len("Operación")] + [len(nombre) for nombre in self.medidas]) + 2
+        ancho = ancho_nombre + 50
+        print("\n" + "="*ancho, file=destino)
+        print(f"--- INSTRUMENTACIÓN DE LA SESIÓN ({duracion:.2f} s) ---".center(ancho), file=destino)
+        print("="*ancho, file=destino)
+        print(f"{'Operación':<{ancho_nombre}}{'Llamadas':>10}{'Total (s)':>11}{'Media (ms)':>12}{'Filas':>8}{'Filas/s':>9}",
+              file=destino)
+        print("-"*ancho, file=destino)
+        for nombre, (llamadas, segundos, filas) in sorted(self.medidas.items(), key=lambda item: -item[1][1]):
+            filas_por_segundo = f"{filas / segundos:,.0f}" if filas and segundos > 0 else ""
+            print(f"{nombre:<{ancho_nombre}}{llamadas:>10}{segundos:>11.3f}{segundos / llamadas * 1000:>12.3f}"
+                  f"{filas or '':>8}{filas_por_segundo:>9}", file=destino)
+        print("="*ancho, file=destino)
+
+def activar_instrumentacion():
+    """Envuelve las funciones del camino crítico y devuelve la `Instrumentacion` de la sesión."""
+    global INSTRUMENTACION
+    if INSTRUMENTACION is not None:
+        return INSTRUMENTACION
+    instrumentacion = Instrumentacion()
+    modulo = globals()
+
+    # Validación por tipo de campo: los validadores se llaman siempre desde la tabla VALIDADORES,
+    # así que basta con envolver cada entrada una vez
+    for idx_campo, encabezado in enumerate(ENCABEZADOS):
+        instrumentacion.sustituir(VALIDADORES, idx_campo, f"validar {encabezado}")
+    instrumentacion.sustituir(modulo, "validar_fila_empresa", "validar_fila_empresa", lambda args: 1)
+
+    # Altas y cambios en el listado
+    instrumentacion.sustituir(modulo, "agregar_fila_listado", "agregar_fila_listado", lambda args: 1)
+    for clase in (AlmacenExcel, AlmacenSQLite):
+        instrumentacion.sustituir(clase, "agregar", f"{clase.__name__}.agregar", lambda args: 1)
+        instrumentacion.sustituir(clase, "asignar_valor", f"{clase.__name__}.asignar_valor")
+        instrumentacion.sustituir(clase, "cargar_lote", f"{clase.__name__}.cargar_lote", _contar_lote)
+    instrumentacion.sustituir(DiarioOperaciones, "registrar", "diario: registrar (fsync)")
+
+    # ws.append de openpyxl, en hojas normales y en hojas en modo `write_only`. Las clases se
+    # envuelven cuando se importa openpyxl, para no adelantar esa importación (y el menú) al activarla.
+    def instrumentar_hojas(_):
+        if not instrumentacion.activa or instrumentacion.hojas_instrumentadas:
+            return
+        from openpyxl.worksheet.worksheet import Worksheet
+        from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+        for clase_hoja in (Worksheet, WriteOnlyWorksheet):
+            instrumentacion.sustituir(clase_hoja, "append", f"ws.append ({clase_hoja.__name__})", lambda args: 1)
+        instrumentacion.hojas_instrumentadas = True
+
+    for diferido in (Workbook, load_workbook):
+        diferido.cuando_se_importe(instrumentar_hojas)
+
+    # Lectura, estilos y escritura del Excel. Los estilos se aplican al escribir cada hoja: la fila
+    # de encabezados en modo `write_only` y los anchos de columna (o todo junto al actualizar un libro)
+    for nombre in ("load_workbook", "crear_fila_encabezados_write_only", "aplicar_estilos_encabezados",
+                   "escribir_excel", "escribir_excel_particionado", "actualizar_libro_existente",
+                   "cargar_cache", "guardar_cache", "punto_de_control"):
+        instrumentacion.sustituir(modulo, nombre, nombre)
+    instrumentacion.sustituir(AnchosColumnas, "aplicar", "AnchosColumnas.aplicar")
+    instrumentacion.sustituir(modulo, "guardar_libro_atomico", "wb.save (guardar_libro_atomico)")
+
+    # Operaciones del menú y comandos (incluyen el tiempo de espera de la consola)
+    for nombre in ("agregar_empresa", "actualizar_empresa_interactivo", "cargar_multiples_empresas",
+                   "importar_empresas_desde_archivo", "actualizar_empresas_desde_archivo", "exportar_almacen"):
+        instrumentacion.sustituir(modulo, nombre, f"[comando] {nombre}")
+
+    INSTRUMENTACION = instrumentacion
+    return instrumentacion
+
+def desactivar_instrumentacion():
+    """Restaura las funciones originales y devuelve la `Instrumentacion` que estaba activa (o None)."""
+    global INSTRUMENTACION
+    instrumentacion, INSTRUMENTACION = INSTRUMENTACION, None
+    if instrumentacion is not None:
+        instrumentacion.restaurar()
+    return instrumentacion
+
+# --- Línea de Comandos ---
+
+def main(argv=None):
+    """Punto de entrada: sin argumentos abre el menú; con un subcomando lo ejecuta sin interacción."""
+    parser = argparse.ArgumentParser(description="Gestión de empresas con clasificación ARL en Excel.")
+    parser.add_argument("--trabajadores", type=int, default=TRABAJADORES_VALIDACION,
+                        help="Procesos para validar cargas masivas (0 = uno por núcleo; 1 = secuencial).")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE_VALIDACION,
+                        help="Líneas por lote en la validación en paralelo.")
+    parser.add_argument("--almacen", choices=ALMACENES, default=ALMACEN_POR_DEFECTO,
+                        help="Dónde se guarda el listado: en el Excel (con diario) o en una base de datos SQLite.")
+    parser.add_argument("--base-datos", default=NOMBRE_BASE_DATOS,
+                        help="Base de datos SQLite a usar con --almacen sqlite.")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help=f"Mide llamadas y tiempos del camino crítico y muestra un resumen al terminar "
+                             f"(también con {VARIABLE_INSTRUMENTAR}=1).")
+    parser.add_argument("--perfil", metavar="ARCHIVO",
+                        help=f"Ejecuta con cProfile y guarda las estadísticas (pstats) en ARCHIVO "
+                             f"(también con {VARIABLE_PERFIL}=ARCHIVO).")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    # Opciones de particionado, comunes a 'importar' y 'exportar'
+    opciones_particion = argparse.ArgumentParser(add_help=False)
+    opciones_particion.add_argument("--particionar", choices=CRITERIOS_PARTICION,
+                                    help="Reparte el listado en varias hojas, por departamento o por número de filas, "
+                                         "con una hoja 'Manifiesto' que las describe.")
+    opciones_particion.add_argument("--filas-por-particion", type=int, default=LIMITE_FILAS_HOJA,
+                                    help="Máximo de filas de datos por partición (por defecto, el límite de una hoja).")
+    opciones_particion.add_argument("--archivos-separados", action="store_true",
+                                    help="Escribe cada partición en su propio .xlsx junto al archivo de salida.")
+
+    parser_importar = subparsers.add_parser(
+        "importar", parents=[opciones_particion],
+        help="Importa un archivo en formato de carga masiva a un Excel nuevo.")
+    parser_importar.add_argument("entrada", help="Archivo con líneas separadas por '|' ('-' para leer de stdin).")
+    parser_importar.add_argument("--salida", help="Excel a generar (por defecto, el nombre de la entrada con extensión .xlsx).")
+    parser_importar.add_argument("--errores", help="Archivo para las líneas rechazadas (por defecto, <entrada>_errores.txt).")
+
+    parser_consultar = subparsers.add_parser(
+        "consultar", help="Filtra el listado sin cargarlo en memoria y exporta el resultado a CSV o JSON por líneas.")
+    parser_consultar.add_argument("--archivo", default=NOMBRE_ARCHIVO_EXCEL, help="Excel a consultar.")
+    parser_consultar.add_argument("--departamento", help="Departamento exacto (sin distinguir mayúsculas).")
+    parser_consultar.add_argument("--municipio", help="Municipio exacto (sin distinguir mayúsculas).")
+    parser_consultar.add_argument("--ciiu-min", type=int, help="CIIU mínimo (inclusive).")
+    parser_consultar.add_argument("--ciiu-max", type=int, help="CIIU máximo (inclusive).")
+    parser_consultar.add_argument("--riesgo", help="Tipo de riesgo ARL exacto (Ej: 'Riesgo I').")
+    parser_consultar.add_argument("--ingresos-min", type=float, help="Ingresos mínimos (inclusive).")
+    parser_consultar.add_argument("--ingresos-max", type=float, help="Ingresos máximos (inclusive).")
+    parser_consultar.add_argument("--fecha-desde", type=_fecha_argumento, help="Fecha de matrícula desde (DD/MM/AAAA).")
+    parser_consultar.add_argument("--fecha-hasta", type=_fecha_argumento, help="Fecha de matrícula hasta (DD/MM/AAAA).")
+    parser_consultar.add_argument("--formato", choices=("csv", "jsonl"), default="csv", help="Formato de salida.")
+    parser_consultar.add_argument("--salida", help="Archivo de salida (por defecto, la salida estándar).")
+    parser_consultar.add_argument("--limite", "--limit", type=int, help="Detener la lectura al encontrar N empresas.")
+
+    parser_actualizar = subparsers.add_parser(
+        "actualizar", help="Aplica un archivo de novedades (registros parciales por NIT) al listado.")
+    parser_actualizar.add_argument("entrada", help="Archivo con líneas separadas por '|' ('-' para leer de stdin).")
+    parser_actualizar.add_argument("--errores", help="Archivo para las líneas rechazadas (por defecto, <entrada>_errores.txt).")
+
+    parser_exportar = subparsers.add_parser(
+        "exportar", parents=[opciones_particion],
+        help="Genera el Excel (con encabezados y estilos) a partir del almacén del listado.")
+    parser_exportar.add_argument("--salida", default=NOMBRE_ARCHIVO_EXCEL, help="Excel a generar.")
+
+    parser_informe = subparsers.add_parser(
+        "informe", help="Resume el listado por riesgo ARL, departamento, división CIIU y año de matrícula (requiere NumPy).")
+    parser_informe.add_argument("--salida", default=NOMBRE_INFORME, help="Excel del informe a generar.")
+
+    parser_servir = subparsers.add_parser(
+        "servir", help="Inicia un servicio local que recibe lotes de empresas de varias personas a la vez.")
+    parser_servir.add_argument("--anfitrion", default=ANFITRION_SERVICIO, help="Dirección en la que escuchar.")
+    parser_servir.add_argument("--puerto", type=int, default=PUERTO_SERVICIO, help="Puerto HTTP.")
+    parser_servir.add_argument("--socket", help="Escuchar en este socket Unix en lugar de un puerto.")
+    parser_servir.add_argument("--capacidad-cola", type=int, default=CAPACIDAD_COLA_SERVICIO,
+                               help="Lotes validados que pueden esperar al escritor antes de frenar a quien envía.")
+    parser_servir.add_argument("--lotes-por-grupo", type=int, default=LOTES_POR_GRUPO,
+                               help="Máximo de lotes que se confirman juntos.")
+
+    args = parser.parse_args(argv)
+    trabajadores = args.trabajadores if args.trabajadores > 0 else (os.cpu_count() or 1)
+    if args.tamano_lote < 1:
+        parser.error("--tamano-lote debe ser mayor que cero.")
+    if getattr(args, "capacidad_cola", 1) < 1 or getattr(args, "lotes_por_grupo", 1) < 1:
+        parser.error("--capacidad-cola y --lotes-por-grupo deben ser mayores que cero.")
+    if getattr(args, "filas_por_particion", 1) < 1:
+        parser.error("--filas-por-particion debe ser mayor que cero.")
+
+    instrumentar = args.instrumentar or os.environ.get(VARIABLE_INSTRUMENTAR, "") not in ("", "0")
+    ruta_perfil = args.perfil or os.environ.get(VARIABLE_PERFIL)
+    instrumentacion = activar_instrumentacion() if instrumentar else None
+    perfil = cProfile.Profile() if ruta_perfil else None
+
+    if perfil is not None:
+        perfil.enable()
+    try:
+        ejecutar_comando(args, trabajadores)
+    except ListadoEnUso as e:
+        print(f"Error: {e}")
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(ruta_perfil)
+            print(f"\nPerfil guardado en '{ruta_perfil}' (ábralo con pstats o snakeviz). Funciones más costosas:",
+                  file=sys.stderr)
+            pstats.Stats(perfil, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+        if instrumentacion is not None:
+            instrumentacion.resumen()
+            desactivar_instrumentacion()
+
+def _opciones_particion(args):
+    """Traduce --particionar y compañía a las opciones de escribir_excel_particionado (None = sin particionar)."""
+    if (not getattr(args, "particionar", None) and not getattr(args, "archivos_separados", False)
+            and getattr(args, "filas_por_particion", LIMITE_FILAS_HOJA) >= LIMITE_FILAS_HOJA):
+        return None
+    return {"por": args.particionar or "filas", "filas_por_particion": args.filas_por_particion,
+            "archivos_separados": args.archivos_separados}
+
+def ejecutar_comando(args, trabajadores):
+    """Ejecuta el subcomando indicado en `args` (o el menú interactivo si no hay ninguno)."""
+    if args.comando == "importar":
+        importar_empresas_desde_archivo(args.entrada, args.salida, args.errores, trabajadores, args.tamano_lote,
+                                        _opciones_particion(args))
+    elif args.comando == "consultar":
+        consultar_y_exportar(args)
+    elif args.comando == "actualizar":
+        actualizar_almacen_desde_archivo(args.almacen, args.base_datos, args.entrada, args.errores)
+    elif args.comando == "exportar":
+        exportar_almacen(args.almacen, args.base_datos, args.salida, _opciones_particion(args))
+    elif args.comando == "informe":
+        generar_informe_arl(args.almacen, args.base_datos, args.salida)
+    elif args.comando == "servir":
+        servicio = ServicioIngesta(args.almacen, args.base_datos, trabajadores, args.capacidad_cola, args.lotes_por_grupo)
+        try:
+            asyncio.run(servir_ingesta(servicio, args.anfitrion, args.puerto, args.socket))
+        except KeyboardInterrupt:
+            pass
+    else:
+        iniciar_gestion_empresas(trabajadores, args.tamano_lote, args.almacen, args.base_datos)
 
 if __name__ == "__main__":
-    iniciar_gestion_empresas()
\ No newline at end of file
+    main()
\ No newline at end of file
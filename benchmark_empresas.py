@@ -0,0 +1,529 @@
+"""
+Benchmarks y generador de datos sintéticos de Empresas.py.
+
+Uso:
+    python benchmark_empresas.py suite [--tamanos 1000,100000,1000000] [--fases ...] [--salida informe.json]
+    python benchmark_empresas.py generar N archivo.txt [--invalidas 0.05]
+    python benchmark_empresas.py validacion [--filas N]
+    python benchmark_empresas.py registro [--filas N]
+
+suite: genera listados sintéticos de cada tamaño y mide la validación y alta, el guardado,
+la carga (desde el Excel y desde la caché), `aplicar_estilos_encabezados`, la búsqueda por
+Razón Social y el tiempo que tarda `python Empresas.py` en mostrar el menú (con y sin caché).
+Cada fase se mide en un proceso nuevo; informa filas/s y memoria (RSS: el pico del proceso y
+cuánto lo subió la fase) en JSON para comparar entre ejecuciones.
+
+generar: escribe N líneas sintéticas en el formato de carga masiva.
+
+validacion: compara la validación de carga masiva anterior (cadena de `if nombre_campo == ...`
+con `re.match`/`strptime` en cada campo) con el motor por tabla de `Empresas.validar_filas`,
+verifica que ambos den el mismo resultado y muestra las filas/s de cada uno.
+
+registro: compara la memoria por fila y el costo de leer campos de una empresa guardada como
+dict, como lista con `ENCABEZADOS.index(...)` y como `Empresas.Empresa` (`__slots__`).
+"""
+from datetime import datetime
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+from openpyxl import Workbook
+
+import Empresas
+from Empresas import ENCABEZADOS
+
+LINEAS_MUESTRA = [
+    "Persona Juridica|24/06/2025|ACME SAS|NIT|900123456-7|62090|125000000|Bolivar|Cartagena|Calle 1 # 2-3|info@acme.com|3101234567|www.acme.com|Juan Perez|Riesgo I",
+    "Persona Natural|01/02/2019|Tienda Dona Ana|NO NIT|N/A|4711|35000000|Cundinamarca|Bogota|Cra 7 # 45-10||6012345||Ana Gomez|Riesgo II",
+    "Est. Ag. Suc|15/11/2010|Transportes del Norte|NIT|800765432|4923|980000000.5|Atlantico|Barranquilla|Via 40 # 80-12|contacto@tdn.co|3004567890|www.tdn.co|Luis Mora|Riesgo V",
+    "Persona Juridica|31/02/2020|Fecha Invalida SAS|NIT|900111222-3|62010|1000|Bolivar|Cartagena|Calle 2|x@y.co|3101234567||Pedro|Riesgo I",
+    "Persona Juridica|10/10/2020|Correo Invalido SAS|NIT|900111222-3|62010|1000|Bolivar|Cartagena|Calle 2|sin-arroba|3101234567||Pedro|Riesgo I",
+    "Persona Juridica|10/10/2020|Sin NIT SAS|NIT|N/A|62010|1000|Bolivar|Cartagena|Calle 2|x@y.co|3101234567||Pedro|Riesgo I",
+]
+
+# --- Implementación anterior, conservada solo como referencia para comparar ---
+
+def _validar_campo_anterior(nombre_campo, valor_ingresado, requerido=True):
+    if requerido and not valor_ingresado and valor_ingresado != "":
+        return None, f"El campo '{nombre_campo}' es obligatorio."
+    if not valor_ingresado and not requerido and valor_ingresado == "":
+        return valor_ingresado, None
+    if nombre_campo == "FECHA_DE_MATRICULA":
+        try:
+            return datetime.strptime(valor_ingresado, "%d/%m/%Y").date(), None
+        except ValueError:
+            return None, "Formato de fecha incorrecto. Por favor, use DD/MM/AAAA."
+    elif nombre_campo == "INGRESOS":
+        try:
+            return float(valor_ingresado), None
+        except ValueError:
+            return None, "Valor de ingresos inválido. Por favor, ingrese solo números."
+    elif nombre_campo == "CORREO":
+        if valor_ingresado and not re.match(r"[^@]+@[^@]+\.[^@]+", valor_ingresado):
+            return None, "Formato de correo electrónico inválido."
+        return valor_ingresado, None
+    elif nombre_campo == "TELEFONO":
+        if valor_ingresado and not re.fullmatch(r'\d{7}|\d{10}', valor_ingresado):
+            return None, "Formato de teléfono inválido (solo números, 7 o 10 dígitos)."
+        return valor_ingresado, None
+    elif nombre_campo == "TIPO_DE_IDENTIFICACION":
+        if valor_ingresado.upper() not in ["NIT", "NO NIT"]:
+            return None, "Tipo de identificación inválido. Debe ser 'NIT' o 'NO NIT'."
+        return valor_ingresado.upper(), None
+    elif nombre_campo == "NUMERO_DE_NIT":
+        if valor_ingresado.upper() == "N/A" or not valor_ingresado:
+            return valor_ingresado.upper() if valor_ingresado else "", None
+        if not re.fullmatch(r'^\d{9}-\d$', valor_ingresado) and not re.fullmatch(r'^\d+$', valor_ingresado):
+            return None, "Formato de NIT inválido. Use 'XXXXXXXXX-X' o solo números."
+        return valor_ingresado, None
+    elif nombre_campo == "CIIU":
+        if not re.fullmatch(r'^\d{4,5}$', valor_ingresado):
+            return None, "Formato de CIIU inválido. Debe ser un número de 4 o 5 dígitos."
+        return int(valor_ingresado), None
+    return valor_ingresado, None
+
+def _validar_partes_anterior(partes):
+    if len(partes) != len(ENCABEZADOS):
+        return None, (None, f"Línea inválida (campos incorrectos: {len(partes)} vs {len(ENCABEZADOS)} esperados)")
+    idx_tipo_id = ENCABEZADOS.index("TIPO_DE_IDENTIFICACION")
+    tipo_identificacion_temp, error = _validar_campo_anterior("TIPO_DE_IDENTIFICACION", partes[idx_tipo_id].strip(), True)
+    if error:
+        return None, ("TIPO_DE_IDENTIFICACION", error)
+    datos_para_fila = {}
+    for i, header in enumerate(ENCABEZADOS):
+        valor_str = partes[i].strip()
+        es_requerido = header not in ["CORREO", "TELEFONO", "PAGINA_WEB"]
+        if header == "NUMERO_DE_NIT":
+            if tipo_identificacion_temp == "NO NIT":
+                valor_validado, error = "N/A", None
+            else:
+                valor_validado, error = _validar_campo_anterior(header, valor_str, es_requerido)
+                if tipo_identificacion_temp == "NIT" and (not valor_validado or str(valor_validado).upper() == "N/A"):
+                    error = "Si el Tipo de Identificación es 'NIT', el Número de NIT no puede ser 'N/A' o vacío."
+                    valor_validado = None
+        else:
+            valor_validado, error = _validar_campo_anterior(header, valor_str, es_requerido)
+        if error:
+            return None, (header, error)
+        datos_para_fila[header] = valor_validado
+    return [datos_para_fila[h] for h in ENCABEZADOS], None
+
+# --- Generador de datos sintéticos ---
+
+DEPARTAMENTOS_MUNICIPIOS = {
+    "Antioquia": ["Medellin", "Bello", "Itagui", "Envigado", "Rionegro", "Apartado"],
+    "Atlantico": ["Barranquilla", "Soledad", "Malambo", "Puerto Colombia"],
+    "Bogota D.C.": ["Bogota"],
+    "Bolivar": ["Cartagena", "Magangue", "Turbaco", "El Carmen de Bolivar"],
+    "Boyaca": ["Tunja", "Duitama", "Sogamoso", "Chiquinquira"],
+    "Caldas": ["Manizales", "La Dorada", "Chinchina"],
+    "Cundinamarca": ["Soacha", "Facatativa", "Zipaquira", "Chia", "Fusagasuga"],
+    "Meta": ["Villavicencio", "Acacias", "Granada"],
+    "Narino": ["Pasto", "Tumaco", "Ipiales"],
+    "Norte de Santander": ["Cucuta", "Ocana", "Pamplona"],
+    "Santander": ["Bucaramanga", "Floridablanca", "Giron", "Barrancabermeja"],
+    "Valle del Cauca": ["Cali", "Palmira", "Buenaventura", "Tulua", "Cartago"],
+}
+ORGANIZACIONES = ["Persona Natural", "Persona Juridica", "Est. Ag. Suc", "Sociedad por Acciones Simplificada"]
+CODIGOS_CIIU = ["0111", "1011", "1410", "2511", "4111", "4330", "4711", "4719", "4923",
+                "5611", "6201", "6202", "62090", "6810", "6920", "7020", "8010", "8621", "9602"]
+RIESGOS_ARL = ["Riesgo I", "Riesgo II", "Riesgo III", "Riesgo IV", "Riesgo V"]
+PALABRAS_RAZON_SOCIAL = ["Inversiones", "Comercializadora", "Distribuciones", "Servicios", "Construcciones",
+                         "Transportes", "Tecnologia", "Soluciones", "Agropecuaria", "Consultores",
+                         "Andina", "del Caribe", "del Pacifico", "Integral", "Global", "Express"]
+SUFIJOS_RAZON_SOCIAL = ["S.A.S.", "SAS", "S.A.", "LTDA", "E.U.", ""]
+NOMBRES = ["Ana", "Luis", "Carlos", "Maria", "Jorge", "Paola", "Andres", "Diana", "Camilo", "Laura"]
+APELLIDOS = ["Gomez", "Rodriguez", "Martinez", "Lopez", "Perez", "Garcia", "Hernandez", "Mora", "Diaz"]
+PESOS_DIGITO_VERIFICACION = [3, 7, 13, 17, 19, 23, 29, 37, 41, 43, 47, 53, 59, 67, 71]
+
+def digito_verificacion_nit(nit):
+    """Calcula el dígito de verificación de un NIT colombiano (algoritmo de la DIAN)."""
+    suma = sum(int(digito) * peso for digito, peso in zip(reversed(nit), PESOS_DIGITO_VERIFICACION))
+    residuo = suma % 11
+    return str(11 - residuo if residuo > 1 else residuo)
+
+def _campos_validos(aleatorio, numero):
+    """Genera los 15 campos (como texto) de una empresa válida."""
+    departamento = aleatorio.choice(list(DEPARTAMENTOS_MUNICIPIOS))
+    nombre = f"{aleatorio.choice(PALABRAS_RAZON_SOCIAL)} {aleatorio.choice(PALABRAS_RAZON_SOCIAL)} {numero}"
+    sufijo = aleatorio.choice(SUFIJOS_RAZON_SOCIAL)
+    if aleatorio.random() < 0.15:
+        tipo_identificacion, nit = "NO NIT", "N/A"
+    else:
+        base = str(800000000 + numero)
+        tipo_identificacion = "NIT"
+        nit = f"{base}-{digito_verificacion_nit(base)}" if aleatorio.random() < 0.8 else base
+    dominio = nombre.lower().replace(" ", "")
+    telefono = f"3{aleatorio.randrange(10**9):09d}" if aleatorio.random() < 0.7 else f"{aleatorio.randrange(10**7):07d}"
+    return [
+        aleatorio.choice(ORGANIZACIONES),
+        f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/{aleatorio.randint(1990, 2025)}",
+        f"{nombre} {sufijo}".strip(),
+        tipo_identificacion,
+        nit,
+        aleatorio.choice(CODIGOS_CIIU),
+        str(aleatorio.randrange(5_000_000, 50_000_000_000, 1000)),
+        departamento,
+        aleatorio.choice(DEPARTAMENTOS_MUNICIPIOS[departamento]),
+        f"Calle {aleatorio.randint(1, 200)} # {aleatorio.randint(1, 99)}-{aleatorio.randint(1, 99)}",
+        f"contacto@{dominio}.com.co" if aleatorio.random() < 0.8 else "",
+        telefono if aleatorio.random() < 0.9 else "",
+        f"www.{dominio}.com.co" if aleatorio.random() < 0.5 else "",
+        f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)}",
+        aleatorio.choice(RIESGOS_ARL),
+    ]
+
+def _invalidar(aleatorio, campos):
+    """Introduce en la fila uno de los errores de formato habituales."""
+    error = aleatorio.randrange(7)
+    if error == 0:
+        campos[1] = f"{aleatorio.randint(29, 31)}/02/2023" # Fecha inexistente
+    elif error == 1:
+        campos[3], campos[4] = "NIT", "12AB34" # NIT con letras
+    elif error == 2:
+        campos[3], campos[4] = "NIT", "N/A" # NIT obligatorio ausente
+    elif error == 3:
+        campos[5] = "123" # CIIU de 3 dígitos
+    elif error == 4:
+        campos[10] = "correo-sin-arroba" # Correo inválido
+    elif error == 5:
+        campos[11] = "12345" # Teléfono de 5 dígitos
+    else:
+        campos.pop() # Falta un campo
+    return campos
+
+def generar_lineas(num_filas, semilla=2025, proporcion_invalidas=0.05):
+    """
+    Genera `num_filas` líneas en el formato de carga masiva (ENCABEZADOS separados por '|'),
+    con departamentos y municipios colombianos, CIIU reales, NIT con dígito de verificación
+    y una `proporcion_invalidas` de filas con errores. Con la misma semilla siempre produce
+    las mismas líneas.
+    """
+    aleatorio = random.Random(semilla)
+    for numero in range(num_filas):
+        campos = _campos_validos(aleatorio, numero)
+        if aleatorio.random() < proporcion_invalidas:
+            campos = _invalidar(aleatorio, campos)
+        yield "|".join(campos)
+
+# --- Microbenchmarks ---
+
+def _medir(funcion, repeticiones=3):
+    """Ejecuta `funcion` varias veces y devuelve (mejor_tiempo_en_segundos, resultado)."""
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+def benchmark_validacion(num_filas):
+    """Valida `num_filas` filas con ambas implementaciones y muestra las filas/s."""
+    filas = [LINEAS_MUESTRA[i % len(LINEAS_MUESTRA)].split("|") for i in range(num_filas)]
+
+    tiempo_anterior, resultado_anterior = _medir(lambda: [_validar_partes_anterior(partes) for partes in filas])
+    tiempo_nuevo, resultado_nuevo = _medir(lambda: Empresas.validar_filas(filas))
+    resultado_nuevo = [(empresa.a_fila() if empresa is not None else None, error) for empresa, error in resultado_nuevo]
+
+    if resultado_anterior != resultado_nuevo:
+        raise SystemExit("ERROR: la validación nueva no produce los mismos resultados que la anterior.")
+
+    print(f"Filas validadas: {num_filas}")
+    print(f"  Anterior (if/elif + re.* + strptime): {num_filas / tiempo_anterior:>12,.0f} filas/s")
+    print(f"  Tabla de validadores (validar_filas): {num_filas / tiempo_nuevo:>12,.0f} filas/s")
+    print(f"  Mejora: x{tiempo_anterior / tiempo_nuevo:.2f}")
+
+def _memoria_por_fila(construir, num_filas):
+    """Devuelve los bytes por fila que ocupan `num_filas` objetos creados con `construir`."""
+    gc.collect()
+    tracemalloc.start()
+    objetos = [construir(i) for i in range(num_filas)]
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objetos
+    return actual / num_filas
+
+def benchmark_registro(num_filas):
+    """Compara dict, lista y `Empresa` en memoria por fila y en lectura de campos."""
+    fila, _ = Empresas.validar_fila_empresa(LINEAS_MUESTRA[0].split("|"))
+    valores = fila.a_fila()
+    formas = {
+        "dict": lambda i: dict(zip(ENCABEZADOS, valores)),
+        "lista": lambda i: list(valores),
+        "Empresa (__slots__)": lambda i: Empresas.Empresa(*valores),
+    }
+    lecturas = {
+        "dict": lambda registro: (registro["RAZON_SOCIAL"], registro["NUMERO_DE_NIT"], registro["CIIU"]),
+        "lista": lambda registro: (registro[ENCABEZADOS.index("RAZON_SOCIAL")],
+                                   registro[ENCABEZADOS.index("NUMERO_DE_NIT")],
+                                   registro[ENCABEZADOS.index("CIIU")]),
+        "Empresa (__slots__)": lambda registro: (registro.razon_social, registro.numero_de_nit, registro.ciiu),
+    }
+    print(f"Registros: {num_filas}")
+    for nombre, construir in formas.items():
+        bytes_por_fila = _memoria_por_fila(construir, num_filas)
+        registros = [construir(i) for i in range(num_filas)]
+        leer = lecturas[nombre]
+        tiempo, _ = _medir(lambda: [leer(registro) for registro in registros])
+        print(f"  {nombre:<20} {bytes_por_fila:>8.0f} bytes/fila  {num_filas / tiempo:>14,.0f} lecturas/s")
+
+# --- Suite de benchmarks de los flujos de Empresas.py ---
+
+TAMANOS_SUITE = (1_000, 100_000, 1_000_000)
+FASES_SUITE = ("validacion_y_alta", "guardar", "carga_xlsx", "carga_cache", "estilos", "busqueda_razon_social",
+               "arranque_menu")
+BUSQUEDAS_POR_TAMANO = 10_000
+AVISO_MENU = "Seleccione una opción:".encode("utf-8")
+
+def rss_maximo_mb():
+    """
+    Pico de memoria residente del proceso, en MB, o None si la plataforma no lo informa.
+    Es el máximo desde que arrancó el proceso: por eso cada fase se mide en un proceso nuevo.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(maximo / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _resultado(tamano, fase, segundos, operaciones, rss_inicial, unidad="filas"):
+    """
+    Resultado de una medida. `rss_maximo_mb` es el pico del proceso (preparación del listado
+    incluida) y `rss_fase_mb`, cuánto lo subió la fase sobre `rss_inicial`, el pico al empezarla.
+    Con `rss_inicial` None no se informa memoria (la fase ocurrió en otro proceso).
+    """
+    rss = rss_maximo_mb() if rss_inicial is not None else None
+    return {
+        "tamano": tamano,
+        "fase": fase,
+        "segundos": round(segundos, 4),
+        "operaciones": operaciones,
+        "unidad": unidad,
+        "por_segundo": round(operaciones / segundos, 1) if segundos > 0 else None,
+        "rss_maximo_mb": rss,
+        "rss_fase_mb": round(rss - rss_inicial, 1) if rss is not None else None,
+    }
+
+def medir_arranque_menu(directorio):
+    """
+    Segundos desde que se lanza `python Empresas.py` en `directorio` hasta que el menú pide una
+    opción. El proceso se detiene en cuanto aparece el aviso, sin esperar a que cargue el listado.
+    """
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "-u", os.path.abspath(Empresas.__file__)], cwd=directorio,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+    salida = b""
+    try:
+        while AVISO_MENU not in salida:
+            bloque = os.read(proceso.stdout.fileno(), 4096)
+            if not bloque:
+                raise RuntimeError(f"Empresas.py terminó sin mostrar el menú:\n{salida.decode('utf-8', 'replace')}")
+            salida += bloque
+        return time.perf_counter() - inicio
+    finally:
+        proceso.kill()
+        proceso.communicate()
+
+def ejecutar_fase(tamano, fase, semilla, directorio):
+    """
+    Prepara un listado sintético de `tamano` filas, mide `fase` y devuelve sus resultados.
+    Lo llama ejecutar_suite en un proceso nuevo por fase, así que el pico de memoria que
+    informa no arrastra el de fases o tamaños anteriores.
+    """
+    resultados = []
+    ruta_excel = os.path.join(directorio, f"Listado_{tamano}.xlsx")
+    lineas = list(generar_lineas(tamano, semilla))
+    tabla, anchos, indice = Empresas.TablaEmpresas(), Empresas.AnchosColumnas(), Empresas.IndiceEmpresas()
+
+    # La validación y el alta siempre se ejecutan: las demás fases necesitan el listado
+    rss_inicial = rss_maximo_mb()
+    inicio = time.perf_counter()
+    for _, _, empresa, error in Empresas.validar_lineas(enumerate(lineas, start=1)):
+        if error is None:
+            Empresas.agregar_fila_listado(tabla, anchos, indice, empresa)
+    duracion = time.perf_counter() - inicio
+    if fase == "validacion_y_alta":
+        resultados.append(_resultado(tamano, fase, duracion, tamano, rss_inicial))
+    del lineas
+
+    if fase in ("guardar", "carga_xlsx", "carga_cache"):
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        Empresas.guardar_listado(ruta_excel, tabla, anchos, indice)
+        if fase == "guardar":
+            resultados.append(_resultado(tamano, fase, time.perf_counter() - inicio, len(tabla), rss_inicial))
+
+    if fase == "carga_xlsx":
+        os.remove(Empresas.ruta_cache(ruta_excel))
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Empresas.cargar_listado(ruta_excel)
+        resultados.append(_resultado(tamano, fase, time.perf_counter() - inicio, len(tabla), rss_inicial))
+
+    if fase == "carga_cache":
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Empresas.cargar_listado(ruta_excel)
+        resultados.append(_resultado(tamano, fase, time.perf_counter() - inicio, len(tabla), rss_inicial))
+
+    if fase == "estilos":
+        wb = Workbook()
+        ws = wb.active
+        ws.append(ENCABEZADOS)
+        for fila in tabla.iter_filas():
+            ws.append(fila)
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        Empresas.aplicar_estilos_encabezados(ws)
+        resultados.append(_resultado(tamano, "estilos_recorriendo_hoja", time.perf_counter() - inicio, len(tabla),
+                                     rss_inicial))
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        Empresas.aplicar_estilos_encabezados(ws, anchos)
+        resultados.append(_resultado(tamano, "estilos_anchos_incrementales", time.perf_counter() - inicio, len(tabla),
+                                     rss_inicial))
+
+    if fase == "busqueda_razon_social" and len(tabla):
+        aleatorio = random.Random(semilla)
+        razones_sociales = tabla.columnas[Empresas.IDX_RAZON_SOCIAL]
+        nombres = [razones_sociales[aleatorio.randrange(len(tabla))].upper() for _ in range(BUSQUEDAS_POR_TAMANO)]
+        rss_inicial = rss_maximo_mb()
+        inicio = time.perf_counter()
+        for nombre in nombres:
+            indice.buscar_por_razon_social(nombre)
+        resultados.append(_resultado(tamano, fase, time.perf_counter() - inicio, len(nombres), rss_inicial,
+                                     unidad="busquedas"))
+
+    if fase == "arranque_menu":
+        # Empresas.py abre el listado con su nombre fijo en el directorio de trabajo
+        directorio_menu = os.path.join(directorio, f"menu_{tamano}")
+        os.makedirs(directorio_menu, exist_ok=True)
+        ruta_menu = os.path.join(directorio_menu, Empresas.NOMBRE_ARCHIVO_EXCEL)
+        Empresas.guardar_listado(ruta_menu, tabla, anchos, indice)
+        for nombre, sin_cache in (("arranque_menu_con_cache", False), ("arranque_menu_sin_cache", True)):
+            if sin_cache:
+                os.remove(Empresas.ruta_cache(ruta_menu))
+            resultados.append(_resultado(tamano, nombre, medir_arranque_menu(directorio_menu), 1, None,
+                                         unidad="arranques"))
+
+    for archivo in (ruta_excel, Empresas.ruta_cache(ruta_excel)):
+        if os.path.exists(archivo):
+            os.remove(archivo)
+    return resultados
+
+def ejecutar_suite(tamanos, fases, semilla, directorio):
+    """Ejecuta cada fase de cada tamaño en un proceso nuevo y devuelve la lista de resultados."""
+    resultados = []
+    ruta_resultados = os.path.join(directorio, "fase.json")
+    for tamano in tamanos:
+        for fase in fases:
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "fase", str(tamano), fase, ruta_resultados,
+                 "--semilla", str(semilla), "--directorio", directorio],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, encoding="utf-8")
+            if proceso.returncode != 0:
+                raise RuntimeError(f"La fase '{fase}' con {tamano} filas falló:\n{proceso.stderr}")
+            with open(ruta_resultados, "r", encoding="utf-8") as archivo:
+                resultados.extend(json.load(archivo))
+    return resultados
+
+def benchmark_suite(tamanos, fases, semilla, ruta_salida=None):
+    """Ejecuta la suite y escribe el informe JSON en `ruta_salida` (o en la salida estándar)."""
+    with tempfile.TemporaryDirectory(prefix="bench_empresas_") as directorio:
+        resultados = ejecutar_suite(tamanos, fases, semilla, directorio)
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "plataforma": platform.platform(),
+        "semilla": semilla,
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if ruta_salida:
+        with open(ruta_salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+        print(f"Informe guardado en '{ruta_salida}'.")
+    else:
+        print(texto)
+    return informe
+
+# --- Línea de Comandos ---
+
+def _lista_de_tamanos(texto):
+    try:
+        tamanos = [int(parte) for parte in texto.split(",") if parte.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de tamaños inválida: '{texto}'")
+    if not tamanos or any(tamano < 1 for tamano in tamanos):
+        raise argparse.ArgumentTypeError("los tamaños deben ser enteros positivos")
+    return tamanos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks de Empresas.py.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    parser_suite = subparsers.add_parser("suite", help="Mide los flujos principales con listados sintéticos.")
+    parser_suite.add_argument("--tamanos", type=_lista_de_tamanos, default=list(TAMANOS_SUITE),
+                              help="Tamaños separados por comas (por defecto 1000,100000,1000000).")
+    parser_suite.add_argument("--fases", nargs="+", choices=FASES_SUITE, default=list(FASES_SUITE),
+                              help="Fases a medir (por defecto, todas).")
+    parser_suite.add_argument("--semilla", type=int, default=2025, help="Semilla del generador de datos.")
+    parser_suite.add_argument("--salida", help="Archivo JSON para el informe (por defecto, la salida estándar).")
+    parser_generar = subparsers.add_parser("generar", help="Genera líneas sintéticas en formato de carga masiva.")
+    parser_generar.add_argument("filas", type=int, help="Número de líneas a generar.")
+    parser_generar.add_argument("archivo", help="Archivo de salida ('-' para la salida estándar).")
+    parser_generar.add_argument("--invalidas", type=float, default=0.05, help="Proporción de líneas con errores.")
+    parser_generar.add_argument("--semilla", type=int, default=2025, help="Semilla del generador de datos.")
+    parser_validacion = subparsers.add_parser("validacion", help="Validación de filas de carga masiva.")
+    parser_validacion.add_argument("--filas", type=int, default=100_000, help="Número de filas a validar.")
+    parser_registro = subparsers.add_parser("registro", help="Memoria y acceso a campos por tipo de registro.")
+    parser_registro.add_argument("--filas", type=int, default=100_000, help="Número de registros a crear.")
+    # Uso interno de la suite: una fase de un tamaño, en un proceso aparte
+    parser_fase = subparsers.add_parser("fase")
+    parser_fase.add_argument("tamano", type=int)
+    parser_fase.add_argument("fase", choices=FASES_SUITE)
+    parser_fase.add_argument("salida")
+    parser_fase.add_argument("--semilla", type=int, default=2025)
+    parser_fase.add_argument("--directorio", required=True)
+    args = parser.parse_args(argv)
+
+    if args.benchmark == "suite":
+        benchmark_suite(args.tamanos, args.fases, args.semilla, args.salida)
+    elif args.benchmark == "generar":
+        destino = sys.stdout if args.archivo == "-" else open(args.archivo, "w", encoding="utf-8")
+        try:
+            for linea in generar_lineas(args.filas, args.semilla, args.invalidas):
+                destino.write(linea + "\n")
+        finally:
+            if destino is not sys.stdout:
+                destino.close()
+    elif args.benchmark == "validacion":
+        benchmark_validacion(args.filas)
+    elif args.benchmark == "registro":
+        benchmark_registro(args.filas)
+    elif args.benchmark == "fase":
+        resultados = ejecutar_fase(args.tamano, args.fase, args.semilla, args.directorio)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo)
+
+if __name__ == "__main__":
+    main()
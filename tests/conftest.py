@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Empresas
+
+
+def linea_empresa(razon_social="Tienda Uno", nit="900123456-7", tipo="NIT", ciiu="6201", ingresos="1000",
+                  departamento="Antioquia", representante="Ana Pérez"):
+    """Línea válida en formato de carga masiva, con los campos que más usan las pruebas."""
+    return "|".join(["S.A.S", "15/06/2020", razon_social, tipo, nit, ciiu, ingresos, departamento, "Medellín",
+                     "Cra 1 # 2-3", "contacto@empresa.co", "3001234567", "", representante, "Riesgo I"])
+
+
+def empresa(**campos):
+    """Empresa ya validada a partir de linea_empresa."""
+    resultado, error = Empresas.validar_fila_empresa(linea_empresa(**campos).split("|"))
+    assert error is None, error
+    return resultado
+
+
+@pytest.fixture
+def en_directorio_temporal(tmp_path, monkeypatch):
+    """Ejecuta la prueba en un directorio vacío: los almacenes usan rutas relativas por defecto."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(params=Empresas.ALMACENES)
+def almacen(request, en_directorio_temporal):
+    """Almacén vacío de cada tipo ('excel' y 'sqlite'), en un directorio temporal."""
+    almacen = Empresas.abrir_almacen(request.param)
+    yield almacen
+    almacen.cerrar()
@@ -0,0 +1,65 @@
+import Empresas
+
+from conftest import empresa, linea_empresa
+
+
+def _actualizar(almacen, directorio, lineas):
+    ruta = directorio / "novedades.txt"
+    ruta.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+    return Empresas.actualizar_empresas_desde_archivo(almacen, str(ruta))
+
+
+def _parcial(**campos):
+    """Registro sin encabezado (las 15 columnas) con solo los `campos` indicados."""
+    partes = [""] * len(Empresas.ENCABEZADOS)
+    for nombre, valor in campos.items():
+        partes[Empresas.INDICE_ENCABEZADO[nombre.upper()]] = valor
+    return "|".join(partes)
+
+
+def test_empresa_nueva_se_encuentra_por_nit_y_por_razon_social(almacen, en_directorio_temporal):
+    resumen = _actualizar(almacen, en_directorio_temporal, [
+        linea_empresa(razon_social="Tienda Nueva", nit="800111222", ingresos="1000"),
+        _parcial(razon_social="TIENDA NUEVA", ingresos="2000"),
+        _parcial(numero_de_nit="800111222-5", ingresos="3000"),
+    ])
+
+    assert resumen["insertadas"] == 1
+    assert resumen["actualizadas"] == 2
+    assert len(almacen) == 1
+    assert almacen.obtener_empresa(2).ingresos == 3000.0
+
+
+def test_registro_parcial_conserva_los_campos_vacios(almacen, en_directorio_temporal):
+    almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7", ingresos="1000"))
+    almacen.agregar(empresa(razon_social="Tienda Ana", tipo="NO NIT", nit="N/A"))
+
+    resumen = _actualizar(almacen, en_directorio_temporal, [
+        "NUMERO_DE_NIT|RAZON_SOCIAL|INGRESOS|TIPO_DE_RIESGO_ARL|CORREO",
+        "900123456-7||150000000|Riesgo II|",
+        "N/A|Tienda Ana|||contacto@tiendaana.co",
+        "800111222||5000||", # no existe y le faltan campos obligatorios
+    ])
+
+    assert resumen == {"insertadas": 0, "actualizadas": 2, "sin_cambios": 0, "rechazadas": 1}
+    tienda_uno = almacen.obtener_empresa(2)
+    assert (tienda_uno.ingresos, tienda_uno.tipo_de_riesgo_arl) == (150000000.0, "Riesgo II")
+    assert tienda_uno.correo == "contacto@empresa.co"
+    tienda_ana = almacen.obtener_empresa(3)
+    assert (tienda_ana.ingresos, tienda_ana.correo) == (1000.0, "contacto@tiendaana.co")
+
+
+def test_empresa_no_nit_pasa_a_tener_nit(almacen, en_directorio_temporal):
+    almacen.agregar(empresa(razon_social="Tienda Ana", tipo="NO NIT", nit="N/A"))
+
+    resumen = _actualizar(almacen, en_directorio_temporal, [
+        "RAZON_SOCIAL|TIPO_DE_IDENTIFICACION|NUMERO_DE_NIT",
+        "Tienda Ana|NIT|800111222-5",
+        "Tienda Ana|NIT|abc", # NIT inválido: se rechaza
+    ])
+
+    assert resumen == {"insertadas": 0, "actualizadas": 1, "sin_cambios": 0, "rechazadas": 1}
+    assert len(almacen) == 1
+    tienda_ana = almacen.obtener_empresa(2)
+    assert (tienda_ana.tipo_de_identificacion, tienda_ana.numero_de_nit) == ("NIT", "800111222-5")
+    assert almacen.buscar_por_nit("800111222") == 2
@@ -0,0 +1,60 @@
+import Empresas
+
+from conftest import empresa
+
+
+def _reabrir(almacen):
+    tipo = "sqlite" if isinstance(almacen, Empresas.AlmacenSQLite) else "excel"
+    almacen.guardar()
+    almacen.cerrar()
+    return Empresas.abrir_almacen(tipo)
+
+
+def test_rechazar_omite_duplicados_del_listado_y_del_propio_lote(almacen):
+    almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+    almacen.agregar(empresa(razon_social="Doña Ana", tipo="NO NIT", nit="N/A"))
+
+    resultados = almacen.cargar_lote([
+        empresa(razon_social="Otro Nombre", nit="900123456"), # mismo NIT, sin dígito de verificación
+        empresa(razon_social="DOÑA ANA ", tipo="NO NIT", nit="N/A"), # misma razón social
+        empresa(razon_social="Nueva", nit="800111222"),
+        empresa(razon_social="Nueva Repetida", nit="800111222-1"), # repetida dentro del lote
+    ], modo_duplicados="rechazar")
+
+    assert resultados == [("duplicada", 2), ("duplicada", 3), ("agregada", 4), ("duplicada", 4)]
+    assert len(almacen) == 3
+    assert almacen.obtener_empresa(2).razon_social == "Tienda Uno"
+    assert almacen.obtener_empresa(4).razon_social == "Nueva"
+
+
+def test_actualizar_sobrescribe_las_empresas_existentes(almacen):
+    almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7", ingresos="1000"))
+
+    resultados = almacen.cargar_lote([
+        empresa(razon_social="Tienda Uno S.A.S.", nit="900123456", ingresos="2000"),
+        empresa(razon_social="Nueva", nit="800111222", ingresos="10"),
+        empresa(razon_social="Nueva", nit="800111222", ingresos="20"),
+    ], modo_duplicados="actualizar")
+
+    assert resultados == [("actualizada", 2), ("agregada", 3), ("actualizada", 3)]
+    almacen = _reabrir(almacen)
+    try:
+        assert len(almacen) == 2
+        assert almacen.obtener_empresa(2).ingresos == 2000.0
+        assert almacen.obtener_empresa(2).razon_social == "Tienda Uno S.A.S."
+        assert almacen.obtener_empresa(3).ingresos == 20.0
+        assert almacen.buscar_por_nit("800111222-5") == 3
+        assert almacen.buscar_por_razon_social("tienda uno s.a.s.") == 2
+    finally:
+        almacen.cerrar()
+
+
+def test_asignar_valor_actualiza_las_busquedas(almacen):
+    num_fila = almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+    almacen.asignar_valor(num_fila, Empresas.IDX_NUMERO_NIT, "800999888")
+    almacen.asignar_valor(num_fila, Empresas.IDX_RAZON_SOCIAL, "Tienda Renombrada")
+
+    assert almacen.buscar_por_nit("900123456") is None
+    assert almacen.buscar_por_nit("800999888") == num_fila
+    assert almacen.buscar_por_razon_social("Tienda Uno") is None
+    assert almacen.buscar_por_razon_social("TIENDA RENOMBRADA") == num_fila
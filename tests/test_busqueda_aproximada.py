@@ -0,0 +1,43 @@
+import Empresas
+
+from conftest import empresa
+
+
+def _indice(*razones_sociales):
+    filas = [(num_fila, empresa(razon_social=razon_social, nit=str(800000000 + num_fila)))
+             for num_fila, razon_social in enumerate(razones_sociales, start=2)]
+    return Empresas.IndiceTrigramas.desde_filas(filas)
+
+
+def test_encuentra_sin_tildes_ni_puntuacion():
+    indice = _indice("Compañía Andina S.A.S.", "Transportes del Norte", "Panadería La Espiga")
+    num_fila, puntaje, idx_campo = indice.buscar("compania andina sas")[0]
+    assert (num_fila, idx_campo) == (2, Empresas.IDX_RAZON_SOCIAL)
+    assert puntaje == 1.0
+
+
+def test_editar_un_campo_no_repite_filas_en_el_indice():
+    indice = _indice("Tienda Uno", "Tienda Dos")
+    for texto in ("Ferretería Central", "Tienda Uno", "Ferretería Central", "Tienda Uno"):
+        indice.actualizar_valor(2, Empresas.IDX_RAZON_SOCIAL, texto)
+
+    conjuntos = indice.por_trigrama[Empresas.IDX_RAZON_SOCIAL]
+    assert conjuntos[" ti"] == {2, 3}
+    # Los trigramas que la fila ya no tiene no la conservan
+    for trigrama in Empresas.trigramas("ferreteria central") - Empresas.trigramas("tienda uno"):
+        assert 2 not in conjuntos.get(trigrama, ())
+    assert indice.buscar("tienda uno")[0][:2] == (2, 1.0)
+    assert all(puntaje < 0.5 for _, puntaje, _ in indice.buscar("ferreteria central"))
+
+
+def test_el_almacen_mantiene_el_indice_al_cambiar_datos(en_directorio_temporal):
+    almacen = Empresas.AlmacenExcel()
+    try:
+        num_fila = almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+        assert almacen.buscar_aproximado("tienda uno")[0][0] == num_fila
+        almacen.asignar_valor(num_fila, Empresas.IDX_RAZON_SOCIAL, "Ferretería Central")
+        nueva = almacen.agregar(empresa(razon_social="Tienda Una", nit="800111222"))
+        assert almacen.buscar_aproximado("ferreteria central")[0][:2] == (num_fila, 1.0)
+        assert almacen.buscar_aproximado("tienda uno")[0][0] == nueva
+    finally:
+        almacen.cerrar()
@@ -0,0 +1,51 @@
+import os
+import pickle
+from datetime import date, datetime
+
+import Empresas
+
+from conftest import empresa
+
+
+class _CargaPeligrosa:
+    def __reduce__(self):
+        return (os.mkdir, ("codigo_ejecutado",))
+
+
+def _listado(tmp_path):
+    ruta = str(tmp_path / "listado.xlsx")
+    tabla, anchos, indice = Empresas.TablaEmpresas(), Empresas.AnchosColumnas(), Empresas.IndiceEmpresas()
+    for numero in range(30):
+        valores = empresa(razon_social=f"Empresa {numero}", nit=str(800000000 + numero)).a_fila()
+        if numero == 3:
+            valores[Empresas.IDX_FECHA_MATRICULA] = datetime(2021, 1, 2, 10, 30)
+        Empresas.agregar_fila_listado(tabla, anchos, indice, valores)
+    Empresas.guardar_listado(ruta, tabla, anchos, indice)
+    return ruta, tabla, indice
+
+
+def test_la_cache_devuelve_el_mismo_listado(tmp_path):
+    ruta, tabla, indice = _listado(tmp_path)
+    tabla_cache, _, indice_cache = Empresas.cargar_cache(ruta)
+
+    assert tabla_cache.columnas == tabla.columnas
+    assert tabla_cache.obtener_valor(5, Empresas.IDX_FECHA_MATRICULA) == datetime(2021, 1, 2, 10, 30)
+    assert tabla_cache.obtener_valor(2, Empresas.IDX_FECHA_MATRICULA) == date(2020, 6, 15)
+    assert indice_cache.por_nit == indice.por_nit
+
+
+def test_la_cache_se_descarta_si_el_excel_cambio(tmp_path):
+    ruta, _, _ = _listado(tmp_path)
+    with open(ruta, "ab") as archivo:
+        archivo.write(b"\0")
+    assert Empresas.cargar_cache(ruta) is None
+
+
+def test_una_cache_con_pickle_no_se_ejecuta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ruta, _, _ = _listado(tmp_path)
+    with open(Empresas.ruta_cache(ruta), "wb") as archivo:
+        pickle.dump(_CargaPeligrosa(), archivo)
+
+    assert Empresas.cargar_cache(ruta) is None
+    assert not os.path.exists("codigo_ejecutado")
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import Empresas
+
+from conftest import empresa
+
+
+def test_los_cambios_sin_guardar_se_recuperan_del_diario(en_directorio_temporal):
+    almacen = Empresas.AlmacenExcel()
+    almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+    almacen.guardar()
+    num_fila = almacen.agregar(empresa(razon_social="Tienda Dos", nit="800111222"))
+    almacen.asignar_valor(num_fila, Empresas.IDX_INGRESOS, 5000.0)
+    almacen.cargar_lote([empresa(razon_social="Tienda Tres", nit="700111222"),
+                         empresa(razon_social="Tienda Uno", nit="900123456", ingresos="7")], "actualizar")
+    almacen.cerrar() # Sin guardar, como tras un corte
+
+    almacen = Empresas.AlmacenExcel()
+    try:
+        assert len(almacen) == 3
+        assert almacen.diario.filas_pendientes == 4
+        assert almacen.obtener_empresa(2).ingresos == 7.0
+        assert almacen.obtener_empresa(3).ingresos == 5000.0
+        assert almacen.buscar_por_nit("700111222") == 4
+    finally:
+        almacen.cerrar()
+
+
+def test_un_diario_de_otra_version_del_excel_no_se_aplica(en_directorio_temporal):
+    almacen = Empresas.AlmacenExcel()
+    almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+    almacen.guardar()
+    almacen.agregar(empresa(razon_social="Tienda Dos", nit="800111222"))
+    almacen.cerrar()
+    # El Excel se modifica fuera del programa
+    os.utime(Empresas.NOMBRE_ARCHIVO_EXCEL, ns=(0, 0))
+
+    almacen = Empresas.AlmacenExcel()
+    try:
+        assert len(almacen) == 1
+        assert os.path.exists(Empresas.ruta_diario(Empresas.NOMBRE_ARCHIVO_EXCEL) + ".descartado")
+    finally:
+        almacen.cerrar()
+
+
+def test_un_segundo_proceso_no_puede_modificar_el_listado(en_directorio_temporal):
+    almacen = Empresas.AlmacenExcel()
+    try:
+        with pytest.raises(Empresas.ListadoEnUso):
+            Empresas.AlmacenExcel()
+    finally:
+        almacen.cerrar()
+    Empresas.AlmacenExcel().cerrar() # Al cerrar se libera el bloqueo
+
+
+def test_solo_lectura_reproduce_el_diario_sin_tocarlo(en_directorio_temporal):
+    almacen = Empresas.AlmacenExcel()
+    try:
+        almacen.agregar(empresa(razon_social="Tienda Uno", nit="900123456-7"))
+        almacen.guardar()
+        almacen.agregar(empresa(razon_social="Tienda Dos", nit="800111222"))
+        ruta = Empresas.ruta_diario(Empresas.NOMBRE_ARCHIVO_EXCEL)
+        with open(ruta, encoding="utf-8") as archivo:
+            contenido = archivo.read()
+
+        lector = Empresas.AlmacenExcel(solo_lectura=True)
+        try:
+            assert len(lector) == 2
+            assert lector.guardar() is False
+        finally:
+            lector.cerrar()
+        with open(ruta, encoding="utf-8") as archivo:
+            assert archivo.read() == contenido
+    finally:
+        almacen.cerrar()
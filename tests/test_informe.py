@@ -0,0 +1,22 @@
+import pytest
+
+import Empresas
+
+from conftest import empresa
+
+np = pytest.importorskip("numpy")
+
+
+def _tabla(tablas, grupo):
+    return next(filas for _, nombre, filas in tablas if nombre == grupo)
+
+
+def test_division_ciiu_con_codigos_de_cuatro_y_cinco_digitos():
+    tabla = Empresas.TablaEmpresas()
+    for nit, ciiu in (("900123456-7", "6201"), ("800111222", "62090"), ("811222333", "0111"),
+                      ("830444555", "4711"), ("860666777", "47111")):
+        tabla.agregar_fila(empresa(nit=nit, ciiu=ciiu, razon_social=f"Tienda {ciiu}").a_fila())
+    tablas = Empresas.calcular_resumen_arl(Empresas.ArreglosEmpresas(np, tabla.columnas))
+
+    filas = _tabla(tablas, "DIVISION_CIIU")
+    assert [(fila[0], fila[1]) for fila in filas] == [("01", 1), ("47", 2), ("62", 2)]
@@ -0,0 +1,18 @@
+import Empresas
+
+from conftest import linea_empresa
+
+
+def test_cada_campo_se_cuenta_una_vez_por_fila():
+    instrumentacion = Empresas.activar_instrumentacion()
+    try:
+        for nit in ("900123456-7", "800111222", "811222333"):
+            _, error = Empresas.validar_fila_empresa(linea_empresa(nit=nit).split("|"))
+            assert error is None
+        medidas = dict(instrumentacion.medidas)
+    finally:
+        Empresas.desactivar_instrumentacion()
+
+    assert medidas["validar_fila_empresa"][0] == 3
+    assert medidas["validar TIPO_DE_IDENTIFICACION"][0] == 3
+    assert medidas["validar RAZON_SOCIAL"][0] == 3
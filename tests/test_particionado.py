@@ -0,0 +1,81 @@
+import os
+
+import Empresas
+
+from conftest import empresa
+
+
+def test_guardar_reescribe_particiones_y_manifiesto(en_directorio_temporal):
+    empresas = [empresa(razon_social="Tienda Uno", nit="900123456-7", departamento="Antioquia"),
+                empresa(razon_social="Tienda Dos", nit="800111222", departamento="Cundinamarca")]
+    Empresas.escribir_excel_particionado(Empresas.NOMBRE_ARCHIVO_EXCEL, (e.a_fila() for e in empresas),
+                                         Empresas.AnchosColumnas(), archivos_separados=True)
+    base = os.path.splitext(Empresas.NOMBRE_ARCHIVO_EXCEL)[0]
+    assert os.path.exists(f"{base}_Cundinamarca.xlsx")
+
+    almacen = Empresas.abrir_almacen("excel")
+    try:
+        almacen.asignar_valor(3, Empresas.IDX_DEPARTAMENTO, "Antioquia")
+        almacen.agregar(empresa(razon_social="Tienda Tres", nit="811222333", departamento="Caldas"))
+        almacen.guardar()
+    finally:
+        almacen.cerrar()
+
+    assert not os.path.exists(f"{base}_Cundinamarca.xlsx")
+    wb = Empresas.load_workbook(Empresas.NOMBRE_ARCHIVO_EXCEL, read_only=True)
+    try:
+        manifiesto = Empresas.leer_manifiesto(wb)
+    finally:
+        wb.close()
+    assert [(p["DEPARTAMENTO"], p["ARCHIVO"], p["FILAS"]) for p in manifiesto] == [
+        ("Antioquia", f"{base}_Antioquia.xlsx", 2), ("Caldas", f"{base}_Caldas.xlsx", 1)]
+
+    os.remove(Empresas.ruta_cache(Empresas.NOMBRE_ARCHIVO_EXCEL))
+    tabla, _, _ = Empresas.cargar_listado(Empresas.NOMBRE_ARCHIVO_EXCEL)
+    assert [fila[Empresas.IDX_RAZON_SOCIAL] for fila in tabla.iter_filas()] == ["Tienda Uno", "Tienda Dos",
+                                                                                  "Tienda Tres"]
+
+
+def test_listado_que_supera_una_hoja_queda_particionado_tambien_en_la_cache(en_directorio_temporal, monkeypatch):
+    monkeypatch.setattr(Empresas, "LIMITE_FILAS_HOJA", 2)
+    ruta = Empresas.NOMBRE_ARCHIVO_EXCEL
+    tabla = Empresas.TablaEmpresas()
+    for nit in ("900123456-7", "800111222", "811222333"):
+        tabla.agregar_fila(empresa(razon_social=f"Tienda {nit}", nit=nit).a_fila())
+    anchos = Empresas.AnchosColumnas.desde_filas(tabla.iter_filas())
+    indice = Empresas.IndiceEmpresas.desde_filas(tabla.iter_filas())
+
+    Empresas.guardar_listado(ruta, tabla, anchos, indice)
+
+    wb = Empresas.load_workbook(ruta, read_only=True)
+    try:
+        manifiesto = Empresas.leer_manifiesto(wb)
+    finally:
+        wb.close()
+    assert [particion["FILAS"] for particion in manifiesto] == [2, 1]
+    desde_cache, _, _ = Empresas.cargar_cache(ruta)
+    assert desde_cache.particiones == manifiesto
+    assert len(desde_cache) == 3
+
+    # Con menos filas que el límite se conserva el particionado del libro
+    desde_cache.columnas = [columna[:2] for columna in desde_cache.columnas]
+    Empresas.guardar_listado(ruta, desde_cache, anchos, indice)
+    wb = Empresas.load_workbook(ruta, read_only=True)
+    try:
+        assert [particion["FILAS"] for particion in Empresas.leer_manifiesto(wb)] == [2]
+    finally:
+        wb.close()
+
+
+def test_departamentos_con_caracteres_invalidos_dan_nombres_de_archivo_validos(en_directorio_temporal):
+    filas = [empresa(nit="900123456-7").a_fila(), empresa(nit="800111222").a_fila()]
+    filas[0][Empresas.IDX_DEPARTAMENTO] = "Bogotá D.C./Cundinamarca"
+    filas[1][Empresas.IDX_DEPARTAMENTO] = 'Valle: "norte" <*>?|'
+    manifiesto = Empresas.escribir_excel_particionado(Empresas.NOMBRE_ARCHIVO_EXCEL, filas,
+                                                      Empresas.AnchosColumnas(), archivos_separados=True)
+
+    base = os.path.splitext(Empresas.NOMBRE_ARCHIVO_EXCEL)[0]
+    assert [particion["ARCHIVO"] for particion in manifiesto] == [f"{base}_Bogotá D.C.Cundinamarca.xlsx",
+                                                                   f"{base}_Valle norte.xlsx"]
+    assert sorted(os.listdir(en_directorio_temporal)) == sorted(
+        [Empresas.NOMBRE_ARCHIVO_EXCEL] + [particion["ARCHIVO"] for particion in manifiesto])
@@ -0,0 +1,39 @@
+import sys
+
+import pytest
+
+import Empresas
+
+from conftest import linea_empresa
+
+
+def test_mensajes_de_carga_se_muestran_al_primer_acceso(en_directorio_temporal, capsys):
+    salida = sys.stdout
+    almacen = Empresas.AlmacenEnSegundoPlano("excel")
+    almacen._hilo.join()
+    print("menú")
+    assert capsys.readouterr().out == "menú\n"
+
+    assert len(almacen) == 0
+    assert "no existe" in capsys.readouterr().out
+    assert sys.stdout is salida
+    almacen.cerrar()
+
+
+def test_error_al_abrir_termina_sin_relanzarlo_al_cerrar(en_directorio_temporal, capsys):
+    almacen = Empresas.AlmacenEnSegundoPlano("sqlite", ruta_base_datos=str(en_directorio_temporal / "no" / "x.db"))
+    with pytest.raises(SystemExit):
+        almacen.esperar()
+    assert "Error: no se pudo abrir el listado" in capsys.readouterr().out
+    almacen.cerrar()
+
+
+def test_carga_masiva_informa_una_sola_vez_el_error_al_abrir(en_directorio_temporal, capsys, monkeypatch):
+    respuestas = iter([linea_empresa(), "FIN_CARGA"])
+    monkeypatch.setattr("builtins.input", lambda mensaje="": next(respuestas))
+    monkeypatch.setattr(Empresas, "FILAS_POR_LOTE_DIARIO", 1) # El primer acceso ocurre dentro de la carga
+    almacen = Empresas.AlmacenEnSegundoPlano("sqlite", ruta_base_datos=str(en_directorio_temporal / "no" / "x.db"))
+    with pytest.raises(SystemExit):
+        Empresas.cargar_multiples_empresas(almacen, modo_duplicados="rechazar")
+    assert capsys.readouterr().out.count("no se pudo abrir el listado") == 1
+    almacen.cerrar()
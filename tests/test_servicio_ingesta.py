@@ -0,0 +1,93 @@
+import asyncio
+
+import Empresas
+
+from conftest import empresa, linea_empresa
+
+
+def _servicio():
+    return Empresas.ServicioIngesta(tipo_almacen="sqlite", ruta_base_datos="empresas.db")
+
+
+def test_metricas_separan_agregadas_actualizadas_y_duplicadas(en_directorio_temporal):
+    async def probar():
+        servicio = _servicio()
+        await servicio.iniciar()
+        try:
+            primero = await servicio.procesar_lote("\n".join([
+                linea_empresa(razon_social="Tienda Uno", nit="900123456-7"),
+                linea_empresa(razon_social="Tienda Dos", nit="800111222"),
+                linea_empresa(razon_social="Tienda Dos Bis", nit="800111222-5"),
+                "línea inválida",
+            ]))
+            segundo = await servicio.procesar_lote(
+                linea_empresa(razon_social="Tienda Uno S.A.S.", nit="900123456"), "actualizar")
+        finally:
+            await servicio.detener()
+        return primero, segundo, servicio.obtener_metricas()
+
+    primero, segundo, metricas = asyncio.run(probar())
+
+    assert (primero["agregadas"], primero["actualizadas"]) == (2, 0)
+    assert primero["duplicadas"] == [{"linea": 3, "fila": 3}]
+    assert [rechazada["linea"] for rechazada in primero["rechazadas"]] == [4]
+    assert (segundo["agregadas"], segundo["actualizadas"]) == (0, 1)
+    assert (metricas["agregadas"], metricas["actualizadas"], metricas["duplicadas"]) == (2, 1, 1)
+    assert metricas["empresas_escritas"] == 3
+    assert metricas["rechazadas"] == 1
+
+
+def test_un_fallo_no_afecta_a_los_lotes_ya_guardados(en_directorio_temporal):
+    async def probar():
+        servicio = _servicio()
+        await servicio.iniciar()
+        cargar_lote = servicio.almacen.cargar_lote
+
+        def cargar_lote_fallando(empresas, modo_duplicados="rechazar"):
+            if modo_duplicados == "actualizar":
+                raise OSError("disco lleno")
+            return cargar_lote(empresas, modo_duplicados)
+
+        servicio.almacen.cargar_lote = cargar_lote_fallando
+        # El escritor aún no ha corrido: los tres lotes le llegan en el mismo grupo
+        loop = asyncio.get_running_loop()
+        confirmaciones = [loop.create_future() for _ in range(3)]
+        servicio.cola.put_nowait(([empresa(razon_social="Tienda Uno", nit="900123456-7")], "rechazar",
+                                  confirmaciones[0]))
+        servicio.cola.put_nowait(([empresa(razon_social="Tienda Dos", nit="800111222")], "actualizar",
+                                  confirmaciones[1]))
+        servicio.cola.put_nowait(([empresa(razon_social="Tienda Tres", nit="811222333")], "rechazar",
+                                  confirmaciones[2]))
+        try:
+            resultados = await asyncio.gather(*confirmaciones, return_exceptions=True)
+            filas = await servicio._en_escritor(len, servicio.almacen)
+        finally:
+            await servicio.detener()
+        return resultados, filas
+
+    resultados, filas = asyncio.run(probar())
+
+    assert resultados[0] == [("agregada", 2)]
+    assert isinstance(resultados[1], OSError)
+    assert isinstance(resultados[2], OSError)
+    assert filas == 1
+
+
+def test_metricas_antes_de_iniciar_y_lotes_por_grupo(en_directorio_temporal):
+    servicio = _servicio()
+    assert servicio.obtener_metricas()["empresas_por_segundo"] == 0.0
+
+    async def probar():
+        await servicio.iniciar()
+        try:
+            await servicio.procesar_lote(linea_empresa(razon_social="Tienda Uno", nit="900123456-7"))
+            await servicio.procesar_lote("línea inválida") # No llega al escritor
+        finally:
+            await servicio.detener()
+        return servicio.obtener_metricas()
+
+    metricas = asyncio.run(probar())
+
+    assert (metricas["lotes_procesados"], metricas["lotes_confirmados"], metricas["grupos_confirmados"]) == (2, 1, 1)
+    assert metricas["lotes_por_grupo_promedio"] == 1.0
+    assert servicio.tarea_escritor.done()
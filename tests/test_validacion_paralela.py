@@ -0,0 +1,34 @@
+import Empresas
+
+from conftest import linea_empresa
+
+
+def _lineas(cantidad):
+    lineas = []
+    for numero in range(1, cantidad + 1):
+        if numero % 7 == 0:
+            linea = linea_empresa(razon_social=f"Empresa {numero}", ciiu="12")
+        else:
+            linea = linea_empresa(razon_social=f"Empresa {numero}", nit=str(800000000 + numero))
+        lineas.append((numero, linea))
+    return lineas
+
+
+def test_paralelo_conserva_el_orden_y_los_errores_de_la_validacion_secuencial():
+    lineas = _lineas(103)
+    secuencial = list(Empresas.validar_lineas(lineas, trabajadores=1))
+    paralelo = list(Empresas.validar_lineas(lineas, trabajadores=3, tamano_lote=10))
+
+    assert [numero for numero, _, _, _ in paralelo] == list(range(1, 104))
+    assert paralelo == secuencial
+    errores = [numero for numero, _, _, error in paralelo if error]
+    assert errores == list(range(7, 104, 7))
+    assert all("CIIU" in error for _, _, _, error in paralelo if error)
+
+
+def test_paralelo_con_entrada_vacia():
+    assert list(Empresas.validar_lineas_en_paralelo(iter(()), trabajadores=2)) == []
+
+
+def test_los_trabajadores_no_se_crean_con_fork():
+    assert Empresas.contexto_procesos().get_start_method() != "fork"